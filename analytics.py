@@ -0,0 +1,115 @@
+import pandas as pd
+from cache import cached
+from database import session
+from utils import _as_date, date_range_filter
+
+# Typed frames for the statistics tabs. Aggregation stays in SQL (GROUP BY over daily_stats);
+# pandas only joins, derives and orders the grouped rows for display. Cached frames are handed out
+# as copies, so callers may add columns or sort in place.
+MEASURES = ['tx_count', 'weight_kg', 'total_amount', 'committee_fee', 'net_amount']
+
+CATEGORY_TOTALS_DTYPES = {
+    'category_id': 'int32',
+    'category': 'category',
+    'tx_count': 'int64',
+    'weight_kg': 'float64',
+    'total_amount': 'float64',
+    'committee_fee': 'float64',
+    'net_amount': 'float64',
+}
+
+TRANSACTION_DTYPES = {
+    'id': 'int64',
+    'warga': 'category',
+    'category': 'category',
+    'processed_by': 'category',
+    'weight_kg': 'float64',
+    'price_per_kg': 'float64',
+    'total_amount': 'float64',
+    'committee_fee': 'float64',
+    'net_amount': 'float64',
+}
+
+
+def _iso(value):
+    return _as_date(value).isoformat() if value else None
+
+
+def load_category_totals(start_date=None, end_date=None, warga_id=None):
+    """Measures per category (from daily_stats) for an inclusive date range as a typed DataFrame"""
+    # Normalise to ISO days so datetime.now()-based ranges still hit the cache on every rerun
+    return _load_category_totals(_iso(start_date), _iso(end_date), warga_id).copy()
+
+
+@cached(('daily_stats', 'categories'), maxsize=16)
+def _load_category_totals(start_date, end_date, warga_id):
+    where, params = date_range_filter('d.date', start_date, end_date)
+    if warga_id:
+        where += ' AND d.warga_id = ?'
+        params.append(warga_id)
+    with session() as cursor:
+        return pd.read_sql(f'''
+            SELECT d.category_id, c.name AS category, SUM(d.tx_count) AS tx_count,
+                   SUM(d.weight_kg) AS weight_kg, SUM(d.total_amount) AS total_amount,
+                   SUM(d.committee_fee) AS committee_fee, SUM(d.net_amount) AS net_amount
+            FROM daily_stats d
+            JOIN categories c ON d.category_id = c.id
+            WHERE 1=1{where}
+            GROUP BY d.category_id
+        ''', cursor.connection, params=params, dtype=CATEGORY_TOTALS_DTYPES)
+
+
+def load_transactions(start_date=None, end_date=None, warga_id=None, limit=None):
+    """Transaction rows (newest first) as a typed DataFrame for display tables"""
+    return _load_transactions(_iso(start_date), _iso(end_date), warga_id, limit).copy()
+
+
+@cached(('transactions', 'users', 'categories'), maxsize=16)
+def _load_transactions(start_date, end_date, warga_id, limit):
+    where, params = date_range_filter('t.transaction_date', start_date, end_date)
+    if warga_id:
+        where += ' AND t.warga_id = ?'
+        params.append(warga_id)
+    query = f'''
+        SELECT t.id, t.transaction_date, u.full_name AS warga, c.name AS category,
+               p.full_name AS processed_by, t.weight_kg, t.price_per_kg,
+               t.total_amount, t.committee_fee, t.net_amount
+        FROM transactions t
+        JOIN users u ON t.warga_id = u.id
+        JOIN categories c ON t.category_id = c.id
+        JOIN users p ON t.processed_by = p.id
+        WHERE 1=1{where}
+        ORDER BY t.transaction_date DESC, t.id DESC
+    '''
+    if limit:
+        query += ' LIMIT ?'
+        params.append(int(limit))
+    with session() as cursor:
+        return pd.read_sql(query, cursor.connection, params=params,
+                           parse_dates=['transaction_date'], dtype=TRANSACTION_DTYPES)
+
+
+def load_categories():
+    """All categories with their current price"""
+    return _load_categories().copy()
+
+
+@cached(('categories',))
+def _load_categories():
+    with session() as cursor:
+        return pd.read_sql(
+            'SELECT id AS category_id, name AS category, price_per_kg FROM categories',
+            cursor.connection,
+            dtype={'category_id': 'int32', 'price_per_kg': 'float64'},
+        )
+
+
+def category_breakdown(totals, categories=None):
+    """load_category_totals with the average realised price, top sellers first; categories lists unsold ones too"""
+    result = totals.set_index('category_id')
+    if categories is not None:
+        result = categories.set_index('category_id').join(result.drop(columns='category'))
+        result[MEASURES] = result[MEASURES].fillna(0)
+        result['tx_count'] = result['tx_count'].astype('int64')
+    result['avg_price'] = (result['total_amount'] / result['weight_kg']).where(result['weight_kg'] > 0, 0.0)
+    return result.reset_index().sort_values('total_amount', ascending=False, ignore_index=True)
@@ -1,34 +1,34 @@
 import streamlit as st
-from database import initialize_system, get_connection, get_setting, set_setting
-from auth import authenticate_user, log_audit, check_superuser_session, end_superuser_session, get_all_users, start_superuser_session, get_user_by_id, create_user, update_user, update_user_password, delete_user
+from database import initialize_system, get_connection, get_setting, set_setting, rebuild_daily_stats, needs_vacuum, vacuum
+from auth import authenticate_user, issue_session_token, validate_session_token, revoke_session_token, log_audit, check_superuser_session, end_superuser_session, get_all_users, start_superuser_session, get_user_by_id, create_user, update_user, update_user_password, delete_user
 from utils import *
 from svg_icons import get_svg
 import pandas as pd
 import altair as alt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import io
+import cache
+import calendar
 import uuid
 import random
 import os
-import tempfile
 import re
-from fpdf import FPDF
-import matplotlib.pyplot as plt
+import hashlib
+import html
+import mimetypes
+import audit
+import exports
+import ratelimit
+import receipts
+import search
+import jobs
+import analytics
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 DUMMY_TAG = "[DUMMY DATA]"
 
 
-def _pdf_output_bytes(pdf):
-    output = pdf.output(dest="S")
-    if isinstance(output, bytes):
-        return output
-    if isinstance(output, bytearray):
-        return bytes(output)
-    if isinstance(output, memoryview):
-        return output.tobytes()
-    return output.encode("latin-1")
-
-
 def _render_trend_chart(df_trend, x_col='Tanggal', y_col='Total', y_title='Nilai Transaksi (Rp)'):
     chart_df = df_trend.copy()
     chart_df[x_col] = pd.to_datetime(chart_df[x_col])
@@ -107,6 +107,101 @@ def _render_top_warga_table(df_top, count_col='Jumlah Transaksi'):
     )
 
 
+# Display-time formatting for the analytics frames: values stay numeric, column_config renders them
+TRANSACTION_COLUMN_CONFIG = {
+    'id': st.column_config.NumberColumn('ID', format='%d'),
+    'transaction_date': st.column_config.DatetimeColumn('Tanggal', format='YYYY-MM-DD HH:mm'),
+    'warga': st.column_config.TextColumn('Warga'),
+    'category': st.column_config.TextColumn('Kategori'),
+    'processed_by': st.column_config.TextColumn('Diproses Oleh'),
+    'weight_kg': st.column_config.NumberColumn('Berat (Kg)', format='%.2f'),
+    'price_per_kg': st.column_config.NumberColumn('Harga/Kg', format='Rp %.0f'),
+    'total_amount': st.column_config.NumberColumn('Total', format='Rp %.0f'),
+    'committee_fee': st.column_config.NumberColumn('Fee Admin', format='Rp %.0f'),
+    'net_amount': st.column_config.NumberColumn('Diterima Warga', format='Rp %.0f'),
+}
+
+BREAKDOWN_COLUMN_CONFIG = {
+    'price_per_kg': st.column_config.NumberColumn('Harga Saat Ini', format='Rp %.0f'),
+    'tx_count': st.column_config.NumberColumn('Total Transaksi', format='%d'),
+    'weight_kg': st.column_config.NumberColumn('Total Berat (Kg)', format='%.2f'),
+    'avg_price': st.column_config.NumberColumn('Harga Rata-rata', format='Rp %.0f'),
+    'total_amount': st.column_config.NumberColumn('Total Revenue', format='Rp %.0f'),
+    'committee_fee': st.column_config.NumberColumn('Fee Admin', format='Rp %.0f'),
+    'net_amount': st.column_config.NumberColumn('Diterima Warga', format='Rp %.0f'),
+    'revenue_change': st.column_config.NumberColumn('Perubahan Revenue', format='%.1f%%'),
+}
+
+
+def _render_transactions_table(df, columns):
+    st.dataframe(
+        df,
+        use_container_width=True,
+        hide_index=True,
+        column_order=columns,
+        column_config={col: TRANSACTION_COLUMN_CONFIG[col] for col in columns},
+    )
+
+
+def _render_breakdown_table(df, key_col, key_label, period_format=None, columns=None):
+    columns = columns or [key_col, 'tx_count', 'weight_kg', 'total_amount', 'committee_fee', 'net_amount']
+    column_config = {col: BREAKDOWN_COLUMN_CONFIG[col] for col in columns if col in BREAKDOWN_COLUMN_CONFIG}
+    if period_format:
+        column_config[key_col] = st.column_config.DateColumn(key_label, format=period_format)
+    else:
+        column_config[key_col] = st.column_config.TextColumn(key_label)
+    st.dataframe(df, use_container_width=True, hide_index=True, column_order=columns, column_config=column_config)
+
+
+PERIOD_GRANULARITIES = {
+    'Harian': ('day', 'DD MMM YYYY'),
+    'Mingguan': ('week', 'DD MMM YYYY'),
+    'Bulanan': ('month', 'MMM YYYY'),
+    'Tahunan': ('year', 'YYYY'),
+}
+
+
+def _period_series_frame(series):
+    """get_period_series output as a typed frame using the breakdown column names, plus period-over-period change"""
+    df = pd.DataFrame(series).rename(columns={
+        'total_transactions': 'tx_count',
+        'total_weight': 'weight_kg',
+        'total_revenue': 'total_amount',
+        'committee_earnings': 'committee_fee',
+        'total_net': 'net_amount',
+    })
+    df['period'] = pd.to_datetime(df['period'])
+    previous = df['total_amount'].shift()
+    df['revenue_change'] = (df['total_amount'] - previous) / previous.where(previous > 0) * 100
+    return df
+
+
+def _render_period_comparison_chart(df):
+    base = alt.Chart(df).encode(x=alt.X('period:T', title='Periode', axis=alt.Axis(labelAngle=-20, grid=False)))
+    bars = base.mark_bar(color='#1E88E5', opacity=0.8).encode(
+        y=alt.Y('total_amount:Q', title='Total Revenue (Rp)', axis=alt.Axis(format='~s')),
+        tooltip=[
+            alt.Tooltip('period:T', title='Periode', format='%d %B %Y'),
+            alt.Tooltip('total_amount:Q', title='Revenue', format=',.0f'),
+            alt.Tooltip('committee_fee:Q', title='Pendapatan Admin', format=',.0f'),
+            alt.Tooltip('tx_count:Q', title='Transaksi', format=',d'),
+        ],
+    )
+    line = base.mark_line(color='#4CAF50', strokeWidth=3, point=True).encode(
+        y=alt.Y('tx_count:Q', title='Jumlah Transaksi'),
+    )
+    chart = alt.layer(bars, line).resolve_scale(y='independent').properties(height=320)
+    st.altair_chart(chart, use_container_width=True)
+
+
+def _render_period_comparison(df, period_format):
+    _render_breakdown_table(
+        df, 'period', 'Periode', period_format=period_format,
+        columns=['period', 'tx_count', 'weight_kg', 'total_amount', 'revenue_change', 'committee_fee', 'net_amount'],
+    )
+    _render_period_comparison_chart(df)
+
+
 def _build_category_excel_template():
     categories = get_all_categories()
     template_rows = [
@@ -363,10 +458,80 @@ def _render_category_excel_uploader(section_key):
         st.rerun()
 
 
+def _pager_token(section_key, filters):
+    """Page token for the current page of a paginated list; resets to page 1 when filters change."""
+    state_key = f"pager_{section_key}"
+    state = st.session_state.get(state_key)
+    if state is None or state['filters'] != filters:
+        state = {'filters': filters, 'tokens': [None]}
+        st.session_state[state_key] = state
+    return state['tokens'][-1]
+
+
+def _render_pager(section_key, next_token):
+    """Previous/next buttons for a list paginated with _pager_token (one page fetched per rerun)."""
+    state = st.session_state[f"pager_{section_key}"]
+    page_number = len(state['tokens'])
+    if page_number == 1 and not next_token:
+        return
+
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("⬅️ Sebelumnya", key=f"pager_prev_{section_key}", disabled=page_number <= 1, use_container_width=True):
+            state['tokens'].pop()
+            st.rerun()
+    with col_info:
+        st.markdown(f"<div style='text-align:center;'>Halaman {page_number}</div>", unsafe_allow_html=True)
+    with col_next:
+        if st.button("Berikutnya ➡️", key=f"pager_next_{section_key}", disabled=not next_token, use_container_width=True):
+            state['tokens'].append(next_token)
+            st.rerun()
+
+
+def _markdown_snippet(snippet):
+    """Escape a search snippet for st.markdown and bold its highlighted terms."""
+    escaped = re.sub(r'([\\`*_{}\[\]()#+\-.!|<>~$:])', r'\\\1', snippet or '')
+    return escaped.replace(search.HIGHLIGHT_START, '**').replace(search.HIGHLIGHT_END, '**')
+
+
+def _render_text_search(section_key):
+    """Full-text search over audit details and transaction/movement notes, best matches first."""
+    search_col, source_col = st.columns([2, 1])
+    with search_col:
+        query = st.text_input(
+            "🔎 Cari teks",
+            placeholder="mis. arisan, Kardus, penarikan",
+            key=f"text_search_{section_key}",
+        )
+    with source_col:
+        sources = st.multiselect(
+            "Sumber",
+            list(search.SOURCES),
+            default=list(search.SOURCES),
+            format_func=lambda source: search.SOURCES[source]['label'],
+            key=f"text_search_sources_{section_key}",
+        )
+    if not query.strip():
+        return
+
+    hits = search.search_text(query, sources)
+    if not hits:
+        st.info("Tidak ada hasil untuk pencarian ini.")
+        return
+    st.caption(f"{len(hits)} hasil teratas")
+    for hit in hits:
+        header = " · ".join(str(part) for part in (hit['source_label'], hit['date'], hit['who'] or '-', hit['kind']) if part)
+        st.markdown(f"<small>{html.escape(header)}</small>", unsafe_allow_html=True)
+        st.markdown(_markdown_snippet(hit['snippet']))
+
+
 def _render_audit_log_tab(section_key, default_limit=200):
     st.subheader("📜 Audit Log Aktivitas User")
     st.caption("Menampilkan seluruh aktivitas user secara transparan dengan filter user dan rentang tanggal.")
 
+    with st.expander("🔎 Pencarian Teks (audit log & catatan)"):
+        _render_text_search(section_key)
+
     filter_col1, filter_col2, filter_col3, filter_col4 = st.columns([2, 1, 1, 1])
 
     all_users = get_all_users()
@@ -423,9 +588,9 @@ def _render_audit_log_tab(section_key, default_limit=200):
         [
             (
                 log['timestamp'],
-                log['username'],
-                log['full_name'],
-                _display_role_label(log['role']),
+                log['username'] or '-',
+                log['full_name'] or '-',
+                _display_role_label(log['role']) if log['role'] else '-',
                 log['action'],
                 log['details'] or '-',
             )
@@ -436,6 +601,39 @@ def _render_audit_log_tab(section_key, default_limit=200):
     st.dataframe(df_logs, use_container_width=True, hide_index=True)
 
 
+def _render_audit_retention_settings():
+    """Retention period of the live audit_log table and on-demand archival of older rows."""
+    with st.expander("🗄️ Retensi & Arsip Audit Log"):
+        st.caption(
+            "Log yang lebih tua dari masa retensi dipindahkan ke arsip bulanan terkompresi "
+            "dan tetap muncul di pencarian audit log di bawah."
+        )
+        retention = st.number_input(
+            "Masa retensi di database (hari, 0 = simpan semua)",
+            min_value=0,
+            max_value=3650,
+            value=audit.retention_days(),
+            step=30,
+            key="audit_retention_days",
+        )
+        if st.button("Simpan Retensi", key="save_audit_retention"):
+            set_setting(audit.RETENTION_SETTING, str(int(retention)))
+            log_audit(st.session_state['user']['id'], 'UPDATE_SETTINGS', f"Set audit log retention to {int(retention)} days")
+            st.success("✅ Pengaturan retensi disimpan")
+
+        months = audit.archived_months()
+        cutoff = audit.retention_cutoff()
+        st.caption(
+            f"Arsip: {len(months)} bulan" + (f" ({months[-1]} s/d {months[0]})" if months else "")
+            + (f" · log sebelum {cutoff} diarsipkan otomatis" if cutoff else " · arsip otomatis nonaktif")
+        )
+        if st.button("🗄️ Arsipkan Sekarang", key="start_audit_archive", disabled=cutoff is None):
+            st.session_state['audit_archive_job'] = jobs.submit(
+                'audit_archive', {}, created_by=st.session_state['user']['id']
+            )
+        _render_job_status('audit_archive_job', empty_message="✅ Arsip audit log sudah diperbarui.")
+
+
 def _get_transaction_participant_users():
     """Users eligible as transaction sellers: warga + admin/panitia + inputer."""
     allowed_roles = {'warga', 'panitia', 'admin', 'inputer'}
@@ -945,8 +1143,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize database
-initialize_system()
+# Initialize database once per server process; reruns skip straight to rendering.
+@st.cache_resource(show_spinner=False)
+def _bootstrap_system():
+    initialize_system()
+    ratelimit.load_state()
+    return True
+
+
+_bootstrap_system()
+
+
+@st.cache_resource(show_spinner=False)
+def _start_job_workers():
+    # Background job workers live for the whole server process, like the database bootstrap
+    jobs.start_workers()
+    return True
+
+
+_start_job_workers()
 
 def dashboard_admin_home():
     """New specialized dashboard for Admin Home"""
@@ -955,35 +1170,16 @@ def dashboard_admin_home():
     # --- Top Cards ---
     col1, col2, col3, col4 = st.columns(4)
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # 1. Total Transactions (All time)
-    cursor.execute('SELECT COUNT(*) FROM transactions')
-    total_trans = cursor.fetchone()[0]
-    
-    # 2. Total Weight
-    cursor.execute('SELECT SUM(weight_kg) FROM transactions')
-    total_weight = cursor.fetchone()[0] or 0
-    
-    # 3. Total Revenue
-    cursor.execute('SELECT SUM(total_amount) FROM transactions')
-    total_rev = cursor.fetchone()[0] or 0
-    
-    # 4. Active Warga
-    cursor.execute('SELECT COUNT(DISTINCT warga_id) FROM transactions')
-    active_warga = cursor.fetchone()[0]
-    
-    conn.close()
+    kpi = get_kpi_snapshot()
     
     with col1:
-        ui_metric_card("Total Transaksi", total_trans, icon="🧾")
+        ui_metric_card("Total Transaksi", kpi['total_transactions'], icon="🧾")
     with col2:
-        ui_metric_card("Total Berat", f"{total_weight:,.2f} Kg", icon="⚖️")
+        ui_metric_card("Total Berat", f"{kpi['total_weight']:,.2f} Kg", icon="⚖️")
     with col3:
-        ui_metric_card("Total Omzet", f"Rp {total_rev:,.0f}", icon="💰")
+        ui_metric_card("Total Omzet", f"Rp {kpi['total_revenue']:,.0f}", icon="💰")
     with col4:
-        ui_metric_card("Warga Aktif", active_warga, icon="👥")
+        ui_metric_card("Warga Aktif", kpi['active_warga'], icon="👥")
         
     st.markdown("---")
     
@@ -998,13 +1194,14 @@ def dashboard_admin_home():
         
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT date(transaction_date) as d, SUM(total_amount) as total
-            FROM transactions 
-            WHERE date(transaction_date) BETWEEN ? AND ?
-            GROUP BY date(transaction_date)
+        date_clause, date_params = date_range_filter('date', start_date, end_date)
+        cursor.execute(f'''
+            SELECT date as d, SUM(total_amount) as total
+            FROM daily_stats
+            WHERE 1=1{date_clause}
+            GROUP BY date
             ORDER BY d
-        ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+        ''', date_params)
         daily_data = cursor.fetchall()
         conn.close()
         
@@ -1020,10 +1217,10 @@ def dashboard_admin_home():
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT u.full_name, COUNT(*) as cnt
-            FROM transactions t
-            JOIN users u ON t.warga_id = u.id
-            GROUP BY t.warga_id
+            SELECT u.full_name, SUM(ds.tx_count) as cnt
+            FROM daily_stats ds
+            JOIN users u ON ds.warga_id = u.id
+            GROUP BY ds.warga_id
             ORDER BY cnt DESC
             LIMIT 5
         ''')
@@ -1042,10 +1239,10 @@ def dashboard_admin_home():
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT c.name, SUM(t.weight_kg) as total_w
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.id
-        GROUP BY t.category_id
+        SELECT c.name, SUM(ds.weight_kg) as total_w
+        FROM daily_stats ds
+        JOIN categories c ON ds.category_id = c.id
+        GROUP BY ds.category_id
         ORDER BY total_w DESC
         LIMIT 10
     ''')
@@ -1073,6 +1270,25 @@ if 'user' not in st.session_state:
     st.session_state['user'] = None
 
 
+def _session_owner_id():
+    """Id of the account that logged in (the superuser while acting as another user)."""
+    return st.session_state.get('superuser_original_id') or st.session_state['user']['id']
+
+
+def _refresh_session_token():
+    """Replace the session token after the owner's password changed."""
+    if _session_owner_id() == st.session_state['user']['id']:
+        revoke_session_token(st.session_state.get('auth_token'))
+        st.session_state['auth_token'] = issue_session_token(_session_owner_id())
+
+
+def _clear_login():
+    revoke_session_token(st.session_state.pop('auth_token', None))
+    st.session_state['user'] = None
+    st.session_state.pop('superuser_original_id', None)
+    st.session_state.pop('superuser_original_name', None)
+
+
 def _display_role_label(role: str, uppercase: bool = False) -> str:
     """Return human-friendly role label while keeping stored values stable."""
     label_map = {
@@ -1253,13 +1469,75 @@ def clear_dummy_data(superuser_id):
         ('demo_admin', 'demo_warga%'),
     )
 
+    rebuild_daily_stats(cursor)
+
     conn.commit()
     conn.close()
+    cache.bump('transactions', 'committee_earnings', 'financial_movements', 'users', 'daily_stats')
 
     set_setting('dummy_data_active', '0')
     log_audit(superuser_id, 'DUMMY_DATA_OFF', 'Superuser mematikan data dummy demo')
     return True, "Data dummy berhasil dihapus"
 
+def _client_id():
+    """Client address of the browser connection running this script (see ratelimit.TRUSTED_PROXY_HOPS), else its session id."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return 'local'
+    try:
+        request = Runtime.instance().get_client(ctx.session_id).request
+        return ratelimit.client_key(request.remote_ip, request.headers.get_list('X-Forwarded-For'))
+    except (RuntimeError, AttributeError):
+        return ctx.session_id
+
+
+def _format_wait(seconds):
+    seconds = max(1, int(seconds + 0.999))
+    if seconds < 60:
+        return f"{seconds} detik"
+    return f"{(seconds + 59) // 60} menit"
+
+
+def _render_login_throttle_view():
+    """Accounts and clients currently locked out or rate limited, with a manual unlock."""
+    with st.expander("🚦 Pembatasan Login"):
+        st.caption(
+            f"Username dikunci setelah {ratelimit.FAILURE_THRESHOLD} kali gagal berturut-turut, "
+            f"mulai {ratelimit.LOCKOUT_BASE_SECONDS} detik dan berlipat dua setiap kegagalan berikutnya."
+        )
+        rows = ratelimit.throttled()
+        if not rows:
+            st.info("Tidak ada akun atau client yang sedang dibatasi.")
+            return
+        state_labels = {'locked': 'Dikunci', 'escalated': 'Riwayat gagal', 'rate_limited': 'Dibatasi'}
+        st.dataframe(
+            pd.DataFrame([
+                (
+                    'Username' if row['kind'] == 'user' else 'Client',
+                    row['key'],
+                    state_labels[row['state']],
+                    row['failures'] if row['failures'] is not None else '-',
+                    _format_wait(row['wait_seconds']) if row['wait_seconds'] else '-',
+                )
+                for row in rows
+            ], columns=['Jenis', 'Identitas', 'Status', 'Gagal Berturut', 'Sisa Waktu']),
+            use_container_width=True,
+            hide_index=True,
+        )
+        usernames = sorted({row['key'] for row in rows if row['kind'] == 'user'})
+        if usernames:
+            col_select, col_button = st.columns([2, 1])
+            with col_select:
+                selected = st.selectbox("Username", usernames, key="unlock_login_username")
+            with col_button:
+                st.markdown("<br>", unsafe_allow_html=True)
+                if st.button("🔓 Buka Kunci", key="unlock_login", use_container_width=True):
+                    ratelimit.unlock(selected)
+                    log_audit(st.session_state['user']['id'], 'UNLOCK_LOGIN', f"Unlocked login for {selected}")
+                    st.success(f"✅ Login {selected} dibuka kembali")
+                    st.rerun()
+
+
 def sidebar_login():
     """Display login form in sidebar"""
     st.sidebar.markdown("### 🔐 Login Akses")
@@ -1273,14 +1551,23 @@ def sidebar_login():
         
         if submitted:
             if username and password:
-                user = authenticate_user(username, password)
-                if user:
+                # Throttled attempts are rejected from memory, before any password hashing or query
+                wait_seconds = ratelimit.check(username, _client_id())
+                user = None if wait_seconds else authenticate_user(username, password)
+                if wait_seconds:
+                    st.error(f"⛔ Terlalu banyak percobaan login. Coba lagi dalam {_format_wait(wait_seconds)}.")
+                elif user:
+                    ratelimit.record_success(username)
                     st.session_state['user'] = user
+                    st.session_state['auth_token'] = issue_session_token(user['id'])
                     log_audit(user['id'], 'LOGIN', f"User {username} logged in")
                     st.success(f"✅ Login sukses!")
                     st.rerun()
                 else:
                     st.error("❌ Akun tidak ditemukan")
+                    lockout_seconds = ratelimit.record_failure(username)
+                    if lockout_seconds:
+                        st.warning(f"⚠️ Terlalu banyak percobaan gagal, akun dikunci selama {_format_wait(lockout_seconds)}.")
             else:
                 st.warning("⚠️ Isi username & password")
 
@@ -1437,36 +1724,16 @@ def dashboard_pengepul():
             else:
                 start_date = None
         
-        # Get performance statistics per category
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT c.name, c.price_per_kg as current_price,
-                   COUNT(t.id) as total_transactions,
-                   SUM(t.weight_kg) as total_weight,
-                   AVG(t.price_per_kg) as avg_price,
-                   SUM(t.total_amount) as total_revenue
-            FROM categories c
-            LEFT JOIN transactions t ON c.id = t.category_id
-        '''
-        
-        params = []
-        if start_date:
-            query += ' WHERE DATE(t.transaction_date) >= ?'
-            params.append(start_date.strftime('%Y-%m-%d'))
-        
-        query += ' GROUP BY c.id ORDER BY total_revenue DESC'
-        
-        cursor.execute(query, params)
-        category_performance = cursor.fetchall()
-        conn.close()
+        # Per-category totals grouped in SQL; every category is listed, sold or not
+        category_performance = analytics.category_breakdown(
+            analytics.load_category_totals(start_date, None), analytics.load_categories()
+        )
         
-        if category_performance:
+        if not category_performance.empty:
             # Summary metrics
-            total_trans = sum(cp['total_transactions'] or 0 for cp in category_performance)
-            total_weight = sum(cp['total_weight'] or 0 for cp in category_performance)
-            total_rev = sum(cp['total_revenue'] or 0 for cp in category_performance)
+            total_trans = int(category_performance['tx_count'].sum())
+            total_weight = category_performance['weight_kg'].sum()
+            total_rev = category_performance['total_amount'].sum()
             
             metric_col1, metric_col2, metric_col3 = st.columns(3)
             
@@ -1483,27 +1750,17 @@ def dashboard_pengepul():
             st.markdown("### Detail per Kategori")
             
             # Detailed table
-            df_performance = pd.DataFrame(
-                [(cp['name'], 
-                  f"Rp {cp['current_price']:,.0f}",
-                  cp['total_transactions'] or 0,
-                  f"{cp['total_weight'] or 0:.2f} Kg",
-                  f"Rp {cp['avg_price'] or 0:,.0f}",
-                  f"Rp {cp['total_revenue'] or 0:,.0f}") for cp in category_performance],
-                columns=['Kategori', 'Harga Saat Ini', 'Total Transaksi', 'Total Berat', 'Harga Rata-rata', 'Total Revenue']
+            _render_breakdown_table(
+                category_performance, 'category', 'Kategori',
+                columns=['category', 'price_per_kg', 'tx_count', 'weight_kg', 'avg_price', 'total_amount'],
             )
-            st.dataframe(df_performance, use_container_width=True, hide_index=True)
             
             # Chart - Top 5 categories by weight
             st.markdown("### Top 5 Kategori (Berdasarkan Berat)")
-            top_5_weight = sorted(category_performance, key=lambda x: x['total_weight'] or 0, reverse=True)[:5]
+            top_5_weight = category_performance.nlargest(5, 'weight_kg')
             
-            if top_5_weight:
-                chart_data = pd.DataFrame(
-                    [(cp['name'], cp['total_weight'] or 0) for cp in top_5_weight],
-                    columns=['Kategori', 'Berat (Kg)']
-                )
-                st.bar_chart(chart_data.set_index('Kategori'))
+            if top_5_weight['weight_kg'].any():
+                st.bar_chart(top_5_weight.set_index('category')['weight_kg'].rename('Berat (Kg)'))
         else:
             st.info("Belum ada data transaksi")
     
@@ -1526,46 +1783,32 @@ def dashboard_pengepul():
             selected_category_filter = st.selectbox("Filter Kategori", category_filter_options)
         
         # Get transactions
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT t.*, u.full_name as warga_name, c.name as category_name,
-                   p.full_name as processed_by_name
-            FROM transactions t
-            JOIN users u ON t.warga_id = u.id
-            JOIN categories c ON t.category_id = c.id
-            JOIN users p ON t.processed_by = p.id
-            WHERE DATE(t.transaction_date) BETWEEN ? AND ?
-        '''
-        params = [start_date_trans, end_date_trans]
-        
-        if selected_category_filter != "Semua Kategori":
-            query += ' AND c.name = ?'
-            params.append(selected_category_filter)
-        
-        query += ' ORDER BY t.transaction_date DESC LIMIT 100'
-        
-        cursor.execute(query, params)
-        transactions = cursor.fetchall()
-        conn.close()
+        category_ids = {c['name']: c['id'] for c in all_categories}
+        pengepul_filters = {
+            'start_date': start_date_trans.isoformat(),
+            'end_date': end_date_trans.isoformat(),
+            'category_id': category_ids.get(selected_category_filter),
+        }
+        transactions, next_token = get_transactions_page(
+            page_size=100,
+            page_token=_pager_token('pengepul_transactions', pengepul_filters),
+            **pengepul_filters,
+        )
         
         if transactions:
-            # Summary
-            total_transactions = len(transactions)
-            total_weight_trans = sum(t['weight_kg'] for t in transactions)
-            total_revenue_trans = sum(t['total_amount'] for t in transactions)
+            # Summary over the whole filtered period, not just this page
+            period_kpi = get_kpi_snapshot(start_date_trans, end_date_trans, pengepul_filters['category_id'])
             
             metric_col1, metric_col2, metric_col3 = st.columns(3)
             
             with metric_col1:
-                ui_metric_card("Jumlah Transaksi", total_transactions, icon="🧾")
+                ui_metric_card("Jumlah Transaksi", period_kpi['total_transactions'], icon="🧾")
             
             with metric_col2:
-                ui_metric_card("Total Berat", f"{total_weight_trans:.2f} Kg", icon="⚖️")
+                ui_metric_card("Total Berat", f"{period_kpi['total_weight']:.2f} Kg", icon="⚖️")
             
             with metric_col3:
-                ui_metric_card("Total Revenue", f"Rp {total_revenue_trans:,.0f}", icon="💰")
+                ui_metric_card("Total Revenue", f"Rp {period_kpi['total_revenue']:,.0f}", icon="💰")
             
             st.markdown("---")
             
@@ -1582,409 +1825,10 @@ def dashboard_pengepul():
                 columns=['Tanggal', 'Warga', 'Kategori', 'Berat', 'Harga/Kg', 'Total', 'Diproses Oleh', 'Catatan']
             )
             st.dataframe(df_trans, use_container_width=True, hide_index=True)
+            _render_pager('pengepul_transactions', next_token)
         else:
             st.info("Tidak ada transaksi pada periode dan filter yang dipilih")
 
-# Helpers for PDF laporan with charts
-# Helpers for PDF laporan with charts
-def _create_bar_chart(data, title, xlabel, color='#1E88E5', top_n=10, ascending=False):
-    """Create a horizontal bar chart."""
-    if not data:
-        return None
-
-    # Sort and slice
-    sorted_items = sorted(data.items(), key=lambda x: x[1], reverse=not ascending)[:top_n]
-    if not sorted_items:
-        return None
-    
-    # Reverse for plotting (bottom-to-top)
-    labels = [k for k, v in sorted_items][::-1]
-    values = [v for k, v in sorted_items][::-1]
-
-    fig, ax = plt.subplots(figsize=(7, 4))
-    bars = ax.barh(labels, values, color=color, alpha=0.8)
-    
-    # Value labels
-    for bar in bars:
-        width = bar.get_width()
-        label_x_pos = width + (max(values) * 0.01) if values else 0
-        ax.text(label_x_pos, bar.get_y() + bar.get_height()/2, f'{width:,.0f}', 
-                va='center', fontsize=8)
-
-    ax.set_title(title, fontsize=10, pad=10)
-    ax.set_xlabel(xlabel, fontsize=8)
-    ax.tick_params(axis='both', which='major', labelsize=8)
-    
-    # Remove borders
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    
-    plt.tight_layout()
-
-    buffer = io.BytesIO()
-    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=100)
-    plt.close(fig)
-    buffer.seek(0)
-    return buffer
-
-
-def _create_dual_line_chart(dates, sales, fees):
-    """Create a dual line chart for sales and committee revenue."""
-    if not dates:
-        return None
-
-    fig, ax1 = plt.subplots(figsize=(7, 4))
-
-    # Plot Sales (Total Transaction Value)
-    color = '#1E88E5'
-    ax1.set_xlabel('Tanggal', fontsize=8)
-    ax1.set_ylabel('Transaksi Penjualan (Rp)', color=color, fontsize=8)
-    line1 = ax1.plot(dates, sales, marker='o', color=color, linewidth=2, label='Transaksi')
-    ax1.tick_params(axis='y', labelcolor=color, labelsize=8)
-    ax1.tick_params(axis='x', labelsize=8, rotation=30)
-    ax1.grid(True, linestyle='--', alpha=0.3)
-
-    # Instantiate a second axes that shares the same x-axis
-    ax2 = ax1.twinx()
-    color = '#4CAF50'
-    ax2.set_ylabel('Pendapatan Panitia (Rp)', color=color, fontsize=8)
-    line2 = ax2.plot(dates, fees, marker='s', color=color, linewidth=2, linestyle='--', label='Pendapatan Panitia')
-    ax2.tick_params(axis='y', labelcolor=color, labelsize=8)
-
-    # Added title and legend
-    plt.title("Tren Transaksi Penjualan vs Pendapatan Panitia", fontsize=10, pad=10)
-    
-    # Legend
-    lines = line1 + line2
-    labels = [l.get_label() for l in lines]
-    ax1.legend(lines, labels, loc='upper left', fontsize=8)
-
-    plt.tight_layout()
-
-    buffer = io.BytesIO()
-    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=100)
-    plt.close(fig)
-    buffer.seek(0)
-    return buffer
-
-
-def _buffer_to_tempfile(buffer, suffix=".png"):
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    tmp.write(buffer.getvalue())
-    tmp.close()
-    return tmp.name
-
-
-def generate_pdf_laporan(transactions, start_date, end_date):
-    start_label = start_date.strftime("%d %B %Y") if start_date else "-"
-    end_label = end_date.strftime("%d %B %Y") if end_date else "-"
-
-    # --- Data Processing ---
-    total_transactions = len(transactions)
-    total_weight = sum((t["weight_kg"] or 0) for t in transactions)
-    total_revenue = sum((t["total_amount"] or 0) for t in transactions)
-    total_fee = sum((t["committee_fee"] or 0) for t in transactions)
-    warga_unique = len({t["warga_id"] for t in transactions})
-
-    # Aggregations
-    category_sales = {} # name -> total_amount
-    category_weights = {} # name -> total_weight
-    warga_activity = {} # name -> count
-    daily_sales = {} # date_str -> amount
-    daily_fees = {} # date_str -> amount
-    
-    for t in transactions:
-        # Category stats
-        cat_name = t["category_name"]
-        amount = t["total_amount"] or 0
-        weight = t["weight_kg"] or 0
-        category_sales[cat_name] = category_sales.get(cat_name, 0) + amount
-        category_weights[cat_name] = category_weights.get(cat_name, 0) + weight
-
-        # Warga stats
-        w_name = t["warga_name"]
-        warga_activity[w_name] = warga_activity.get(w_name, 0) + 1
-
-        # Daily stats
-        d_key = str(t["transaction_date"])[:10]
-        daily_sales[d_key] = daily_sales.get(d_key, 0) + amount
-        daily_fees[d_key] = daily_fees.get(d_key, 0) + (t["committee_fee"] or 0)
-
-    # Prepare chart data
-    sorted_dates = sorted(list(set(daily_sales.keys()) | set(daily_fees.keys())))
-    date_objs = [datetime.strptime(d, "%Y-%m-%d") for d in sorted_dates]
-    sales_values = [daily_sales.get(d, 0) for d in sorted_dates]
-    fee_values = [daily_fees.get(d, 0) for d in sorted_dates]
-
-    # Generate Charts
-    chart_best_cat = _create_bar_chart(category_sales, "Top 10 Kategori Terlaku (Berdasarkan Nilai Rp)", "Total Penjualan (Rp)", top_n=10, ascending=False)
-    chart_worst_cat = _create_bar_chart(category_sales, "Top 10 Kategori Tidak Laku (Berdasarkan Nilai Rp)", "Total Penjualan (Rp)", color='#FF5722', top_n=10, ascending=True)
-    chart_active_warga = _create_bar_chart(warga_activity, "Top 10 Warga Teraktif", "Jumlah Transaksi", color='#4CAF50', top_n=10, ascending=False)
-    chart_trend = _create_dual_line_chart(date_objs, sales_values, fee_values)
-
-    # --- PDF Generation ---
-    class LaporanPDF(FPDF):
-        def header(self):
-            # No header on cover page (page 1)
-            if self.page_no() > 1:
-                self.set_font('Helvetica', 'I', 8)
-                self.set_text_color(128)
-                self.cell(0, 10, 'Bank Sampah Wani Luru RW 1 - Laporan Kinerja Operasional', 0, 0, 'R')
-                self.ln(10)
-        
-        def footer(self):
-            self.set_y(-15)
-            self.set_font('Helvetica', 'I', 8)
-            self.set_text_color(128)
-            self.cell(0, 10, f'Halaman {self.page_no()}', 0, 0, 'C')
-
-    pdf = LaporanPDF()
-    pdf.set_auto_page_break(auto=True, margin=20)
-
-    # 1. Halaman Judul (Cover)
-    pdf.add_page()
-    pdf.set_draw_color(30, 136, 229) # Blue border
-    pdf.set_line_width(1)
-    pdf.rect(10, 10, 190, 277)
-    
-    pdf.ln(60)
-    pdf.set_font("Helvetica", "B", 24)
-    pdf.set_text_color(13, 71, 161) # Dark Blue
-    pdf.multi_cell(0, 15, "LAPORAN KINERJA\nBANK SAMPAH WANI LURU", align='C')
-    
-    pdf.ln(20)
-    pdf.set_font("Helvetica", "", 14)
-    pdf.set_text_color(0)
-    pdf.cell(0, 10, f"Periode: {start_label} s.d. {end_label}", ln=True, align='C')
-    
-    pdf.ln(80)
-    pdf.set_font("Helvetica", "", 12)
-    pdf.cell(0, 8, "Disusun Oleh:", ln=True, align='C')
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Tim Pengelola Bank Sampah Wani Luru RW 1", ln=True, align='C')
-    pdf.ln(5)
-    pdf.set_font("Helvetica", "", 12)
-    pdf.cell(0, 8, f"Waniluru, {datetime.now().strftime('%d %B %Y')}", ln=True, align='C')
-
-    # 2. Kata Pengantar
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, "KATA PENGANTAR", ln=True, align='C')
-    pdf.ln(10)
-    
-    pdf.set_font("Helvetica", "", 11)
-    intro_text = (
-        "Puji syukur kami panjatkan ke hadirat Tuhan Yang Maha Esa atas rahmat dan karunia-Nya, "
-        "sehingga kami dapat menyelesaikan Laporan Kinerja Operasional Bank Sampah Wani Luru RW 1 ini dengan baik. "
-        "Laporan ini disusun sebagai bentuk pertanggungjawaban dan transparansi pengelolaan bank sampah kepada "
-        "seluruh warga dan pemangku kepentingan.\n\n"
-        "Melalui laporan ini, kami menyajikan data dan analisis mengenai aktivitas pengelolaan sampah, "
-        "termasuk volume sampah yang tereduksi, nilai ekonomi yang dihasilkan, serta partisipasi warga "
-        "selama periode pelaporan. Kami berharap laporan ini dapat menjadi bahan evaluasi untuk meningkatkan "
-        "kinerja dan layanan Bank Sampah Wani Luru RW 1 ke depannya.\n\n"
-        "Terima kasih kami sampaikan kepada seluruh warga yang telah aktif berpartisipasi, serta semua pihak "
-        "yang telah mendukung operasional bank sampah ini."
-    )
-    pdf.multi_cell(0, 7, intro_text)
-    
-    pdf.ln(20)
-    pdf.cell(0, 7, f"Waniluru, {datetime.now().strftime('%d %B %Y')}", ln=True, align='R')
-    pdf.ln(15)
-    pdf.cell(0, 7, "Pengelola", ln=True, align='R')
-
-    # 3. Daftar Isi (Simulated)
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, "DAFTAR ISI", ln=True, align='C')
-    pdf.ln(10)
-    
-    pdf.set_font("Helvetica", "", 11)
-    toc = [
-        ("BAB I PENDAHULUAN", "4"),
-        ("BAB II LAPORAN UTAMA & DATA", "5"),
-        ("BAB III ANALISIS VISUAL", "6"),
-        ("BAB IV PENUTUP", "7"),
-        ("LAMPIRAN", "8"),
-    ]
-    for title, page in toc:
-        pdf.cell(170, 8, title, 0, 0)
-        pdf.cell(20, 8, page, 0, 1, 'R')
-        pdf.line(pdf.get_x(), pdf.get_y(), pdf.get_x() + 190, pdf.get_y()) # Dotted line simulation logic skipped for simplicity
-
-    # 4. Pendahuluan
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, "BAB I", ln=True, align='C')
-    pdf.cell(0, 10, "PENDAHULUAN", ln=True, align='C')
-    pdf.ln(5)
-    
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "1.1 Latar Belakang", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    latar_belakang = (
-        "Permasalahan sampah merupakan isu lingkungan yang memerlukan perhatian serius dan penanganan "
-        "yang berkelanjutan. Bank Sampah Wani Luru RW 1 hadir sebagai solusi berbasis masyarakat untuk "
-        "mengelola sampah secara mandiri, mengubah sampah menjadi sumber daya ekonomi, dan membangun "
-        "kesadaran lingkungan di tengah masyarakat."
-    )
-    pdf.multi_cell(0, 7, latar_belakang)
-    pdf.ln(5)
-    
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "1.2 Tujuan", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    tujuan = (
-        "Laporan ini disusun dengan tujuan:\n"
-        "1. Memberikan gambaran kinerja operasional Bank Sampah Wani Luru RW 1.\n"
-        "2. Melaporkan data kuantitatif volume sampah dan nilai transaksi.\n"
-        "3. Mengevaluasi tingkat partisipasi warga dalam program bank sampah.\n"
-        "4. Sebagai bahan pertimbangan dalam pengambilan keputusan strategis."
-    )
-    pdf.multi_cell(0, 7, tujuan)
-
-    # 5. Isi/Laporan Utama
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, "BAB II", ln=True, align='C')
-    pdf.cell(0, 10, "LAPORAN UTAMA & DATA", ln=True, align='C')
-    pdf.ln(5)
-
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "2.1 Ringkasan Kinerja", ln=True)
-    pdf.ln(2)
-    
-    # Metric Grid Layout
-    pdf.set_font("Helvetica", "", 11)
-    col_width = 95
-    line_height = 10
-    
-    pdf.cell(col_width, line_height, f"Total Transaksi: {total_transactions}", border=1)
-    pdf.cell(col_width, line_height, f"Nasabah Aktif: {warga_unique} Orang", border=1, ln=True)
-    pdf.cell(col_width, line_height, f"Total Berat Terkumpul: {total_weight:,.2f} Kg", border=1)
-    pdf.cell(col_width, line_height, f"Volume Rata-rata/Hari: {total_weight/max(1, (end_date-start_date).days):,.2f} Kg", border=1, ln=True)
-    pdf.cell(col_width, line_height, f"Total Omzet Penjualan: Rp {total_revenue:,.0f}", border=1)
-    pdf.cell(col_width, line_height, f"Pendapatan Bersih Panitia: Rp {total_fee:,.0f}", border=1, ln=True)
-    
-    pdf.ln(10)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "2.2 Narasi Operasional", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    narasi_ops = (
-        f"Pada periode pelaporan ini, Bank Sampah Wani Luru RW 1 telah berhasil memfasilitasi {total_transactions} transaksi "
-        f"penyetoran sampah. Hal ini menunjukkan antusiasme warga yang positif. Total nilai ekonomi yang berputar "
-        f"mencapai Rp {total_revenue:,.0f}, dengan kontribusi pendapatan untuk operasional (fee) sebesar Rp {total_fee:,.0f}. "
-        f"Sampah jenis {sorted(category_sales.items(), key=lambda x: x[1], reverse=True)[0][0] if category_sales else 'Umum'} "
-        f"menjadi komoditas dengan nilai transaksi tertinggi."
-    )
-    pdf.multi_cell(0, 7, narasi_ops)
-
-    # 6. Analisis Visual (Charts)
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, "BAB III", ln=True, align='C')
-    pdf.cell(0, 10, "ANALISIS VISUAL", ln=True, align='C')
-    pdf.ln(5)
-
-    if chart_trend:
-        img_path = _buffer_to_tempfile(chart_trend)
-        pdf.image(img_path, x=15, w=180)
-        os.remove(img_path)
-        pdf.ln(5)
-        pdf.set_font("Helvetica", "I", 10)
-        pdf.cell(0, 5, "Gambar 1. Grafik tren transaksi harian menunjukkan fluktuasi aktivitas penyetoran.", ln=True, align='C')
-        pdf.ln(10)
-
-    # Grid of charts
-    y_start = pdf.get_y()
-    
-    if chart_best_cat:
-        img_path = _buffer_to_tempfile(chart_best_cat)
-        pdf.image(img_path, x=10, y=y_start, w=90)
-        os.remove(img_path)
-
-    if chart_worst_cat:
-        img_path = _buffer_to_tempfile(chart_worst_cat)
-        pdf.image(img_path, x=110, y=y_start, w=90)
-        os.remove(img_path)
-
-    pdf.set_y(y_start + 70) 
-    
-    pdf.ln(5)
-    pdf.cell(0, 5, "Gambar 2. Perbandingan kategori sampah berdasarkan nilai ekonomi (Tertinggi vs Terendah).", ln=True, align='C')
-    
-    pdf.add_page()
-    if chart_active_warga:
-        img_path = _buffer_to_tempfile(chart_active_warga)
-        pdf.image(img_path, x=55, w=100)
-        os.remove(img_path)
-        pdf.ln(5)
-        pdf.cell(0, 5, "Gambar 3. Sepuluh warga dengan frekuensi penyetoran teraktif.", ln=True, align='C')
-
-    # 7. Penutup
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, "BAB IV", ln=True, align='C')
-    pdf.cell(0, 10, "PENUTUP", ln=True, align='C')
-    pdf.ln(5)
-
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "4.1 Kesimpulan", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    
-    top_cat_name = sorted(category_sales.items(), key=lambda x: x[1], reverse=True)[0][0] if category_sales else "-"
-    kesimpulan = (
-        "Berdasarkan data yang telah dipaparkan, dapat disimpulkan bahwa:\n"
-        f"1. Kinerja bank sampah berjalan baik dengan partisipasi {warga_unique} nasabah aktif.\n"
-        f"2. Jenis sampah '{top_cat_name}' memiliki nilai ekonomi paling signifikan.\n"
-        "3. Sistem administrasi dan pencatatan transaksi telah berjalan transparan."
-    )
-    pdf.multi_cell(0, 7, kesimpulan)
-    pdf.ln(5)
-
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "4.2 Saran", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    saran = (
-        "1. Perlu dilakukan sosialisasi kembali untuk kategori sampah yang masih rendah penyetorannya.\n"
-        "2. Meningkatkan apresiasi kepada warga yang aktif untuk memotivasi warga lainnya.\n"
-        "3. Mempertahankan konsistensi jadwal pelayanan dan akurasi penimbangan."
-    )
-    pdf.multi_cell(0, 7, saran)
-
-    # 8. Lampiran (Table)
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, "LAMPIRAN", ln=True, align='C')
-    pdf.ln(5)
-    
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 8, "Rincian Data Penjualan per Kategori", ln=True)
-    pdf.ln(2)
-
-    # Table Header
-    pdf.set_fill_color(220, 220, 220)
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(10, 8, "No", border=1, align='C', fill=True)
-    pdf.cell(80, 8, "Nama Kategori", border=1, fill=True)
-    pdf.cell(40, 8, "Total Berat", border=1, align='R', fill=True)
-    pdf.cell(60, 8, "Total Penjualan", border=1, align='R', fill=True, ln=True)
-
-    # Table Content
-    pdf.set_font("Helvetica", "", 10)
-    sorted_cats = sorted(category_sales.items(), key=lambda x: x[1], reverse=True)
-    
-    for idx, (cat_name, rev) in enumerate(sorted_cats, 1):
-        weight = category_weights.get(cat_name, 0)
-        pdf.cell(10, 7, str(idx), border=1, align='C')
-        pdf.cell(80, 7, cat_name[:35], border=1)
-        pdf.cell(40, 7, f"{weight:,.2f} Kg", border=1, align='R')
-        pdf.cell(60, 7, f"Rp {rev:,.0f}", border=1, align='R', ln=True)
-
-    pdf_buffer = io.BytesIO(_pdf_output_bytes(pdf))
-    pdf_buffer.seek(0)
-    return pdf_buffer
-
-
 def _render_transaction_input_form():
     """Helper to render the transaction input form."""
     st.subheader("➕ Input Transaksi Penjualan Sampah")
@@ -2077,9 +1921,7 @@ def _render_transaction_input_form():
                     total_fee_preview += fee
                 items.append({
                     'category_id': cat_data['id'],
-                    'category_name': cat_data['name'],
-                    'weight': weight,
-                    'price': cat_data['price_per_kg'],
+                    'weight_kg': weight,
                 })
 
             total_net_preview = total_preview - total_fee_preview
@@ -2100,34 +1942,23 @@ def _render_transaction_input_form():
             submitted = st.form_submit_button("🚀 Proses Transaksi Sekarang", use_container_width=True, type="primary")
 
             if submitted:
-                invalid = [item for item in items if item['weight'] <= 0]
+                invalid = [item for item in items if item['weight_kg'] <= 0]
                 if invalid:
                     st.warning("⚠️ Semua berat harus lebih dari 0!")
                 else:
                     warga_id = warga_options[selected_warga]
                     processed_by = st.session_state['user']['id']
-                    summary_rows = []
-                    total_amount = 0
-                    total_fee = 0
-                    total_net = 0
                     with st.spinner("⏳ Memproses transaksi multi-item..."):
-                        for item in items:
-                            success, transaction_id, details = create_transaction(
-                                warga_id, item['category_id'], item['weight'], processed_by, notes, batch_id=batch_id
-                            )
-                            if success:
-                                summary_rows.append({
-                                    'id': transaction_id,
-                                    'kategori': item['category_name'],
-                                    'berat': item['weight'],
-                                    'harga': item['price'],
-                                    'total': details['total_amount'],
-                                    'fee': details['committee_fee'],
-                                    'net': details['net_amount'],
-                                })
-                                total_amount += details['total_amount']
-                                total_fee += details['committee_fee']
-                                total_net += details['net_amount']
+                        success, result = create_transaction_batch(
+                            warga_id, items, processed_by, notes, batch_id=batch_id
+                        )
+                    if not success:
+                        st.error(f"❌ {result}")
+                        return
+                    summary_rows = result['items']
+                    total_amount = result['total_amount']
+                    total_fee = result['committee_fee']
+                    total_net = result['net_amount']
 
                     log_audit(processed_by, 'CREATE_TRANSACTION',
                               f"Multi-item transaction ({len(items)} items) for warga {warga_id}")
@@ -2143,9 +1974,9 @@ def _render_transaction_input_form():
                     item_df = pd.DataFrame(
                         [
                             (
-                                row['id'], row['kategori'], f"{row['berat']:.2f} Kg",
-                                f"Rp {row['harga']:,.0f}", f"Rp {row['total']:,.0f}",
-                                f"Rp {row['fee']:,.0f}", f"Rp {row['net']:,.0f}",
+                                row['id'], row['category_name'], f"{row['weight_kg']:.2f} Kg",
+                                f"Rp {row['price_per_kg']:,.0f}", f"Rp {row['total_amount']:,.0f}",
+                                f"Rp {row['committee_fee']:,.0f}", f"Rp {row['net_amount']:,.0f}",
                             )
                             for row in summary_rows
                         ],
@@ -2167,71 +1998,14 @@ def _render_transaction_input_form():
                     processor = st.session_state['user']['full_name']
                     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-                    class ReceiptPDF(FPDF):
-                        def header(self):
-                            self.set_fill_color(76, 175, 80)
-                            self.rect(10, 8, 190, 18, 'F')
-                            self.set_text_color(255, 255, 255)
-                            self.set_font('Helvetica', 'B', 14)
-                            self.cell(0, 10, 'Nota Transaksi Bank Sampah', ln=True, align='C')
-                            self.set_font('Helvetica', '', 10)
-                            self.cell(0, 6, 'Bank Sampah Wani Luru RW 1', ln=True, align='C')
-                            self.ln(5)
-                            self.set_text_color(0, 0, 0)
-
-                    pdf = ReceiptPDF()
-                    pdf.add_page()
-                    pdf.set_auto_page_break(auto=True, margin=15)
-
-                    pdf.set_font('Helvetica', '', 11)
-                    pdf.cell(0, 8, f"Warga: {warga_name}", ln=True)
-                    pdf.cell(0, 8, f"Diproses oleh: {processor}", ln=True)
-                    pdf.cell(0, 8, f"Tanggal: {timestamp}", ln=True)
-                    if notes:
-                        pdf.multi_cell(0, 8, f"Catatan: {notes}")
-                    pdf.ln(4)
-
-                    w_id, w_cat, w_weight, w_price, w_total, w_fee, w_net = 12, 55, 22, 28, 28, 22, 23
-                    pdf.set_fill_color(76, 175, 80)
-                    pdf.set_text_color(255, 255, 255)
-                    pdf.set_font('Helvetica', 'B', 10)
-                    pdf.cell(w_id, 8, 'ID', border=1, align='C', fill=True)
-                    pdf.cell(w_cat, 8, 'Kategori', border=1, fill=True)
-                    pdf.cell(w_weight, 8, 'Berat', border=1, align='R', fill=True)
-                    pdf.cell(w_price, 8, 'Harga/Kg', border=1, align='R', fill=True)
-                    pdf.cell(w_total, 8, 'Total', border=1, align='R', fill=True)
-                    pdf.cell(w_fee, 8, 'Fee', border=1, align='R', fill=True)
-                    pdf.cell(w_net, 8, 'Diterima', border=1, ln=True, align='R', fill=True)
-
-                    pdf.set_text_color(0, 0, 0)
-                    pdf.set_font('Helvetica', '', 10)
-                    for row in summary_rows:
-                        pdf.cell(w_id, 8, str(row['id']), border=1, align='C')
-                        pdf.cell(w_cat, 8, row['kategori'][:24], border=1)
-                        pdf.cell(w_weight, 8, f"{row['berat']:.2f} Kg", border=1, align='R')
-                        pdf.cell(w_price, 8, f"Rp {row['harga']:,.0f}", border=1, align='R')
-                        pdf.cell(w_total, 8, f"Rp {row['total']:,.0f}", border=1, align='R')
-                        pdf.cell(w_fee, 8, f"Rp {row['fee']:,.0f}", border=1, align='R')
-                        pdf.cell(w_net, 8, f"Rp {row['net']:,.0f}", border=1, ln=True, align='R')
-
-                    pdf.set_fill_color(232, 245, 233)
-                    pdf.set_font('Helvetica', 'B', 10)
-                    pdf.cell(w_id + w_cat + w_weight + w_price, 8, 'Total Kotor', border=1, fill=True)
-                    pdf.cell(w_total + w_fee + w_net, 8, f"Rp {total_amount:,.0f}", border=1, ln=True, align='R', fill=True)
-                    pdf.cell(w_id + w_cat + w_weight + w_price, 8, 'Fee Admin (10%)', border=1, fill=True)
-                    pdf.cell(w_total + w_fee + w_net, 8, f"Rp {total_fee:,.0f}", border=1, ln=True, align='R', fill=True)
-                    pdf.cell(w_id + w_cat + w_weight + w_price, 8, 'Diterima Warga', border=1, fill=True)
-                    pdf.cell(w_total + w_fee + w_net, 8, f"Rp {total_net:,.0f}", border=1, ln=True, align='R', fill=True)
-
-                    pdf.ln(6)
-                    pdf.set_font('Helvetica', 'B', 11)
-                    pdf.set_text_color(76, 175, 80)
-                    pdf.cell(0, 8, 'Go Green', ln=True)
-                    pdf.set_text_color(0, 0, 0)
-                    pdf.set_font('Helvetica', '', 9)
-                    pdf.multi_cell(0, 6, "Kurangi penggunaan kertas, simpan nota ini secara digital.")
-
-                    pdf_data = _pdf_output_bytes(pdf)
+                    pdf_data = receipts.render_receipt({
+                        'batch_id': batch_id,
+                        'warga_name': warga_name,
+                        'processed_by_name': processor,
+                        'notes': notes,
+                        'transaction_date': timestamp,
+                        'items': summary_rows,
+                    })
                     st.session_state['last_pdf_data'] = pdf_data
                     st.session_state['last_pdf_name'] = f"nota_{summary_rows[0]['id']}.pdf"
 
@@ -2357,6 +2131,123 @@ def _render_input_schedule_settings():
                 log_audit(st.session_state['user']['id'], 'UPDATE_SETTINGS', "Updated input schedule configuration")
                 st.success("✅ Jadwal berhasil disimpan")
 
+def _receipt_digest(batch_key, data):
+    """Content address of a history receipt: changes whenever any printed field of the batch changes."""
+    fields = [batch_key, data['warga_name'], data['processed_by_name'], data['notes'], data['transaction_date']]
+    for it in data['items']:
+        fields.append((it['id'], it['category_name'], it['weight_kg'], it['price_per_kg'],
+                       it['total_amount'], it['committee_fee'], it['net_amount']))
+    return hashlib.sha256(repr(fields).encode()).hexdigest()
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _render_history_receipt(receipt_digest, _batch):
+    """Build the PDF receipt of one history batch; cached by its content digest."""
+    # Underscored args are not hashed by st.cache_data: receipt_digest alone is the cache key
+    return receipts.render_receipt(_batch)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _render_history_receipts(receipt_digests, _batches):
+    """Build one printable PDF holding every receipt of a history page; cached by the tuple of digests."""
+    return receipts.render_receipts(_batches)
+
+
+def _render_job_status(job_key, empty_message="Tidak ada data untuk filter yang dipilih."):
+    """Status, progress and download of the job whose id is stored in session_state[job_key]."""
+    job_id = st.session_state.get(job_key)
+    if not job_id:
+        return
+    job = jobs.get_job(job_id)
+    if job is None:
+        st.info("File hasil sudah kedaluwarsa, silakan buat ulang.")
+        st.session_state.pop(job_key, None)
+        return
+
+    status_label = jobs.STATUS_LABELS.get(job['status'], job['status'])
+    if job['status'] in ('queued', 'running'):
+        total = job['progress_total']
+        fraction = min(job['progress_done'] / total, 1.0) if total else 0.0
+        progress_text = f"{status_label} ({job['progress_done']}/{total})" if total else status_label
+        st.progress(fraction, text=progress_text)
+        st.button("🔄 Perbarui Status", key=f"{job_key}_refresh")
+    elif job['status'] == 'failed':
+        st.error(f"❌ {status_label}: {job['error']}")
+    else:
+        path = jobs.artifact_path(job)
+        if path is None:
+            st.info(empty_message)
+            return
+        with open(path, 'rb') as artifact:
+            st.download_button(
+                label=f"⬇️ Download {job['artifact_name'] or os.path.basename(path)}",
+                data=artifact,
+                file_name=job['artifact_name'] or os.path.basename(path),
+                mime=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                type="primary",
+                use_container_width=True,
+                key=f"{job_key}_download",
+            )
+        st.caption(f"Tersedia sampai {job['expires_at']}")
+
+
+def _render_receipt_export(filters):
+    """Bulk download of every receipt matching the history filters, built by a background job."""
+    with st.expander("📦 Export Semua Nota (sesuai filter)"):
+        fmt_label = st.radio(
+            "Format Export",
+            ["ZIP (satu PDF per nota)", "PDF gabungan (satu nota per halaman)"],
+            horizontal=True,
+            key="receipt_export_format",
+            help=f"ZIP ditulis bertahap ke file sementara; PDF gabungan dibatasi {receipts.PDF_BATCH_LIMIT} nota.",
+        )
+        if st.button("📦 Buat Export Nota", key="start_receipt_export"):
+            fmt = 'zip' if fmt_label.startswith('ZIP') else 'pdf'
+            if fmt == 'pdf' and count_transaction_batches(**filters) > receipts.PDF_BATCH_LIMIT:
+                st.info(f"Lebih dari {receipts.PDF_BATCH_LIMIT} nota, export dibuat sebagai ZIP.")
+                fmt = 'zip'
+            st.session_state['receipt_export_job'] = jobs.submit(
+                f'receipts_{fmt}',
+                filters,
+                created_by=st.session_state['user']['id'],
+                artifact_name=f"nota_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}",
+            )
+        _render_job_status('receipt_export_job')
+
+
+def _render_data_export():
+    """Full-table export (CSV/XLSX/Parquet) over a date range, streamed to a file by a background job."""
+    st.markdown("### 📤 Export Data")
+    col1, col2 = st.columns(2)
+    with col1:
+        table = st.selectbox(
+            "Data", list(exports.EXPORTS), format_func=lambda name: exports.EXPORTS[name]['label'],
+            key="data_export_table",
+        )
+    with col2:
+        fmt = st.selectbox(
+            "Format", list(exports.FORMATS), format_func=exports.FORMATS.get, key="data_export_format",
+            help="Parquet paling ringkas untuk analisis lanjutan; Excel dibagi ke beberapa sheet bila melebihi batas baris.",
+        )
+    col3, col4 = st.columns(2)
+    with col3:
+        start_date = st.date_input("Dari Tanggal", value=datetime.now() - timedelta(days=30), key="data_export_start")
+    with col4:
+        end_date = st.date_input("Sampai Tanggal", value=datetime.now(), key="data_export_end")
+
+    if st.button("📤 Buat Export Data", key="start_data_export"):
+        if end_date < start_date:
+            st.error("Tanggal akhir tidak boleh lebih awal dari tanggal mulai")
+        else:
+            st.session_state['data_export_job'] = jobs.submit(
+                f'export_{fmt}',
+                {'table': table, 'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()},
+                created_by=st.session_state['user']['id'],
+                artifact_name=f"{table}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{fmt}",
+            )
+    _render_job_status('data_export_job')
+
+
 def _render_admin_tab_transaksi(tab_transaksi):
     """Shared transaksi tab for admin-like roles (admin, panitia)."""
     with tab_transaksi:
@@ -2398,31 +2289,39 @@ def _render_admin_tab_transaksi(tab_transaksi):
                 if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
                     start_date, end_date = date_range
 
-            transactions = get_transactions(
-                warga_id=selected_warga_id,
-                limit=200,
-                start_date=start_date.isoformat() if start_date else None,
-                end_date=end_date.isoformat() if end_date else None,
+            history_filters = {
+                'warga_id': selected_warga_id,
+                'start_date': start_date.isoformat() if start_date else None,
+                'end_date': end_date.isoformat() if end_date else None,
+            }
+            _render_receipt_export(history_filters)
+
+            transactions, next_token = get_transactions_page(
+                page_size=50,
+                page_token=_pager_token('transaction_history', history_filters),
+                **history_filters,
             )
 
             if transactions:
-                grouped = {}
-                for t in transactions:
-                    key = t['batch_id'] if t['batch_id'] else f"single-{t['id']}"
-                    if key not in grouped:
-                        grouped[key] = {
-                            'batch_id': key,
-                            'warga_name': t['warga_name'],
-                            'processed_by_name': t['processed_by_name'],
-                            'notes': t['notes'],
-                            'transaction_date': t['transaction_date'],
-                            'items': [],
-                        }
-                    grouped[key]['items'].append(t)
-
-                for batch_key, data in grouped.items():
-                    total_amount = sum(it['total_amount'] for it in data['items'])
-                    total_fee = sum(it['committee_fee'] for it in data['items'])
+                batches = receipts.group_batches(transactions)
+                digests = tuple(_receipt_digest(batch['batch_id'], batch) for batch in batches)
+                page_ready_key = "receipt_page_ready"
+                if st.session_state.get(page_ready_key) != digests:
+                    if st.button("🖨️ Siapkan Semua Nota Halaman Ini (PDF)", key="prepare_receipt_page"):
+                        st.session_state[page_ready_key] = digests
+                        st.rerun()
+                else:
+                    st.download_button(
+                        label=f"⬇️ Download {len(batches)} Nota (PDF)",
+                        data=_render_history_receipts(digests, batches),
+                        file_name="nota_halaman.pdf",
+                        mime="application/pdf",
+                        help="Satu PDF berisi semua nota pada halaman ini, satu nota per halaman",
+                        key="download_receipt_page",
+                    )
+
+                for data, receipt_digest in zip(batches, digests):
+                    batch_key = data['batch_id']
                     total_net = sum(it['net_amount'] for it in data['items'])
                     total_weight = sum(it['weight_kg'] for it in data['items'])
                     with st.expander(f"#{batch_key} | {data['warga_name']} | {len(data['items'])} item | {total_weight:.2f} Kg | Rp {total_net:,.0f}"):
@@ -2430,81 +2329,23 @@ def _render_admin_tab_transaksi(tab_transaksi):
                         st.write(f"Diproses oleh: {data['processed_by_name']}")
                         st.write(f"Catatan: {data['notes'] or '-'}")
 
-                        class SingleReceiptPDF(FPDF):
-                            def header(self):
-                                self.set_fill_color(76, 175, 80)
-                                self.rect(10, 8, 190, 18, 'F')
-                                self.set_text_color(255, 255, 255)
-                                self.set_font('Helvetica', 'B', 14)
-                                self.cell(0, 10, 'Nota Transaksi Bank Sampah', ln=True, align='C')
-                                self.set_font('Helvetica', '', 10)
-                                self.cell(0, 6, 'Bank Sampah Wani Luru RW 1', ln=True, align='C')
-                                self.ln(5)
-                                self.set_text_color(0, 0, 0)
-
-                        pdf = SingleReceiptPDF()
-                        pdf.add_page()
-                        pdf.set_auto_page_break(auto=True, margin=15)
-
-                        pdf.set_font('Helvetica', '', 11)
-                        pdf.cell(0, 8, f"Batch/Transaksi: {batch_key}", ln=True)
-                        pdf.cell(0, 8, f"Warga: {data['warga_name']}", ln=True)
-                        pdf.cell(0, 8, f"Diproses oleh: {data['processed_by_name']}", ln=True)
-                        pdf.cell(0, 8, f"Tanggal: {data['transaction_date']}", ln=True)
-                        if data['notes']:
-                            pdf.multi_cell(0, 8, f"Catatan: {data['notes']}")
-                        pdf.ln(4)
-
-                        w_id, w_cat, w_weight, w_price, w_total, w_fee, w_net = 12, 55, 22, 28, 28, 22, 23
-                        pdf.set_fill_color(76, 175, 80)
-                        pdf.set_text_color(255, 255, 255)
-                        pdf.set_font('Helvetica', 'B', 10)
-                        pdf.cell(w_id, 8, 'ID', border=1, align='C', fill=True)
-                        pdf.cell(w_cat, 8, 'Kategori', border=1, fill=True)
-                        pdf.cell(w_weight, 8, 'Berat', border=1, align='R', fill=True)
-                        pdf.cell(w_price, 8, 'Harga/Kg', border=1, align='R', fill=True)
-                        pdf.cell(w_total, 8, 'Total', border=1, align='R', fill=True)
-                        pdf.cell(w_fee, 8, 'Fee', border=1, align='R', fill=True)
-                        pdf.cell(w_net, 8, 'Diterima', border=1, ln=True, align='R', fill=True)
-
-                        pdf.set_text_color(0, 0, 0)
-                        pdf.set_font('Helvetica', '', 10)
-                        for it in data['items']:
-                            pdf.cell(w_id, 8, str(it['id']), border=1, align='C')
-                            pdf.cell(w_cat, 8, it['category_name'][:24], border=1)
-                            pdf.cell(w_weight, 8, f"{it['weight_kg']:.2f} Kg", border=1, align='R')
-                            pdf.cell(w_price, 8, f"Rp {it['price_per_kg']:,.0f}", border=1, align='R')
-                            pdf.cell(w_total, 8, f"Rp {it['total_amount']:,.0f}", border=1, align='R')
-                            pdf.cell(w_fee, 8, f"Rp {it['committee_fee']:,.0f}", border=1, align='R')
-                            pdf.cell(w_net, 8, f"Rp {it['net_amount']:,.0f}", border=1, ln=True, align='R')
-
-                        pdf.set_fill_color(232, 245, 233)
-                        pdf.set_font('Helvetica', 'B', 10)
-                        pdf.cell(w_id + w_cat + w_weight + w_price, 8, 'Total Kotor', border=1, fill=True)
-                        pdf.cell(w_total + w_fee + w_net, 8, f"Rp {total_amount:,.0f}", border=1, ln=True, align='R', fill=True)
-                        pdf.cell(w_id + w_cat + w_weight + w_price, 8, 'Fee Admin (10%)', border=1, fill=True)
-                        pdf.cell(w_total + w_fee + w_net, 8, f"Rp {total_fee:,.0f}", border=1, ln=True, align='R', fill=True)
-                        pdf.cell(w_id + w_cat + w_weight + w_price, 8, 'Diterima Warga', border=1, fill=True)
-                        pdf.cell(w_total + w_fee + w_net, 8, f"Rp {total_net:,.0f}", border=1, ln=True, align='R', fill=True)
-
-                        pdf.ln(6)
-                        pdf.set_font('Helvetica', 'B', 11)
-                        pdf.set_text_color(76, 175, 80)
-                        pdf.cell(0, 8, 'Go Green', ln=True)
-                        pdf.set_text_color(0, 0, 0)
-                        pdf.set_font('Helvetica', '', 9)
-                        pdf.multi_cell(0, 6, "Kurangi penggunaan kertas, simpan nota ini secara digital.")
-
-                        pdf_data_hist = _pdf_output_bytes(pdf)
-
-                        st.download_button(
-                            label="⬇️ Download Nota (PDF)",
-                            data=pdf_data_hist,
-                            file_name=f"nota_{batch_key}.pdf",
-                            mime="application/pdf",
-                            type="primary",
-                            help="Unduh nota transaksi ini",
-                        )
+                        ready_key = f"receipt_ready_{batch_key}"
+                        if st.session_state.get(ready_key) != receipt_digest:
+                            if st.button("🧾 Siapkan Nota (PDF)", key=f"prepare_receipt_{batch_key}"):
+                                st.session_state[ready_key] = receipt_digest
+                                st.rerun()
+                        else:
+                            st.download_button(
+                                label="⬇️ Download Nota (PDF)",
+                                data=_render_history_receipt(receipt_digest, data),
+                                file_name=f"nota_{batch_key}.pdf",
+                                mime="application/pdf",
+                                type="primary",
+                                help="Unduh nota transaksi ini",
+                                key=f"download_receipt_{batch_key}",
+                            )
+
+                _render_pager('transaction_history', next_token)
             else:
                 st.info("Belum ada data transaksi untuk ditampilkan.")
 
@@ -2851,15 +2692,16 @@ def dashboard_panitia():
                 
                 conn = get_connection()
                 cursor = conn.cursor()
-                cursor.execute('''
+                date_clause, date_params = date_range_filter('ce.earned_date', start_date_comm, end_date_comm)
+                cursor.execute(f'''
                     SELECT ce.*, t.transaction_date, u.full_name as warga_name, c.name as category_name
                     FROM committee_earnings ce
                     JOIN transactions t ON ce.transaction_id = t.id
                     JOIN users u ON t.warga_id = u.id
                     JOIN categories c ON t.category_id = c.id
-                    WHERE DATE(ce.earned_date) BETWEEN ? AND ?
+                    WHERE 1=1{date_clause}
                     ORDER BY ce.earned_date DESC
-                ''', (start_date_comm, end_date_comm))
+                ''', date_params)
                 earnings_detail = cursor.fetchall()
                 conn.close()
                 
@@ -3112,6 +2954,8 @@ def dashboard_panitia():
                                 st.error("❌ Password saat ini salah")
                             else:
                                 update_user_password(user_id, new_password)
+                                # The stored hash changed, which invalidates the session token: issue a fresh one
+                                _refresh_session_token()
                                 log_audit(user_id, 'CHANGE_PASSWORD', 'Admin mengganti password sendiri')
                                 st.success("✅ Password berhasil diubah")
     
@@ -3142,24 +2986,26 @@ def dashboard_panitia():
                 if report_end_date < report_start_date:
                     st.error("Tanggal akhir tidak boleh lebih awal dari tanggal mulai")
                 else:
-                    warga_filter = warga_filter_options[selected_warga_pdf]
-                    pdf_transactions = get_transactions(warga_id=warga_filter, start_date=report_start_date, end_date=report_end_date)
-
-                    if pdf_transactions:
-                        pdf_buffer = generate_pdf_laporan(pdf_transactions, report_start_date, report_end_date)
-                        st.download_button(
-                            "Download Laporan PDF",
-                            data=pdf_buffer,
-                            file_name="laporan_bank_sampah.pdf",
-                            mime="application/pdf",
-                            use_container_width=True,
-                        )
-                    else:
-                        st.info("Tidak ada transaksi pada rentang dan filter yang dipilih")
+                    # Built by a background job so the session stays usable while the PDF renders
+                    st.session_state['laporan_pdf_job'] = jobs.submit(
+                        'laporan_pdf',
+                        {
+                            'start_date': report_start_date.isoformat(),
+                            'end_date': report_end_date.isoformat(),
+                            'warga_id': warga_filter_options[selected_warga_pdf],
+                        },
+                        created_by=st.session_state['user']['id'],
+                        artifact_name="laporan_bank_sampah.pdf",
+                    )
+            _render_job_status('laporan_pdf_job')
 
         st.markdown("---")
 
-        laporan_tab_keu, laporan_tab_perf = st.tabs(["Laporan Keuangan", "Performa Warga"])
+        _render_data_export()
+
+        st.markdown("---")
+
+        laporan_tab_keu, laporan_tab_periode, laporan_tab_perf = st.tabs(["Laporan Keuangan", "Perbandingan Periode", "Performa Warga"])
 
         with laporan_tab_keu:
             st.subheader("Laporan Keuangan")
@@ -3177,11 +3023,10 @@ def dashboard_panitia():
                         month = st.number_input("Bulan", min_value=1, max_value=12, value=datetime.now().month)
                     
                     if st.button("Generate Laporan Bulanan"):
-                        stats = get_monthly_statistics(year, month)
-                        committee_earnings = get_committee_total_earnings(
-                            f"{year}-{month:02d}-01",
-                            f"{year}-{month:02d}-31"
-                        )
+                        month_start = date(year, month, 1)
+                        month_end = date(year, month, calendar.monthrange(year, month)[1])
+                        stats = get_kpi_snapshot(month_start, month_end)
+                        committee_earnings = get_committee_total_earnings(month_start, month_end)
                         
                         st.markdown("### 📈 Statistik Bulanan")
                         
@@ -3198,12 +3043,18 @@ def dashboard_panitia():
                         
                         with metric_col4:
                             ui_metric_card("Pendapatan Admin", f"Rp {committee_earnings:,.0f}", icon="🏦")
+
+                        st.markdown("#### Rincian per Kategori")
+                        _render_breakdown_table(
+                            analytics.category_breakdown(analytics.load_category_totals(month_start, month_end)),
+                            'category', 'Kategori',
+                        )
                 
                 else:  # Tahunan
                     year = st.number_input("Tahun", min_value=2020, max_value=2030, value=datetime.now().year, key="year_annual")
                     
                     if st.button("Generate Laporan Tahunan"):
-                        stats = get_yearly_statistics(year)
+                        stats = get_kpi_snapshot(date(year, 1, 1), date(year, 12, 31))
                         committee_earnings = get_committee_total_earnings(
                             f"{year}-01-01",
                             f"{year}-12-31"
@@ -3224,6 +3075,10 @@ def dashboard_panitia():
                         
                         with metric_col4:
                             ui_metric_card("Pendapatan Admin", f"Rp {committee_earnings:,.0f}", icon="🏦")
+
+                        st.markdown("#### Rincian per Bulan")
+                        monthly = _period_series_frame(get_period_series('month', date(year, 1, 1), date(year, 12, 31)))
+                        _render_period_comparison(monthly, 'MMM YYYY')
             
             with col2:
                 st.markdown("### Riwayat Transaksi")
@@ -3235,25 +3090,42 @@ def dashboard_panitia():
                 with col_end:
                     end_date = st.date_input("Sampai Tanggal", value=datetime.now())
                 
-                transactions = get_transactions(start_date=start_date, end_date=end_date)
+                df_trans = analytics.load_transactions(start_date, end_date)
                 
-                if transactions:
-                    df_trans = pd.DataFrame(
-                        [(t['warga_name'], t['category_name'], t['weight_kg'],
-                          f"Rp {t['total_amount']:,.0f}", f"Rp {t['committee_fee']:,.0f}",
-                          f"Rp {t['net_amount']:,.0f}", t['transaction_date']) for t in transactions],
-                        columns=['Warga', 'Kategori', 'Berat (Kg)', 'Total', 'Fee Admin', 'Diterima Warga', 'Tanggal']
+                if not df_trans.empty:
+                    _render_transactions_table(
+                        df_trans, ['warga', 'category', 'weight_kg', 'total_amount', 'committee_fee', 'net_amount', 'transaction_date']
                     )
-                    st.dataframe(df_trans, use_container_width=True, hide_index=True)
                     
                     # Summary
-                    total_revenue = sum(t['total_amount'] for t in transactions)
-                    total_fee = sum(t['committee_fee'] for t in transactions)
+                    total_revenue = df_trans['total_amount'].sum()
+                    total_fee = df_trans['committee_fee'].sum()
                     
                     st.info(f"**Total Revenue:** Rp {total_revenue:,.0f} | **Total Fee Admin:** Rp {total_fee:,.0f}")
                 else:
                     st.info("Tidak ada transaksi pada periode ini")
 
+        with laporan_tab_periode:
+            st.subheader("Perbandingan Periode")
+            period_col1, period_col2, period_col3 = st.columns([1, 1, 1])
+            with period_col1:
+                granularity_label = st.selectbox("Satuan Periode", list(PERIOD_GRANULARITIES.keys()), index=2, key="period_granularity")
+            with period_col2:
+                period_start = st.date_input("Dari Tanggal", value=date(datetime.now().year, 1, 1), key="period_start")
+            with period_col3:
+                period_end = st.date_input("Sampai Tanggal", value=datetime.now(), key="period_end")
+
+            granularity, period_format = PERIOD_GRANULARITIES[granularity_label]
+            if period_end < period_start:
+                st.error("Tanggal akhir tidak boleh lebih awal dari tanggal mulai")
+            elif granularity == 'day' and (period_end - period_start).days > 366:
+                st.warning("⚠️ Rentang harian maksimal 1 tahun, gunakan satuan mingguan atau bulanan")
+            else:
+                _render_period_comparison(
+                    _period_series_frame(get_period_series(granularity, period_start, period_end)),
+                    period_format,
+                )
+
         with laporan_tab_perf:
             st.subheader("Performa Warga")
             
@@ -3280,9 +3152,7 @@ def dashboard_panitia():
                 start_date = None
             
             warga_id = warga_options[selected_warga_perf]
-            performance = get_warga_performance(warga_id, 
-                                               start_date.strftime('%Y-%m-%d') if start_date else None,
-                                               today.strftime('%Y-%m-%d'))
+            summary = get_kpi_snapshot(start_date, today, warga_id=warga_id)
             
             # Display metrics
             st.markdown(f"### Performa: {selected_warga_perf}")
@@ -3290,29 +3160,34 @@ def dashboard_panitia():
             metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
             
             with metric_col1:
-                ui_metric_card("Total Transaksi", performance['total_transactions'], icon="🧾")
+                ui_metric_card("Total Transaksi", summary['total_transactions'], icon="🧾")
             
             with metric_col2:
-                ui_metric_card("Total Berat", f"{performance['total_weight']:.2f} Kg", icon="⚖️")
+                ui_metric_card("Total Berat", f"{summary['total_weight']:.2f} Kg", icon="⚖️")
             
             with metric_col3:
-                ui_metric_card("Total Pendapatan", f"Rp {performance['total_earned']:,.0f}", icon="💰")
+                ui_metric_card("Total Pendapatan", f"Rp {summary['total_net']:,.0f}", icon="💰")
             
             with metric_col4:
                 current_balance = get_user_balance(warga_id)
                 ui_metric_card("Saldo Saat Ini", f"Rp {current_balance:,.0f}", icon="💳")
+
+            if summary['total_transactions']:
+                st.markdown("### Rincian per Kategori")
+                _render_breakdown_table(
+                    analytics.category_breakdown(analytics.load_category_totals(start_date, today, warga_id)),
+                    'category', 'Kategori',
+                    columns=['category', 'tx_count', 'weight_kg', 'avg_price', 'net_amount'],
+                )
             
             # Transaction history for this warga
             st.markdown("### Riwayat Transaksi")
-            warga_transactions = get_transactions(warga_id=warga_id, limit=20)
+            df_warga_trans = analytics.load_transactions(warga_id=warga_id, limit=20)
             
-            if warga_transactions:
-                df_warga_trans = pd.DataFrame(
-                    [(t['category_name'], t['weight_kg'], f"Rp {t['net_amount']:,.0f}",
-                      t['transaction_date'], t['processed_by_name']) for t in warga_transactions],
-                    columns=['Kategori', 'Berat (Kg)', 'Diterima', 'Tanggal', 'Diproses Oleh']
+            if not df_warga_trans.empty:
+                _render_transactions_table(
+                    df_warga_trans, ['category', 'weight_kg', 'net_amount', 'transaction_date', 'processed_by']
                 )
-                st.dataframe(df_warga_trans, use_container_width=True, hide_index=True)
             else:
                 st.info("Belum ada transaksi")
 
@@ -3404,6 +3279,8 @@ def dashboard_inputer():
                             st.error("❌ Password saat ini salah")
                         else:
                             update_user_password(user_id, new_password)
+                            # The stored hash changed, which invalidates the session token: issue a fresh one
+                            _refresh_session_token()
                             log_audit(user_id, 'CHANGE_PASSWORD', 'Panitia mengganti password sendiri')
                             st.success("✅ Password berhasil diubah")
 
@@ -3541,7 +3418,11 @@ def dashboard_warga():
         
         st.subheader("📋 Riwayat Transaksi Penjualan Sampah")
         
-        transactions = get_transactions(warga_id=user_id, limit=50)
+        transactions, next_token = get_transactions_page(
+            page_size=50,
+            page_token=_pager_token('warga_transactions', {'warga_id': user_id}),
+            warga_id=user_id,
+        )
         
         if transactions:
             df_trans = pd.DataFrame(
@@ -3551,6 +3432,7 @@ def dashboard_warga():
                 columns=['Kategori', 'Berat (Kg)', 'Harga/Kg', 'Total', 'Diterima', 'Tanggal', 'Diproses Oleh']
             )
             st.dataframe(df_trans, use_container_width=True, hide_index=True)
+            _render_pager('warga_transactions', next_token)
         else:
             st.markdown(
                 """
@@ -3569,7 +3451,11 @@ def dashboard_warga():
         
         st.subheader("💳 Riwayat Penarikan & Deposit")
         
-        movements = get_financial_movements(warga_id=user_id, limit=50)
+        movements, next_token = get_financial_movements_page(
+            page_size=50,
+            page_token=_pager_token('warga_movements', {'warga_id': user_id}),
+            warga_id=user_id,
+        )
         
         if movements:
             df_movements = pd.DataFrame(
@@ -3583,6 +3469,7 @@ def dashboard_warga():
                 columns=['Tipe', 'Jumlah', 'Saldo Sebelum', 'Saldo Sesudah', 'Tanggal', 'Diproses Oleh', 'Catatan']
             )
             st.dataframe(df_movements, use_container_width=True, hide_index=True)
+            _render_pager('warga_movements', next_token)
         else:
             st.markdown(
                 """
@@ -3659,6 +3546,8 @@ def dashboard_warga():
                             st.error("❌ Password saat ini salah")
                         else:
                             update_user_password(user_id, new_password)
+                            # The stored hash changed, which invalidates the session token: issue a fresh one
+                            _refresh_session_token()
                             log_audit(user_id, 'CHANGE_PASSWORD', 'Warga mengganti password sendiri')
                             st.success("✅ Password berhasil diubah")
 
@@ -3795,6 +3684,8 @@ def dashboard_superuser():
                     st.error(msg)
 
     with tab4:
+        _render_login_throttle_view()
+        _render_audit_retention_settings()
         _render_audit_log_tab('superuser', default_limit=300)
     
     with tab5:
@@ -3813,38 +3704,24 @@ def dashboard_superuser():
         ''')
         user_stats = cursor.fetchall()
         
-        # Total transactions
-        cursor.execute('SELECT COUNT(*) FROM transactions')
-        total_transactions = cursor.fetchone()[0]
-        
-        # Total revenue
-        cursor.execute('SELECT SUM(total_amount) FROM transactions')
-        total_revenue = cursor.fetchone()[0] or 0
-        
-        # Total weight
-        cursor.execute('SELECT SUM(weight_kg) FROM transactions')
-        total_weight = cursor.fetchone()[0] or 0
-        
-        # Committee earnings
-        cursor.execute('SELECT SUM(amount) FROM committee_earnings')
-        total_committee = cursor.fetchone()[0] or 0
-        
         conn.close()
         
+        kpi = get_kpi_snapshot()
+        
         # Display metrics
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            ui_metric_card("Total Transaksi", total_transactions, icon="🧾")
+            ui_metric_card("Total Transaksi", kpi['total_transactions'], icon="🧾")
         
         with col2:
-            ui_metric_card("Total Berat", f"{total_weight:.2f} Kg", icon="⚖️")
+            ui_metric_card("Total Berat", f"{kpi['total_weight']:.2f} Kg", icon="⚖️")
         
         with col3:
-            ui_metric_card("Total Revenue", f"Rp {total_revenue:,.0f}", icon="💰")
+            ui_metric_card("Total Revenue", f"Rp {kpi['total_revenue']:,.0f}", icon="💰")
         
         with col4:
-            ui_metric_card("Pendapatan Admin", f"Rp {total_committee:,.0f}", icon="🏦")
+            ui_metric_card("Pendapatan Admin", f"Rp {kpi['committee_earnings']:,.0f}", icon="🏦")
         
         st.markdown("---")
         
@@ -3865,12 +3742,12 @@ def dashboard_superuser():
             conn = get_connection()
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT u.full_name, COUNT(*) as transaction_count,
-                       SUM(t.weight_kg) as total_weight,
-                       SUM(t.net_amount) as total_earned
-                FROM transactions t
-                JOIN users u ON t.warga_id = u.id
-                GROUP BY t.warga_id
+                SELECT u.full_name, SUM(ds.tx_count) as transaction_count,
+                       SUM(ds.weight_kg) as total_weight,
+                       SUM(ds.net_amount) as total_earned
+                FROM daily_stats ds
+                JOIN users u ON ds.warga_id = u.id
+                GROUP BY ds.warga_id
                 ORDER BY transaction_count DESC
                 LIMIT 5
             ''')
@@ -3885,6 +3762,38 @@ def dashboard_superuser():
                 )
                 st.dataframe(df_top, use_container_width=True, hide_index=True)
 
+        st.markdown("---")
+        st.caption("Statistik dashboard dibaca dari ringkasan harian. Bangun ulang jika angka tidak sesuai dengan data transaksi.")
+        if st.button("🔄 Bangun Ulang Statistik Harian", key="rebuild_daily_stats"):
+            row_count = rebuild_daily_stats()
+            log_audit(st.session_state['user']['id'], 'REBUILD_DAILY_STATS',
+                      f"Rebuilt daily_stats ({row_count} rows)")
+            st.success(f"✅ Statistik harian dibangun ulang ({row_count} baris)")
+            st.rerun()
+
+        if needs_vacuum():
+            st.caption("Database dibuat sebelum mode auto-vacuum inkremental. VACUUM menulis ulang seluruh file "
+                       "dan mengunci database selama proses, jalankan saat sepi dan pastikan ruang disk cukup.")
+            if st.button("🧹 Jalankan VACUUM Database", key="vacuum_database"):
+                with st.spinner("Menjalankan VACUUM..."):
+                    applied = vacuum()
+                log_audit(st.session_state['user']['id'], 'VACUUM_DATABASE', f"VACUUM (incremental applied: {applied})")
+                st.success("✅ VACUUM selesai")
+                st.rerun()
+
+        with st.expander("🗃️ Statistik Cache Query"):
+            cache_stats = cache.stats()
+            if cache_stats:
+                df_cache = pd.DataFrame(
+                    [(name, s['hits'], s['misses'], f"{s['hit_rate']:.0%}", f"{s['size']}/{s['maxsize']}")
+                     for name, s in cache_stats.items()],
+                    columns=['Fungsi', 'Hit', 'Miss', 'Hit Rate', 'Isi'],
+                )
+                st.dataframe(df_cache, use_container_width=True, hide_index=True)
+            if st.button("🧹 Kosongkan Cache", key="clear_query_cache"):
+                cache.clear_all()
+                st.rerun()
+
     with tab6:
         _render_input_schedule_settings()
 
@@ -3902,31 +3811,16 @@ def dashboard_public():
     st.subheader("📊 Statistik Terkini")
     col1, col2, col3, col4 = st.columns(4)
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM transactions')
-    total_trans = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT SUM(weight_kg) FROM transactions')
-    total_weight = cursor.fetchone()[0] or 0
-    
-    cursor.execute('SELECT SUM(total_amount) FROM transactions')
-    total_rev = cursor.fetchone()[0] or 0
-    
-    cursor.execute('SELECT COUNT(DISTINCT warga_id) FROM transactions')
-    active_warga = cursor.fetchone()[0]
-    
-    conn.close()
+    kpi = get_kpi_snapshot()
     
     with col1:
-        ui_metric_card("Total Transaksi", total_trans, icon="🧾")
+        ui_metric_card("Total Transaksi", kpi['total_transactions'], icon="🧾")
     with col2:
-        ui_metric_card("Sampah Terkumpul", f"{total_weight:,.2f} Kg", icon="⚖️")
+        ui_metric_card("Sampah Terkumpul", f"{kpi['total_weight']:,.2f} Kg", icon="⚖️")
     with col3:
-        ui_metric_card("Perputaran Ekonomi", f"Rp {total_rev:,.0f}", icon="💰")
+        ui_metric_card("Perputaran Ekonomi", f"Rp {kpi['total_revenue']:,.0f}", icon="💰")
     with col4:
-        ui_metric_card("Warga Berpartisipasi", active_warga, icon="👥")
+        ui_metric_card("Warga Berpartisipasi", kpi['active_warga'], icon="👥")
         
     st.markdown("---")
     
@@ -3940,13 +3834,14 @@ def dashboard_public():
         
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT date(transaction_date) as d, SUM(total_amount) as total
-            FROM transactions 
-            WHERE date(transaction_date) BETWEEN ? AND ?
-            GROUP BY date(transaction_date)
+        date_clause, date_params = date_range_filter('date', start_date, end_date)
+        cursor.execute(f'''
+            SELECT date as d, SUM(total_amount) as total
+            FROM daily_stats
+            WHERE 1=1{date_clause}
+            GROUP BY date
             ORDER BY d
-        ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+        ''', date_params)
         daily_data = cursor.fetchall()
         conn.close()
         
@@ -3962,10 +3857,10 @@ def dashboard_public():
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT u.full_name, COUNT(*) as cnt
-            FROM transactions t
-            JOIN users u ON t.warga_id = u.id
-            GROUP BY t.warga_id
+            SELECT u.full_name, SUM(ds.tx_count) as cnt
+            FROM daily_stats ds
+            JOIN users u ON ds.warga_id = u.id
+            GROUP BY ds.warga_id
             ORDER BY cnt DESC
             LIMIT 5
         ''')
@@ -3983,10 +3878,10 @@ def dashboard_public():
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT c.name, SUM(t.weight_kg) as total_w
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.id
-        GROUP BY t.category_id
+        SELECT c.name, SUM(ds.weight_kg) as total_w
+        FROM daily_stats ds
+        JOIN categories c ON ds.category_id = c.id
+        GROUP BY ds.category_id
         ORDER BY total_w DESC
         LIMIT 10
     ''')
@@ -4009,7 +3904,10 @@ def dashboard_public():
 def main():
     """Main application"""
     
-    # Check if user is logged in
+    # Check if user is logged in; the session token is a dict lookup, no password hashing on reruns
+    if st.session_state['user'] and not validate_session_token(st.session_state.get('auth_token'), _session_owner_id()):
+        _clear_login()
+        st.warning("⚠️ Sesi berakhir, silakan login kembali")
     if not st.session_state['user']:
         sidebar_login()
         dashboard_public()
@@ -4104,10 +4002,7 @@ def main():
         # Logout button
         if st.button("🚪 Keluar dari Sistem", use_container_width=True, type="primary"):
             log_audit(user['id'], 'LOGOUT', f"User logged out")
-            st.session_state['user'] = None
-            if 'superuser_original_id' in st.session_state:
-                del st.session_state['superuser_original_id']
-                del st.session_state['superuser_original_name']
+            _clear_login()
             st.rerun()
         
         st.markdown("---")
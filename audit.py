@@ -0,0 +1,252 @@
+import atexit
+import gzip
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import database
+from database import session, get_connection, mark_dirty, get_setting, TIMESTAMP_FORMAT
+
+# Audit events are queued in memory and written by a background thread with one executemany per
+# batch, so the request path no longer pays a commit per event. A batch is written once it holds
+# BATCH_SIZE events or its oldest event is FLUSH_INTERVAL_MS old, whichever comes first.
+BATCH_SIZE = 50
+FLUSH_INTERVAL_MS = 200
+
+# Account and privilege changes are committed before log_audit returns (sync write)
+SYNC_ACTIONS = frozenset({
+    'CHANGE_PASSWORD',
+    'CREATE_USER',
+    'UPDATE_USER',
+    'DELETE_USER',
+    'LOGIN_AS_USER',
+    'UNLOCK_LOGIN',
+    'DUMMY_DATA_ON',
+    'DUMMY_DATA_OFF',
+})
+
+# Retention: rows older than audit_retention_days (system_settings, 0 = keep everything) are moved
+# into one gzip NDJSON file per month under ARCHIVE_DIR, next to the database file, and searched
+# from there. Off until an admin sets a retention period.
+RETENTION_SETTING = 'audit_retention_days'
+DEFAULT_RETENTION_DAYS = 0
+ARCHIVE_DIR = 'audit_archive'
+ARCHIVE_FIELDS = ('id', 'user_id', 'username', 'full_name', 'role', 'action', 'details', 'ip_address', 'timestamp')
+
+_pending = []
+_pending_cond = threading.Condition()
+_write_lock = threading.Lock()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def record(user_id, action, details="", sync=None):
+    """Queue an audit event; with sync (default: action in SYNC_ACTIONS) it is committed before returning"""
+    # Stamped here, in the same UTC layout as the column's CURRENT_TIMESTAMP default, not at write time
+    timestamp = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+    with _pending_cond:
+        _pending.append((user_id, action, details, timestamp))
+        if len(_pending) == 1 or len(_pending) >= BATCH_SIZE:
+            _pending_cond.notify()
+    if sync is None:
+        sync = action in SYNC_ACTIONS
+    if sync:
+        # Writes everything queued so far too, so the log keeps event order
+        flush()
+    else:
+        _start_worker()
+
+
+def flush():
+    """Write every queued event; on return all events recorded before the call are committed"""
+    with _write_lock:
+        with _pending_cond:
+            rows = _pending[:]
+            del _pending[:]
+        if not rows:
+            return 0
+        try:
+            with session() as cursor:
+                cursor.executemany('''
+                    INSERT INTO audit_log (user_id, action, details, timestamp)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+                mark_dirty('audit_log')
+        except Exception:
+            # Put the batch back in front of newer events so a later flush retries it in order
+            with _pending_cond:
+                _pending[:0] = rows
+            raise
+    return len(rows)
+
+
+def pending_count():
+    """Number of events recorded but not yet written"""
+    with _pending_cond:
+        return len(_pending)
+
+
+def _start_worker():
+    global _worker
+    if _worker is not None:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_loop, name='audit-writer', daemon=True)
+            _worker.start()
+
+
+def _worker_loop():
+    interval = FLUSH_INTERVAL_MS / 1000
+    while True:
+        with _pending_cond:
+            _pending_cond.wait_for(lambda: _pending)
+            _pending_cond.wait_for(lambda: len(_pending) >= BATCH_SIZE, timeout=interval)
+        try:
+            flush()
+        except Exception as error:
+            # Keep the writer alive (e.g. database busy); the batch stays queued for the next pass
+            print(f"Audit writer error: {error}")
+            with _pending_cond:
+                _pending_cond.wait(interval)
+
+
+def retention_days():
+    """Configured retention in days (0 = never archive)"""
+    try:
+        return max(0, int(get_setting(RETENTION_SETTING, DEFAULT_RETENTION_DAYS)))
+    except (TypeError, ValueError):
+        return DEFAULT_RETENTION_DAYS
+
+
+def retention_cutoff(today=None):
+    """Timestamp lower bound of the live table, or None when retention is off"""
+    days = retention_days()
+    if not days:
+        return None
+    return ((today or date.today()) - timedelta(days=days)).isoformat()
+
+
+def _next_month(day):
+    year, month = int(day[:4]), int(day[5:7])
+    return f'{year + month // 12}-{month % 12 + 1:02d}-01'
+
+
+def archive_dir():
+    """Archive directory beside the database file (independent of the process working directory)"""
+    return os.path.join(os.path.dirname(os.path.abspath(database.DATABASE_NAME)), ARCHIVE_DIR)
+
+
+def _archive_path(month):
+    return os.path.join(archive_dir(), f'audit_log_{month}.ndjson.gz')
+
+
+def _read_archive(month):
+    path = _archive_path(month)
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        return [json.loads(line) for line in archive if line.strip()]
+
+
+def _write_archive(month, rows):
+    path = _archive_path(month)
+    partial = f'{path}.part'
+    with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+        for row in rows:
+            archive.write(json.dumps(row, ensure_ascii=False))
+            archive.write('\n')
+    with open(partial, 'rb') as written:
+        os.fsync(written.fileno())
+    os.replace(partial, path)
+
+
+def archive_expired(progress=None):
+    """Move audit rows older than the retention cutoff into the monthly archives; returns rows moved"""
+    cutoff = retention_cutoff()
+    if cutoff is None:
+        return 0
+    flush()
+    with session() as cursor:
+        cursor.execute(
+            'SELECT DISTINCT substr(timestamp, 1, 7) FROM audit_log WHERE timestamp < ? ORDER BY 1',
+            (cutoff,),
+        )
+        months = [row[0] for row in cursor.fetchall()]
+    if not months:
+        return 0
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    moved = 0
+    for index, month in enumerate(months):
+        lower = f'{month}-01'
+        upper = min(_next_month(lower), cutoff)
+        with session() as cursor:
+            cursor.execute('''
+                SELECT al.id, al.user_id, u.username, u.full_name, u.role, al.action, al.details,
+                       al.ip_address, al.timestamp
+                FROM audit_log al
+                LEFT JOIN users u ON al.user_id = u.id
+                WHERE al.timestamp >= ? AND al.timestamp < ?
+            ''', (lower, upper))
+            rows = [dict(zip(ARCHIVE_FIELDS, row)) for row in cursor.fetchall()]
+        if not rows:
+            continue
+        # Merge by id: a run interrupted between the file write and the delete is simply redone
+        merged = {row['id']: row for row in _read_archive(month)}
+        merged.update((row['id'], row) for row in rows)
+        _write_archive(month, sorted(merged.values(), key=lambda row: (row['timestamp'], row['id'])))
+        # Old rows are never updated, so deleting the same range up to the last archived id is exact
+        with session() as cursor:
+            cursor.execute(
+                'DELETE FROM audit_log WHERE timestamp >= ? AND timestamp < ? AND id <= ?',
+                (lower, upper, max(row['id'] for row in rows)),
+            )
+            mark_dirty('audit_log')
+        moved += len(rows)
+        if progress:
+            progress(index + 1, len(months))
+
+    # Return the freed pages to the filesystem (auto_vacuum = INCREMENTAL since schema v6).
+    # executescript runs the pragma to completion; a plain execute() frees a single page.
+    conn = get_connection()
+    if not conn.in_transaction:
+        conn.executescript('PRAGMA incremental_vacuum')
+    return moved
+
+
+def archived_months():
+    """Months (YYYY-MM) that have an archive file, newest first"""
+    directory = archive_dir()
+    if not os.path.isdir(directory):
+        return []
+    prefix, suffix = 'audit_log_', '.ndjson.gz'
+    return sorted(
+        (name[len(prefix):-len(suffix)] for name in os.listdir(directory)
+         if name.startswith(prefix) and name.endswith(suffix)),
+        reverse=True,
+    )
+
+
+def search_archive(user_id=None, lower=None, upper=None, limit=100):
+    """Archived events (newest first) for a user and a [lower, upper) timestamp range"""
+    results = []
+    for month in archived_months():
+        if upper and f'{month}-01' >= upper:
+            continue
+        if lower and _next_month(f'{month}-01') <= lower:
+            break
+        for row in reversed(_read_archive(month)):
+            if user_id and row['user_id'] != user_id:
+                continue
+            if (lower and row['timestamp'] < lower) or (upper and row['timestamp'] >= upper):
+                continue
+            results.append(row)
+            if len(results) >= limit:
+                return results
+    return results
+
+
+# The worker is a daemon thread, so queued events are written here on interpreter shutdown
+atexit.register(flush)
@@ -1,133 +1,189 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
 import streamlit as st
-from database import get_connection, hash_password
+import audit
+import passwords
+from database import session, hash_password, mark_dirty
+from cache import cached
 from datetime import datetime
 
-def log_audit(user_id, action, details=""):
-    """Log user actions to audit log"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO audit_log (user_id, action, details)
-        VALUES (?, ?, ?)
-    ''', (user_id, action, details))
-    conn.commit()
-    conn.close()
+# A KDF check costs ~100 ms by design, so verified work is remembered in process memory:
+# - credential cache: HMAC(process key, username + password) -> stored hash, for repeated checks
+#   of the same password (e.g. "current password" forms right after login)
+# - session tokens: issued at login and checked on every rerun without hashing anything
+# Both entries are tied to the stored hash, so a password change invalidates them immediately.
+VERIFIED_TTL_SECONDS = 300
+SESSION_TTL_SECONDS = 2 * 3600
+
+_cache_key = secrets.token_bytes(32)
+_verified = {}
+_sessions = {}
+_auth_lock = threading.Lock()
+_dummy_hash = None
+
+def log_audit(user_id, action, details="", sync=None):
+    """Log user actions to audit log (batched in the background; see audit.record for sync)"""
+    audit.record(user_id, action, details, sync=sync)
+
+def _credential_key(username, password):
+    return hmac.new(_cache_key, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+def _prune(entries, now):
+    for key in [key for key, entry in entries.items() if entry[-1] < now]:
+        del entries[key]
+
+def _rehash(user_id, stored, password):
+    """Store a hash with the current KDF parameters (unless the password changed meanwhile)"""
+    new_hash = hash_password(password)
+    with session() as cursor:
+        cursor.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?', (new_hash, user_id, stored))
+        mark_dirty('users')
+    return new_hash if cursor.rowcount else stored
 
 def authenticate_user(username, password):
     """Authenticate user credentials"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    hashed_password = hash_password(password)
-    cursor.execute('''
-        SELECT id, username, full_name, role, active
-        FROM users
-        WHERE username = ? AND password = ? AND active = 1
-    ''', (username, hashed_password))
-    
-    user = cursor.fetchone()
-    conn.close()
-    
-    if user:
-        return {
-            'id': user[0],
-            'username': user[1],
-            'full_name': user[2],
-            'role': user[3],
-            'active': user[4]
-        }
-    return None
+    global _dummy_hash
+    with session() as cursor:
+        cursor.execute('''
+            SELECT id, username, full_name, role, active, password
+            FROM users
+            WHERE username = ? AND active = 1
+        ''', (username,))
+        user = cursor.fetchone()
+
+    if user is None:
+        # Same KDF cost as a real check, so response time does not reveal which usernames exist
+        if _dummy_hash is None:
+            _dummy_hash = hash_password(secrets.token_hex(16))
+        passwords.verify_password(password, _dummy_hash)
+        return None
+
+    stored = user['password']
+    key = _credential_key(username, password)
+    now = time.monotonic()
+    with _auth_lock:
+        entry = _verified.get(key)
+    if not (entry and entry[0] == stored and entry[1] > now):
+        if not passwords.verify_password(password, stored):
+            return None
+        if passwords.needs_rehash(stored):
+            stored = _rehash(user['id'], stored, password)
+        with _auth_lock:
+            _prune(_verified, now)
+            _verified[key] = (stored, now + VERIFIED_TTL_SECONDS)
 
+    return {
+        'id': user['id'],
+        'username': user['username'],
+        'full_name': user['full_name'],
+        'role': user['role'],
+        'active': user['active']
+    }
+
+def issue_session_token(user_id):
+    """Short-lived token proving user_id logged in with its current password"""
+    user = get_user_by_id(user_id)
+    token = secrets.token_urlsafe(32)
+    now = time.monotonic()
+    with _auth_lock:
+        _prune(_sessions, now)
+        _sessions[token] = (user_id, user['password'], now + SESSION_TTL_SECONDS)
+    return token
+
+def validate_session_token(token, user_id):
+    """True while token belongs to user_id, is unexpired and the user's password is unchanged; extends it"""
+    now = time.monotonic()
+    with _auth_lock:
+        entry = _sessions.get(token) if token else None
+    if not entry or entry[0] != user_id or entry[2] < now:
+        revoke_session_token(token)
+        return False
+    user = get_user_by_id(user_id)
+    if user is None or not user['active'] or user['password'] != entry[1]:
+        revoke_session_token(token)
+        return False
+    with _auth_lock:
+        _sessions[token] = (user_id, entry[1], now + SESSION_TTL_SECONDS)
+    return True
+
+def revoke_session_token(token):
+    """Forget a session token (logout)"""
+    with _auth_lock:
+        _sessions.pop(token, None)
+
+@cached(('users',))
 def get_user_by_id(user_id):
     """Get user information by ID"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with session() as cursor:
+        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+        return cursor.fetchone()
 
+@cached(('users',))
 def get_all_users(role=None):
     """Get all users, optionally filtered by role"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    if role:
-        cursor.execute('SELECT * FROM users WHERE role = ? ORDER BY full_name', (role,))
-    else:
-        cursor.execute('SELECT * FROM users ORDER BY role, full_name')
-    
-    users = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return users
+    with session() as cursor:
+        if role:
+            cursor.execute('SELECT * FROM users WHERE role = ? ORDER BY full_name', (role,))
+        else:
+            cursor.execute('SELECT * FROM users ORDER BY role, full_name')
+        return [dict(row) for row in cursor.fetchall()]
 
 def create_user(username, password, full_name, role, nickname="", address="", rt="", rw="", whatsapp=""):
     """Create a new user"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            INSERT INTO users (username, password, full_name, nickname, address, rt, rw, whatsapp, role)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (username, hash_password(password), full_name, nickname, address, rt, rw, whatsapp, role))
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
+        with session() as cursor:
+            cursor.execute('''
+                INSERT INTO users (username, password, full_name, nickname, address, rt, rw, whatsapp, role)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (username, hash_password(password), full_name, nickname, address, rt, rw, whatsapp, role))
+            user_id = cursor.lastrowid
+            mark_dirty('users')
         return True, user_id
     except Exception as e:
-        conn.close()
         return False, str(e)
 
 def update_user(user_id, full_name, nickname="", address="", rt="", rw="", whatsapp=""):
     """Update user information"""
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            UPDATE users 
-            SET full_name = ?, nickname = ?, address = ?, rt = ?, rw = ?, whatsapp = ?
-            WHERE id = ?
-        ''', (full_name, nickname, address, rt, rw, whatsapp, user_id))
-        conn.commit()
-        conn.close()
+        with session() as cursor:
+            cursor.execute('''
+                UPDATE users 
+                SET full_name = ?, nickname = ?, address = ?, rt = ?, rw = ?, whatsapp = ?
+                WHERE id = ?
+            ''', (full_name, nickname, address, rt, rw, whatsapp, user_id))
+            mark_dirty('users')
         return True, "User berhasil diupdate"
     except Exception as e:
-        conn.close()
         return False, str(e)
 
 def delete_user(user_id):
     """Delete a user"""
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
-        conn.commit()
-        conn.close()
+        with session() as cursor:
+            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            mark_dirty('users')
         return True, "User berhasil dihapus"
     except Exception as e:
-        conn.close()
         return False, str(e)
 
 def update_user_password(user_id, new_password):
     """Update user password"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE users SET password = ? WHERE id = ?
-    ''', (hash_password(new_password), user_id))
-    conn.commit()
-    conn.close()
+    with session() as cursor:
+        cursor.execute('''
+            UPDATE users SET password = ? WHERE id = ?
+        ''', (hash_password(new_password), user_id))
+        mark_dirty('users')
 
 def toggle_user_status(user_id):
     """Toggle user active status"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE users SET active = 1 - active WHERE id = ?
-    ''', (user_id,))
-    conn.commit()
-    conn.close()
+    with session() as cursor:
+        cursor.execute('''
+            UPDATE users SET active = 1 - active WHERE id = ?
+        ''', (user_id,))
+        mark_dirty('users')
 
 def check_superuser_session():
     """Check if current session is a superuser acting as another user"""
@@ -137,14 +193,11 @@ def check_superuser_session():
 
 def start_superuser_session(super_user_id, target_user_id):
     """Start a superuser session acting as another user"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO active_sessions (super_user_id, acting_as_user_id)
-        VALUES (?, ?)
-    ''', (super_user_id, target_user_id))
-    conn.commit()
-    conn.close()
+    with session() as cursor:
+        cursor.execute('''
+            INSERT INTO active_sessions (super_user_id, acting_as_user_id)
+            VALUES (?, ?)
+        ''', (super_user_id, target_user_id))
 
 def end_superuser_session():
     """End superuser session and return to original account"""
@@ -0,0 +1,78 @@
+"""Shared setup for the benchmark scripts: repo imports, throwaway databases and timing"""
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# fpdf2/matplotlib deprecation noise would drown the numbers
+warnings.simplefilter('ignore')
+
+import database  # noqa: E402
+
+
+def database_path(name):
+    """Path of the benchmark database `name` in the temp dir"""
+    return os.path.join(tempfile.gettempdir(), f'bank_sampah_bench_{name}.db')
+
+
+def use_database(name, fresh=True):
+    """Point database.py at a benchmark database and bootstrap it; returns its path"""
+    path = database_path(name)
+    database.close_connection()
+    if fresh:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    database.DATABASE_NAME = path
+    database.initialize_system()
+    return path
+
+
+def seed_transactions(count, warga=300, start=datetime(2025, 1, 1), days=365, seed=1):
+    """Insert `warga` extra warga and `count` random transactions spread over `days`; rebuilds daily_stats"""
+    rng = random.Random(seed)
+    with database.session() as cursor:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO users (username, password, full_name, role) VALUES (?, 'x', ?, 'warga')",
+            [(f'bench_warga_{i}', f'Warga Bench {i}') for i in range(warga)],
+        )
+        cursor.execute("SELECT id FROM users WHERE role = 'warga'")
+        warga_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT id, price_per_kg FROM categories')
+        categories = [tuple(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT id FROM users WHERE role != 'warga' LIMIT 1")
+        admin_id = cursor.fetchone()[0]
+
+        rows = []
+        for index in range(count):
+            category_id, price = rng.choice(categories)
+            weight = round(rng.uniform(0.5, 10), 2)
+            total = weight * price
+            moment = start + timedelta(seconds=rng.randrange(days * 86400))
+            rows.append((
+                rng.choice(warga_ids), category_id, weight, price, total, total * 0.1, total * 0.9,
+                admin_id, f'bench-{index}', f'catatan {index}', moment.strftime(database.TIMESTAMP_FORMAT),
+            ))
+        cursor.executemany('''
+            INSERT INTO transactions
+            (warga_id, category_id, weight_kg, price_per_kg, total_amount, committee_fee, net_amount,
+             processed_by, batch_id, notes, transaction_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    database.rebuild_daily_stats()
+    return warga_ids
+
+
+def best_of(func, rounds=5):
+    """Fastest of `rounds` calls of func, in milliseconds"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
@@ -0,0 +1,54 @@
+"""Cold timings of the statistics tabs' data path (SQL GROUP BY + pandas reshaping)
+
+    python bench/bench_analytics.py      (reuses the bench_laporan database, 200k transactions in 2025)
+"""
+import os
+import time
+from datetime import date
+
+from _common import database, database_path, seed_transactions, use_database
+
+import analytics
+import cache
+import utils
+
+
+def cold(func):
+    cache.clear_all()
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def finance_year():
+    utils.get_kpi_snapshot(date(2025, 1, 1), date(2025, 12, 31))
+    for month in range(1, 13):
+        utils.get_kpi_snapshot(date(2025, month, 1), date(2025, month, 28))
+    analytics.category_breakdown(analytics.load_category_totals(date(2025, 3, 1), date(2025, 3, 31)))
+
+
+def main():
+    seeded = os.path.exists(database_path('laporan'))
+    use_database('laporan', fresh=not seeded)
+    if not seeded:
+        seed_transactions(200_000, warga=300)
+    with database.session() as cursor:
+        cursor.execute("SELECT id FROM users WHERE role = 'warga' LIMIT 1")
+        warga_id = cursor.fetchone()[0]
+
+    cases = {
+        'Performa Barang, Semua Waktu': lambda: analytics.category_breakdown(
+            analytics.load_category_totals(), analytics.load_categories()),
+        'Performa Barang, Tahun Ini': lambda: analytics.category_breakdown(
+            analytics.load_category_totals(date(2025, 1, 1)), analytics.load_categories()),
+        'Laporan Keuangan, 13 periods + categories': finance_year,
+        'Performa Warga, one warga': lambda: (
+            utils.get_kpi_snapshot(None, date(2025, 12, 31), warga_id=warga_id),
+            analytics.category_breakdown(analytics.load_category_totals(None, date(2025, 12, 31), warga_id))),
+    }
+    for label, func in cases.items():
+        print(f'  {label:42s} {min(cold(func) for _ in range(3)):8.1f} ms cold')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Audit writes under a burst: one commit per event (old log_audit) vs the batched audit sink
+
+    python bench/bench_audit.py [NORMAL|FULL] [threads] [events per thread]
+"""
+import sys
+import threading
+import time
+
+from _common import database, use_database
+
+import audit
+
+
+def log_per_event(user_id, action, details=''):
+    """What auth.log_audit did before the sink: insert and commit on the request path"""
+    with database.session() as cursor:
+        cursor.execute('INSERT INTO audit_log (user_id, action, details) VALUES (?, ?, ?)', (user_id, action, details))
+        database.mark_dirty('audit_log')
+
+
+def burst(log, threads, per_thread):
+    """(seconds until every caller returned, seconds until everything was committed)"""
+    def work():
+        for index in range(per_thread):
+            log(1, 'CREATE_TRANSACTION', f'bench {index}')
+        database.close_connection()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    returned = time.perf_counter() - started
+    audit.flush()
+    return returned, time.perf_counter() - started
+
+
+def main():
+    synchronous = sys.argv[1] if len(sys.argv) > 1 else 'NORMAL'
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    per_thread = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    events = threads * per_thread
+    database.CONNECTION_PRAGMAS['synchronous'] = synchronous
+    use_database('audit')
+
+    # Count the write transactions the sink opens
+    commits = [0]
+    session = audit.session
+
+    def counting_session(*args, **kwargs):
+        commits[0] += 1
+        return session(*args, **kwargs)
+
+    print(f'synchronous={synchronous}, {threads} threads x {per_thread} events')
+    returned, total = burst(log_per_event, threads, per_thread)
+    print(f'  per-event commit  {events / total:9,.0f} events/s  {events} commits  '
+          f'{returned / events * threads * 1e6:6.0f} us per call')
+
+    audit.session = counting_session
+    returned, total = burst(audit.record, threads, per_thread)
+    audit.session = session
+    print(f'  batched sink      {events / total:9,.0f} events/s  {commits[0]} commits  '
+          f'{returned / events * threads * 1e6:6.0f} us per call')
+
+    with database.session() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM audit_log WHERE details LIKE 'bench %'")
+        assert cursor.fetchone()[0] == 2 * events
+
+
+if __name__ == '__main__':
+    main()
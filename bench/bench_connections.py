@@ -0,0 +1,57 @@
+"""Per-call sqlite3.connect vs the pooled per-thread connection on the admin dashboard queries
+
+    python bench/bench_connections.py [transactions]
+"""
+import sqlite3
+import sys
+
+from _common import best_of, database, seed_transactions, use_database
+
+# The queries one admin dashboard render issued before the rollups/caches of later changes
+DASHBOARD_QUERIES = [
+    'SELECT COUNT(*) FROM transactions',
+    'SELECT SUM(weight_kg) FROM transactions',
+    'SELECT SUM(total_amount) FROM transactions',
+    'SELECT COUNT(DISTINCT warga_id) FROM transactions',
+    "SELECT date(transaction_date) d, SUM(total_amount) FROM transactions WHERE transaction_date >= '2025-06-01' GROUP BY d",
+    'SELECT u.full_name, COUNT(*) cnt FROM transactions t JOIN users u ON t.warga_id = u.id '
+    'GROUP BY t.warga_id ORDER BY cnt DESC LIMIT 5',
+    'SELECT c.name, SUM(t.weight_kg) w FROM transactions t JOIN categories c ON t.category_id = c.id '
+    'GROUP BY t.category_id ORDER BY w DESC LIMIT 10',
+    'SELECT * FROM categories ORDER BY name',
+    'SELECT * FROM users ORDER BY role, full_name',
+    "SELECT value FROM system_settings WHERE key = 'schema_version'",
+]
+POINT_LOOKUP = "SELECT value FROM system_settings WHERE key = 'schema_version'"
+
+
+def per_call(queries):
+    for query in queries:
+        conn = sqlite3.connect(database.DATABASE_NAME)
+        conn.row_factory = sqlite3.Row
+        conn.execute(query).fetchall()
+        conn.close()
+
+
+def pooled(queries):
+    for query in queries:
+        with database.session() as cursor:
+            cursor.execute(query).fetchall()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    use_database('connections')
+    seed_transactions(count, warga=50)
+    print(f'{count} transactions')
+    for label, queries, rounds in [
+        (f'dashboard render ({len(DASHBOARD_QUERIES)} queries)', DASHBOARD_QUERIES, 50),
+        ('20 point lookups', [POINT_LOOKUP] * 20, 200),
+    ]:
+        for name, run in [('per-call connect', per_call), ('pooled', pooled)]:
+            run(queries)
+            print(f'  {label:34s} {name:17s} {best_of(lambda: run(queries), rounds):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""DATE()/strftime() predicates vs the half-open ranges of utils.date_range_filter on a large table
+
+    python bench/bench_date_filters.py [transactions]     (default 1M rows over 5 years)
+"""
+import sys
+from datetime import date, datetime
+
+from _common import best_of, database, seed_transactions, use_database
+
+import utils
+
+MONTH = (date(2024, 3, 1), date(2024, 3, 31))
+YEAR = 2024
+
+
+def month_filters():
+    range_clause, range_params = utils.date_range_filter('transaction_date', *MONTH)
+    return {
+        'one month, DATE()': (
+            'SELECT COUNT(*), SUM(total_amount) FROM transactions '
+            'WHERE DATE(transaction_date) >= ? AND DATE(transaction_date) <= ?',
+            [MONTH[0].isoformat(), MONTH[1].isoformat()]),
+        'one month, range': (
+            f'SELECT COUNT(*), SUM(total_amount) FROM transactions WHERE 1=1{range_clause}', range_params),
+    }
+
+
+def year_filters():
+    range_clause, range_params = utils.date_range_filter('transaction_date', date(YEAR, 1, 1), date(YEAR, 12, 31))
+    return {
+        'one year, strftime': (
+            "SELECT COUNT(*) FROM transactions WHERE strftime('%Y', transaction_date) = ?", [str(YEAR)]),
+        'one year, range': (
+            f'SELECT COUNT(*) FROM transactions WHERE 1=1{range_clause}', range_params),
+    }
+
+
+def warga_filters(warga_id):
+    range_clause, range_params = utils.date_range_filter('transaction_date', *MONTH)
+    return {
+        'warga + month, DATE()': (
+            'SELECT COUNT(*), SUM(weight_kg) FROM transactions WHERE warga_id = ? '
+            'AND DATE(transaction_date) >= ? AND DATE(transaction_date) <= ?',
+            [warga_id, MONTH[0].isoformat(), MONTH[1].isoformat()]),
+        'warga + month, range': (
+            f'SELECT COUNT(*), SUM(weight_kg) FROM transactions WHERE warga_id = ?{range_clause}',
+            [warga_id] + range_params),
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    use_database('date_filters')
+    warga_ids = seed_transactions(count, start=datetime(2021, 1, 1), days=5 * 365)
+    conn = database.get_connection()
+    conn.execute('ANALYZE')
+    print(f'{count} transactions, best of 5')
+    for queries in (month_filters(), year_filters(), warga_filters(warga_ids[0])):
+        results = set()
+        for label, (query, params) in queries.items():
+            plan = ' / '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params))
+            ms = best_of(lambda: results.add(tuple(conn.execute(query, params).fetchone())))
+            print(f'  {label:24s} {ms:9.2f} ms  {plan}')
+        assert len(results) == 1, f'predicates disagree: {results}'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Export throughput (rows/s) and peak RSS per format, for a small range and the full table
+
+    python bench/bench_exports.py      (reuses the bench_laporan database, 200k transactions in 2025)
+
+Each export runs in a fresh process so ru_maxrss is that export's own peak.
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import database_path, seed_transactions, use_database
+
+import exports
+
+FORMATS = ('csv', 'xlsx', 'parquet')
+RANGES = {'one month': '2025-12-01', 'full table': None}
+
+
+def run(fmt, start_date):
+    use_database('laporan', fresh=False)
+    path = os.path.join(tempfile.gettempdir(), f'bank_sampah_bench_export.{fmt}')
+    started = time.perf_counter()
+    count = exports.write_export('transactions', fmt, path, start_date or None)
+    elapsed = time.perf_counter() - started
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'  {fmt:8s} {count:7d} rows  {count / elapsed:9,.0f} rows/s  '
+          f'{os.path.getsize(path) / 1e6:6.1f} MB  peak RSS {rss:5.0f} MB')
+    os.remove(path)
+
+
+def main():
+    if not os.path.exists(database_path('laporan')):
+        use_database('laporan')
+        seed_transactions(200_000, warga=300)
+    for label, start_date in RANGES.items():
+        print(f'transactions, {label}:')
+        for fmt in FORMATS:
+            subprocess.run([sys.executable, __file__, '--run', fmt, start_date or ''], check=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], sys.argv[3])
+    else:
+        main()
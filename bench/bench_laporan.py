@@ -0,0 +1,85 @@
+"""One-year laporan: rows aggregated in Python (before) vs get_report_aggregates (after), time and peak memory
+
+    python bench/bench_laporan.py [transactions]     (default 200k over 2025, 300 warga)
+
+Each mode runs in a fresh process so the read caches and tracemalloc peaks do not mix.
+"""
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+from _common import seed_transactions, use_database
+
+import reports
+import utils
+
+START, END = date(2025, 1, 1), date(2025, 12, 31)
+
+
+def aggregate_rows(transactions):
+    """The per-row loop generate_pdf_laporan ran over get_transactions before the aggregate layer"""
+    result = {
+        'total_transactions': len(transactions),
+        'total_weight': sum((t['weight_kg'] or 0) for t in transactions),
+        'total_revenue': sum((t['total_amount'] or 0) for t in transactions),
+        'total_fee': sum((t['committee_fee'] or 0) for t in transactions),
+        'warga_unique': len({t['warga_id'] for t in transactions}),
+        'category_sales': {},
+        'category_weights': {},
+        'warga_activity': {},
+        'daily_sales': {},
+        'daily_fees': {},
+    }
+    for t in transactions:
+        amount = t['total_amount'] or 0
+        name = t['category_name']
+        result['category_sales'][name] = result['category_sales'].get(name, 0) + amount
+        result['category_weights'][name] = result['category_weights'].get(name, 0) + (t['weight_kg'] or 0)
+        result['warga_activity'][t['warga_name']] = result['warga_activity'].get(t['warga_name'], 0) + 1
+        day = str(t['transaction_date'])[:10]
+        result['daily_sales'][day] = result['daily_sales'].get(day, 0) + amount
+        result['daily_fees'][day] = result['daily_fees'].get(day, 0) + (t['committee_fee'] or 0)
+    return result
+
+
+def run(mode):
+    use_database('laporan', fresh=False)
+    reports.CHART_WORKERS = 1
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == 'before':
+        aggregates = aggregate_rows(utils.get_transactions(start_date=START, end_date=END))
+    else:
+        aggregates = utils.get_report_aggregates(START, END)
+    fetched = time.perf_counter() - started
+    pdf = reports.generate_pdf_laporan(aggregates, START, END)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    print(f'  {mode:7s} data {fetched:6.2f} s   report {total:6.2f} s   peak {peak:7.1f} MiB   '
+          f'pdf {len(pdf.getvalue()) // 1024} KiB   {aggregates["total_transactions"]} tx')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    use_database('laporan')
+    seed_transactions(count, warga=300)
+    before = aggregate_rows(utils.get_transactions(start_date=START, end_date=END))
+    after = utils.get_report_aggregates(START, END)
+    for key, value in before.items():
+        if isinstance(value, dict):
+            assert value.keys() == after[key].keys(), key
+            assert all(abs(value[name] - after[key][name]) < 1e-6 for name in value), key
+        else:
+            assert abs(value - after[key]) < 1e-6, key
+    print(f'one-year report over {count} transactions (aggregates match):')
+    for mode in ('before', 'after'):
+        subprocess.run([sys.executable, __file__, '--run', mode], check=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2])
+    else:
+        main()
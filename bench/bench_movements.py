@@ -0,0 +1,105 @@
+"""Edit/delete latency of a financial movement vs the size of the warga's history
+
+    python bench/bench_movements.py [rounds]
+
+Edits shift the later rows by a constant delta, so the cost should stay flat in the number
+of earlier movements and grow only with the later ones the UPDATE touches.
+"""
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from _common import database, use_database
+
+import utils
+
+SIZES = (100, 1_000, 10_000)
+DEPOSIT = 10_000.0
+WITHDRAWAL = 1_000.0
+
+
+def seed_movements(count, admin_id, start=datetime(2025, 1, 1)):
+    """A new warga with `count` movements (every 10th a withdrawal) and a consistent balance chain"""
+    with database.session() as cursor:
+        cursor.execute(
+            "INSERT INTO users (username, password, full_name, role) VALUES (?, 'x', ?, 'warga')",
+            (f'bench_movements_{count}', f'Warga Movements {count}'),
+        )
+        warga_id = cursor.lastrowid
+        rows, balance = [], 0.0
+        for index in range(count):
+            movement_type, amount = ('withdrawal', WITHDRAWAL) if index % 10 == 9 else ('deposit', DEPOSIT)
+            after = balance + (amount if movement_type == 'deposit' else -amount)
+            moment = start + timedelta(minutes=index)
+            rows.append((warga_id, movement_type, amount, balance, after, admin_id,
+                         moment.strftime(database.TIMESTAMP_FORMAT), f'bench {index}'))
+            balance = after
+        cursor.executemany('''
+            INSERT INTO financial_movements
+            (warga_id, type, amount, balance_before, balance_after, processed_by, movement_date, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        cursor.execute('UPDATE users SET balance = ? WHERE id = ?', (balance, warga_id))
+    return warga_id
+
+
+def movement_ids(warga_id):
+    with database.session() as cursor:
+        cursor.execute(
+            "SELECT id FROM financial_movements WHERE warga_id = ? AND type = 'deposit' ORDER BY movement_date, id",
+            (warga_id,),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def median_ms(func, rounds, setup=lambda index: index):
+    """Median of `rounds` calls of func(setup(index)) in ms; setup runs outside the timing"""
+    timings = []
+    for index in range(rounds):
+        arg = setup(index)
+        started = time.perf_counter()
+        ok, message = func(arg)
+        timings.append(time.perf_counter() - started)
+        assert ok, message
+    return statistics.median(timings) * 1000
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    use_database('movements')
+    with database.session() as cursor:
+        cursor.execute("SELECT id FROM users WHERE role != 'warga' LIMIT 1")
+        admin_id = cursor.fetchone()[0]
+
+    print(f'median of {rounds} calls, ms per edit')
+    print(f'{"movements":>10}  {"position":<8} {"update":>8} {"delete":>8}')
+    for size in SIZES:
+        warga_id = seed_movements(size, admin_id)
+        for position in ('first', 'middle', 'last'):
+            def pick():
+                ids = movement_ids(warga_id)
+                return ids[{'first': 0, 'middle': len(ids) // 2, 'last': -1}[position]]
+
+            target = pick()
+            update = median_ms(
+                lambda index: utils.update_financial_movement(
+                    target, 'deposit', DEPOSIT + index % 2, 'bench edit', admin_id),
+                rounds,
+            )
+            # Each delete removes a different row at the same position
+            delete = median_ms(utils.delete_financial_movement, rounds, setup=lambda index: pick())
+            print(f'{size:>10,}  {position:<8} {update:8.2f} {delete:8.2f}')
+
+        with database.session() as cursor:
+            cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
+            balance = cursor.fetchone()[0]
+            cursor.execute(
+                'SELECT balance_after FROM financial_movements WHERE warga_id = ? ORDER BY movement_date DESC, id DESC LIMIT 1',
+                (warga_id,),
+            )
+            assert abs(cursor.fetchone()[0] - balance) < 1e-6
+
+
+if __name__ == '__main__':
+    main()
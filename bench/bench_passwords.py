@@ -0,0 +1,65 @@
+"""KDF cost per scrypt n (calibration) and the cost of each login path
+
+    python bench/bench_passwords.py [target_ms]
+"""
+import hashlib
+import statistics
+import sys
+import time
+
+from _common import database, use_database
+
+import auth
+import passwords
+
+
+def median_ms(func, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else passwords.CALIBRATION_TARGET_MS
+    timings, chosen = passwords.calibrate(target)
+    print(f'calibration (best of 3, target {target:.0f} ms):')
+    for n, ms in timings:
+        print(f'  n=2^{n.bit_length() - 1:<2} ({128 * n * passwords.SCRYPT_R // 2 ** 20:>4} MiB)  {ms:8.1f} ms'
+              + ('  <- chosen' if n == chosen else ''))
+
+    use_database('passwords')
+    database.set_setting(passwords.COST_SETTING, str(chosen))
+    legacy = hashlib.sha256(b'warga123').hexdigest()
+    with database.session() as cursor:
+        cursor.execute("UPDATE users SET password = ? WHERE username = 'warga2'", (legacy,))
+        database.mark_dirty('users')
+
+    def old_login():
+        # Before the KDF: unsalted SHA256 compared in SQL
+        with database.session() as cursor:
+            cursor.execute('SELECT id FROM users WHERE username = ? AND password = ? AND active = 1',
+                           ('warga2', hashlib.sha256(b'warga123').hexdigest()))
+            return cursor.fetchone()
+
+    def cold_login():
+        auth._verified.clear()
+        return auth.authenticate_user('warga2', 'warga123')
+
+    print('login paths (median):')
+    print(f'  old sha256 in SQL             {median_ms(old_login, 50):8.3f} ms')
+    started = time.perf_counter()
+    user = auth.authenticate_user('warga2', 'warga123')
+    print(f'  first legacy login + rehash   {(time.perf_counter() - started) * 1000:8.1f} ms')
+    print(f'  KDF login                     {median_ms(cold_login, 5):8.1f} ms')
+    print(f'  cached re-check               {median_ms(lambda: auth.authenticate_user("warga2", "warga123"), 50):8.3f} ms')
+    print(f'  wrong password                {median_ms(lambda: auth.authenticate_user("warga2", "salah"), 5):8.1f} ms')
+    print(f'  unknown user                  {median_ms(lambda: auth.authenticate_user("tidak_ada", "x"), 5):8.1f} ms')
+    token = auth.issue_session_token(user['id'])
+    print(f'  rerun token check             {median_ms(lambda: auth.validate_session_token(token, user["id"]), 200):8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Receipts per second: render_receipt (one document each) vs render_receipts (one document for all),
+with the static header/column header/footer replayed from recorded templates vs drawn on every page
+
+    python bench/bench_receipts.py [receipts]
+"""
+import sys
+import time
+
+from _common import seed_transactions, use_database
+
+import receipts
+import utils
+
+ITEM = {
+    'category_name': 'Plastik Botol', 'weight_kg': 2.5, 'price_per_kg': 3000.0,
+    'total_amount': 7500.0, 'committee_fee': 750.0, 'net_amount': 6750.0,
+}
+BATCH = {
+    'batch_id': 'batch-1', 'warga_name': 'Warga Contoh', 'processed_by_name': 'Panitia',
+    'notes': 'catatan', 'transaction_date': '2026-01-01 10:00:00',
+    'items': [dict(ITEM, id=1000 + i) for i in range(3)],
+}
+
+
+def rate(batches):
+    """(render_receipt receipts/s, render_receipts receipts/s, combined document KiB)"""
+    receipts.render_receipt(batches[0])
+    started = time.perf_counter()
+    for batch in batches:
+        receipts.render_receipt(batch)
+    single = len(batches) / (time.perf_counter() - started)
+    started = time.perf_counter()
+    document = receipts.render_receipts(batches)
+    combined = len(batches) / (time.perf_counter() - started)
+    return single, combined, len(document) // 1024
+
+
+def draw_static_block(pdf, name):
+    """What ReceiptPDF.stamp replaced: run the block's fpdf2 calls on every page"""
+    receipts.TEMPLATES[name](pdf)
+    pdf.set_text_color(0, 0, 0)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f'{count} synthetic 3-item receipts:')
+    stamp = receipts.ReceiptPDF.stamp
+    receipts.ReceiptPDF.stamp = draw_static_block
+    print('  drawn per page  render_receipt {:6.0f}/s   render_receipts {:6.0f}/s   ({} KiB)'.format(
+        *rate([BATCH] * count)))
+    receipts.ReceiptPDF.stamp = stamp
+    print('  templates       render_receipt {:6.0f}/s   render_receipts {:6.0f}/s   ({} KiB)'.format(
+        *rate([BATCH] * count)))
+
+    use_database('receipts')
+    seed_transactions(2000, warga=50)
+    rows, _ = utils.get_transactions_page(page_size=count)
+    batches = receipts.group_batches(rows)
+    print(f'history page of {len(batches)} batches:')
+    print('  templates       render_receipt {:6.0f}/s   render_receipts {:6.0f}/s   ({} KiB)'.format(*rate(batches)))
+
+
+if __name__ == '__main__':
+    main()
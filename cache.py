@@ -0,0 +1,117 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+# Read-through cache for the query helpers. Each table has a generation counter; writers bump it
+# after commit and cached entries stamped with an older generation are treated as misses.
+DEFAULT_MAXSIZE = 128
+DEFAULT_TTL_SECONDS = 300
+
+_generations = {}
+_generations_lock = threading.Lock()
+_registry = {}
+
+
+def bump(*tables):
+    """Invalidate cached reads of the given tables"""
+    with _generations_lock:
+        for table in tables:
+            _generations[table] = _generations.get(table, 0) + 1
+
+
+def generation(tables):
+    """Current generation tuple for a set of tables"""
+    with _generations_lock:
+        return tuple(_generations.get(table, 0) for table in tables)
+
+
+def _copy_result(value):
+    # Hand out top-level copies so callers appending/sorting do not corrupt the cached value
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class _LRUCache:
+    """Bounded mapping of key -> (generation, expires_at, value) with hit/miss counters"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, current_generation):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == current_generation and entry[1] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[2]
+            if entry:
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, current_generation, ttl, value):
+        with self.lock:
+            self.entries[key] = (current_generation, time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def cached(tables, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL_SECONDS):
+    """Memoize a read helper on (args, generation of tables); results must be treated as read-only"""
+    tables = tuple(tables)
+
+    def decorator(func):
+        store = _LRUCache(maxsize)
+        _registry[f"{func.__module__}.{func.__name__}"] = store
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            # Read the generation before querying so a concurrent write makes this entry stale
+            current_generation = generation(tables)
+            hit, value = store.get(key, current_generation)
+            if hit:
+                return _copy_result(value)
+            value = func(*args, **kwargs)
+            store.put(key, current_generation, ttl, value)
+            return _copy_result(value)
+
+        wrapper.cache_clear = store.clear
+        return wrapper
+
+    return decorator
+
+
+def stats():
+    """Hit/miss/size counters per cached function"""
+    result = {}
+    for name, store in sorted(_registry.items()):
+        with store.lock:
+            total = store.hits + store.misses
+            result[name] = {
+                'hits': store.hits,
+                'misses': store.misses,
+                'hit_rate': store.hits / total if total else 0.0,
+                'size': len(store.entries),
+                'maxsize': store.maxsize,
+            }
+    return result
+
+
+def clear_all():
+    """Drop every cached entry (e.g. after restoring the database file)"""
+    for store in _registry.values():
+        store.clear()
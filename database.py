@@ -1,25 +1,153 @@
 import sqlite3
-import hashlib
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import os
+import sys
+import time
+import cache
+import passwords
 
 DATABASE_NAME = 'bank_sampah.db'
 
-def get_connection():
-    """Create database connection"""
-    conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False)
+# Bump together with MIGRATIONS so existing databases re-run the bootstrap and pick up new migrations.
+SCHEMA_VERSION = '8'
+
+# Pragmas applied once when a pooled connection is opened. Negative cache_size is in KiB.
+CONNECTION_PRAGMAS = {
+    # Takes effect for new database files only (it must precede the first table); older files
+    # switch over with the one-off vacuum() maintenance step
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,
+    'mmap_size': 134217728,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+# Canonical stored timestamp layout (same as SQLite CURRENT_TIMESTAMP) so range filters compare as text.
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_local = threading.local()
+
+
+class PooledConnection(sqlite3.Connection):
+    """Per-thread connection whose close() keeps the handle open for reuse"""
+
+    def close(self):
+        # Behave like a real close for callers (drop uncommitted work) unless a session() owns the transaction
+        if self.in_transaction and not getattr(_local, 'session_depth', 0):
+            self.rollback()
+
+    def dispose(self):
+        """Really close the underlying SQLite handle"""
+        super().close()
+
+
+def _open_connection():
+    conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False, factory=PooledConnection)
     conn.row_factory = sqlite3.Row
+    for name, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
     return conn
 
+
+def get_connection():
+    """Return the calling thread's pooled database connection"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.database != DATABASE_NAME:
+        if conn is not None:
+            conn.dispose()
+            # Cached reads belong to the previous database file
+            cache.clear_all()
+        conn = _open_connection()
+        _local.conn = conn
+        _local.database = DATABASE_NAME
+    return conn
+
+
+def close_connection():
+    """Dispose of the calling thread's pooled connection (e.g. before deleting the DB file)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.dispose()
+        _local.conn = None
+
+
+@contextmanager
+def session(immediate=False):
+    """Yield a cursor on the pooled connection; commit on success, roll back on error.
+
+    Nested sessions join the outermost one, which owns the commit. With immediate=True the
+    outermost session starts with BEGIN IMMEDIATE so read-modify-write sequences hold the
+    write lock from their first read.
+    """
+    conn = get_connection()
+    depth = getattr(_local, 'session_depth', 0)
+    _local.session_depth = depth + 1
+    if depth == 0:
+        _local.dirty_tables = set()
+    try:
+        if immediate and depth == 0 and not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        yield conn.cursor()
+        if depth == 0:
+            conn.commit()
+            cache.bump(*_local.dirty_tables)
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        raise
+    finally:
+        _local.session_depth = depth
+        if depth == 0:
+            _local.dirty_tables = set()
+
+def in_session():
+    """True while the calling thread is inside a session() (a new session would join it)"""
+    return getattr(_local, 'session_depth', 0) > 0
+
+@contextmanager
+def read_cursor():
+    """Yield a cursor on a private read-only connection for long streaming reads (exports).
+
+    Unlike session() it does not join the thread's pooled connection, so writes made while a
+    stream is open (e.g. job progress) still commit on their own.
+    """
+    conn = _open_connection()
+    conn.execute('PRAGMA query_only = ON')
+    try:
+        yield conn.cursor()
+    finally:
+        conn.dispose()
+
+def mark_dirty(*tables):
+    """Invalidate cached reads of tables written in the current session once it commits"""
+    if getattr(_local, 'session_depth', 0):
+        _local.dirty_tables.update(tables)
+    else:
+        cache.bump(*tables)
+
+def format_timestamp(value=None):
+    """Render a datetime (or ISO string) in TIMESTAMP_FORMAT, defaulting to now"""
+    if value is None:
+        value = datetime.now()
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.strftime(TIMESTAMP_FORMAT)
+
 def hash_password(password):
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password with a salted KDF (see passwords.py)"""
+    return passwords.hash_password(password)
 
 def init_database():
     """Initialize database with all required tables"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    with session() as cursor:
+        _create_schema(cursor)
+
+def _create_schema(cursor):
+    """Create tables and backfill columns using an open cursor"""
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -151,14 +279,8 @@ def init_database():
     if 'batch_id' not in t_cols:
         cursor.execute('ALTER TABLE transactions ADD COLUMN batch_id TEXT DEFAULT ""')
 
-    conn.commit()
-    conn.close()
-
 def create_default_users():
     """Create default users for each role"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     default_users = [
         ('superuser', 'admin123', 'Super Administrator', '', 'Jalan Super Admin 1', '', '', '081234567800', 'superuser'),
         ('panitia1', 'panitia123', 'Admin Koordinator', 'Koordinator', 'Jl. Admin Utama No. 45, Jakarta', '01', '02', '081234567891', 'panitia'),
@@ -167,24 +289,28 @@ def create_default_users():
         ('warga2', 'warga123', 'Warga Contoh 2', 'Mbak Warga', 'Jl. Mawar Melati No. 25, Jakarta', '03', '05', '081234567893', 'warga'),
     ]
     
-    for username, password, full_name, nickname, address, rt, rw, whatsapp, role in default_users:
-        try:
-            cursor.execute('''
-                INSERT INTO users (username, password, full_name, nickname, address, rt, rw, whatsapp, role)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (username, hash_password(password), full_name, nickname, address, rt, rw, whatsapp, role))
-        except sqlite3.IntegrityError:
-            # User already exists
-            pass
-    
-    conn.commit()
-    conn.close()
+    with session() as cursor:
+        # Hashing is deliberately slow (scrypt), so only users that are actually missing get one
+        cursor.execute(
+            f"SELECT username FROM users WHERE username IN ({','.join('?' * len(default_users))})",
+            [user[0] for user in default_users],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        for username, password, full_name, nickname, address, rt, rw, whatsapp, role in default_users:
+            if username in existing:
+                continue
+            try:
+                cursor.execute('''
+                    INSERT INTO users (username, password, full_name, nickname, address, rt, rw, whatsapp, role)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (username, hash_password(password), full_name, nickname, address, rt, rw, whatsapp, role))
+            except sqlite3.IntegrityError:
+                # User already exists
+                pass
+        mark_dirty('users')
 
 def create_default_categories():
     """Create default waste categories"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     default_categories = [
         ('Plastik Botol', 3000),
         ('Plastik Kemasan', 2000),
@@ -195,62 +321,301 @@ def create_default_categories():
         ('Kaca', 500),
     ]
     
-    for name, price in default_categories:
+    with session() as cursor:
+        for name, price in default_categories:
+            try:
+                cursor.execute('''
+                    INSERT INTO categories (name, price_per_kg)
+                    VALUES (?, ?)
+                ''', (name, price))
+            except sqlite3.IntegrityError:
+                # Category already exists
+                pass
+        mark_dirty('categories')
+
+def _migration_hot_indexes(cursor):
+    """v2: secondary indexes for the transaction, movement, earnings and audit filters"""
+    statements = [
+        'CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(transaction_date)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_warga_date ON transactions(warga_id, transaction_date)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_category_date '
+        'ON transactions(category_id, transaction_date, weight_kg, total_amount)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_batch ON transactions(batch_id)',
+        'CREATE INDEX IF NOT EXISTS idx_movements_date ON financial_movements(movement_date)',
+        'CREATE INDEX IF NOT EXISTS idx_movements_warga_date ON financial_movements(warga_id, movement_date)',
+        'CREATE INDEX IF NOT EXISTS idx_committee_earnings_date ON committee_earnings(earned_date, amount)',
+        'CREATE INDEX IF NOT EXISTS idx_committee_earnings_transaction ON committee_earnings(transaction_id)',
+        'CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_audit_log_user_timestamp ON audit_log(user_id, timestamp)',
+    ]
+    for statement in statements:
+        cursor.execute(statement)
+    cursor.execute('PRAGMA optimize')
+
+def _migration_canonical_timestamps(cursor):
+    """v3: rewrite stored timestamps to TIMESTAMP_FORMAT so date ranges can use the indexes"""
+    columns = [
+        ('transactions', 'transaction_date'),
+        ('financial_movements', 'movement_date'),
+        ('committee_earnings', 'earned_date'),
+        ('audit_log', 'timestamp'),
+    ]
+    for table, column in columns:
+        cursor.execute(f'''
+            UPDATE {table}
+            SET {column} = strftime('%Y-%m-%d %H:%M:%S', {column})
+            WHERE {column} IS NOT NULL
+            AND (length({column}) != 19 OR substr({column}, 11, 1) != ' ')
+            AND strftime('%Y-%m-%d %H:%M:%S', {column}) IS NOT NULL
+        ''')
+
+def _migration_daily_stats(cursor):
+    """v4: per-day/category/warga rollup of transactions for the dashboards"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            date TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            warga_id INTEGER NOT NULL,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            weight_kg REAL NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            committee_fee REAL NOT NULL DEFAULT 0,
+            net_amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, category_id, warga_id)
+        )
+    ''')
+    # Covering indexes for the per-warga and per-category dashboard groupings
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_daily_stats_warga
+        ON daily_stats(warga_id, tx_count, weight_kg, net_amount)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_daily_stats_category
+        ON daily_stats(category_id, date, tx_count, weight_kg, total_amount)
+    ''')
+    rebuild_daily_stats(cursor)
+
+DAILY_STATS_UPSERT = '''
+    INSERT INTO daily_stats
+    (date, category_id, warga_id, tx_count, weight_kg, total_amount, committee_fee, net_amount)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date, category_id, warga_id) DO UPDATE SET
+        tx_count = tx_count + excluded.tx_count,
+        weight_kg = weight_kg + excluded.weight_kg,
+        total_amount = total_amount + excluded.total_amount,
+        committee_fee = committee_fee + excluded.committee_fee,
+        net_amount = net_amount + excluded.net_amount
+'''
+
+def record_daily_stats(cursor, rows):
+    """Fold (transaction_date, category_id, warga_id, weight_kg, total_amount, committee_fee, net_amount) rows into daily_stats"""
+    cursor.executemany(DAILY_STATS_UPSERT, [
+        (str(transaction_date)[:10], category_id, warga_id, 1, weight_kg, total_amount, committee_fee, net_amount)
+        for transaction_date, category_id, warga_id, weight_kg, total_amount, committee_fee, net_amount in rows
+    ])
+    mark_dirty('daily_stats')
+
+def rebuild_daily_stats(cursor=None):
+    """Recompute daily_stats from transactions (backfill/repair); returns the number of rollup rows"""
+    if cursor is None:
+        with session(immediate=True) as cursor:
+            return rebuild_daily_stats(cursor)
+    cursor.execute('DELETE FROM daily_stats')
+    cursor.execute('''
+        INSERT INTO daily_stats
+        (date, category_id, warga_id, tx_count, weight_kg, total_amount, committee_fee, net_amount)
+        SELECT date(transaction_date), category_id, warga_id, COUNT(*),
+               SUM(weight_kg), SUM(total_amount), SUM(committee_fee), SUM(net_amount)
+        FROM transactions
+        GROUP BY date(transaction_date), category_id, warga_id
+    ''')
+    mark_dirty('daily_stats')
+    cursor.execute('SELECT COUNT(*) FROM daily_stats')
+    return cursor.fetchone()[0]
+
+def _migration_jobs(cursor):
+    """v5: queue of background jobs (reports, exports) and their on-disk artifacts"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued' CHECK(status IN ('queued', 'running', 'done', 'failed')),
+            progress_done INTEGER NOT NULL DEFAULT 0,
+            progress_total INTEGER NOT NULL DEFAULT 0,
+            artifact_path TEXT,
+            artifact_name TEXT,
+            error TEXT,
+            created_by INTEGER,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            expires_at TEXT,
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_creator_created ON jobs(created_by, created_at)')
+
+def _migration_incremental_vacuum(cursor):
+    """v6: auto_vacuum = INCREMENTAL so pages freed by audit archival can be returned to the filesystem"""
+    # Only records the mode: an existing file needs a full VACUUM to apply it, which would lock and
+    # rewrite the whole database on the first page load. That is left to vacuum() (maintenance).
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
+# Free-text columns indexed by FTS5: table -> column. Each gets an external-content <table>_fts
+# index (rowid = table id) kept in sync by triggers, so the text is stored only once.
+FTS_COLUMNS = {
+    'audit_log': 'details',
+    'transactions': 'notes',
+    'financial_movements': 'notes',
+}
+
+def _migration_fts(cursor):
+    """v7: FTS5 indexes over audit details and transaction/movement notes"""
+    for table, column in FTS_COLUMNS.items():
+        fts = f'{table}_fts'
         try:
-            cursor.execute('''
-                INSERT INTO categories (name, price_per_kg)
-                VALUES (?, ?)
-            ''', (name, price))
-        except sqlite3.IntegrityError:
-            # Category already exists
-            pass
-    
-    conn.commit()
-    conn.close()
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    {column}, content='{table}', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as error:
+            # SQLite built without FTS5: search falls back to LIKE scans
+            print(f"FTS5 unavailable, skipping {fts}: {error}")
+            return
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+            END
+        ''')
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _migration_category_totals_index(cursor):
+    """v8: cover every daily_stats measure in the per-category index, so category totals never touch the table"""
+    cursor.execute('DROP INDEX IF EXISTS idx_daily_stats_category')
+    cursor.execute('''
+        CREATE INDEX idx_daily_stats_category
+        ON daily_stats(category_id, date, tx_count, weight_kg, total_amount, committee_fee, net_amount)
+    ''')
+
+# (version, migration) pairs, applied in order to databases stamped with an older schema_version
+MIGRATIONS = [
+    (2, _migration_hot_indexes),
+    (3, _migration_canonical_timestamps),
+    (4, _migration_daily_stats),
+    (5, _migration_jobs),
+    (6, _migration_incremental_vacuum),
+    (7, _migration_fts),
+    (8, _migration_category_totals_index),
+]
+
+def apply_migrations():
+    """Run every migration newer than the stored schema_version"""
+    current = int(get_setting('schema_version', '0') or 0)
+    for version, migration in MIGRATIONS:
+        if version > current:
+            with session() as cursor:
+                migration(cursor)
+            set_setting('schema_version', str(version))
+            print(f"Applied migration v{version}: {migration.__name__}")
+
+def _schema_is_current():
+    """Return True when the stored schema marker matches SCHEMA_VERSION"""
+    try:
+        return get_setting('schema_version') == SCHEMA_VERSION
+    except sqlite3.OperationalError:
+        # Fresh database: system_settings does not exist yet
+        return False
+
+def initialize_system(force=False):
+    """Complete system initialization (no-op fast path when the schema marker is current)"""
+    started = time.perf_counter()
+
+    if not force and _schema_is_current():
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"Database ready (schema v{SCHEMA_VERSION}, {elapsed_ms:.1f} ms)")
+        return
 
-def initialize_system():
-    """Complete system initialization"""
     init_database()
+    apply_migrations()
     create_default_users()
 
     # Seed kategori bawaan hanya sekali agar penghapusan manual tidak muncul lagi saat app restart.
     category_seeded = get_setting('default_categories_seeded', '0')
     if category_seeded != '1':
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM categories')
-        category_count = cursor.fetchone()[0]
-        conn.close()
+        with session() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM categories')
+            category_count = cursor.fetchone()[0]
 
         if category_count == 0:
             create_default_categories()
 
         set_setting('default_categories_seeded', '1')
 
-    print("Database initialized successfully!")
+    set_setting('schema_version', SCHEMA_VERSION)
 
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Database initialized successfully! (schema v{SCHEMA_VERSION}, {elapsed_ms:.1f} ms)")
 
+
+def needs_vacuum():
+    """True while the database file predates auto_vacuum = INCREMENTAL and vacuum() has not run yet"""
+    with session() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        return cursor.fetchone()[0] != 2
+
+
+def vacuum():
+    """One-off full VACUUM that applies auto_vacuum = INCREMENTAL to an older database file.
+
+    Rewrites the whole file under an exclusive lock (other writers get SQLITE_BUSY meanwhile) and
+    needs free disk space about the size of the database, so run it in a quiet period.
+    """
+    conn = get_connection()
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return not needs_vacuum()
+
+
+@cache.cached(('system_settings',))
 def get_setting(key, default=None):
     """Retrieve a simple key/value setting"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT value FROM system_settings WHERE key = ?', (key,))
-    row = cursor.fetchone()
-    conn.close()
+    with session() as cursor:
+        cursor.execute('SELECT value FROM system_settings WHERE key = ?', (key,))
+        row = cursor.fetchone()
     return row[0] if row else default
 
 
 def set_setting(key, value):
     """Upsert a simple key/value setting"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO system_settings (key, value)
-        VALUES (?, ?)
-        ON CONFLICT(key) DO UPDATE SET value = excluded.value
-    ''', (key, value))
-    conn.commit()
-    conn.close()
+    with session() as cursor:
+        cursor.execute('''
+            INSERT INTO system_settings (key, value)
+            VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+        mark_dirty('system_settings')
 
 if __name__ == '__main__':
-    initialize_system()
+    if sys.argv[1:] == ['rebuild-daily-stats']:
+        initialize_system()
+        print(f"daily_stats rebuilt ({rebuild_daily_stats()} rows)")
+    elif sys.argv[1:] == ['vacuum']:
+        initialize_system()
+        print("auto_vacuum = INCREMENTAL applied" if vacuum() else "VACUUM finished, auto_vacuum unchanged")
+    else:
+        initialize_system(force=True)
@@ -0,0 +1,179 @@
+import csv
+import audit
+from database import read_cursor
+from utils import date_range_filter
+
+# Bulk exports stream rows with fetchmany straight into the output file, so memory stays at one
+# chunk whatever the size of the date range.
+CHUNK_SIZE = 10000
+EXCEL_MAX_ROWS = 1048575  # sheet limit minus the header row
+
+FORMATS = {
+    'csv': 'CSV',
+    'xlsx': 'Excel (XLSX)',
+    'parquet': 'Parquet',
+}
+
+# table -> label, date column, query ({where} is the date filter) and typed output columns
+EXPORTS = {
+    'transactions': {
+        'label': 'Transaksi',
+        'date_column': 't.transaction_date',
+        'query': '''
+            SELECT t.id, t.transaction_date, t.batch_id, t.warga_id, u.full_name,
+                   t.category_id, c.name, t.weight_kg, t.price_per_kg, t.total_amount,
+                   t.committee_fee, t.net_amount, p.full_name, t.notes
+            FROM transactions t
+            JOIN users u ON t.warga_id = u.id
+            JOIN categories c ON t.category_id = c.id
+            JOIN users p ON t.processed_by = p.id
+            WHERE 1=1{where}
+            ORDER BY t.transaction_date, t.id
+        ''',
+        'columns': [
+            ('id', 'int'), ('transaction_date', 'str'), ('batch_id', 'str'), ('warga_id', 'int'),
+            ('warga_name', 'str'), ('category_id', 'int'), ('category_name', 'str'),
+            ('weight_kg', 'float'), ('price_per_kg', 'float'), ('total_amount', 'float'),
+            ('committee_fee', 'float'), ('net_amount', 'float'), ('processed_by_name', 'str'),
+            ('notes', 'str'),
+        ],
+    },
+    'financial_movements': {
+        'label': 'Pergerakan Saldo',
+        'date_column': 'm.movement_date',
+        'query': '''
+            SELECT m.id, m.movement_date, m.warga_id, u.full_name, m.type, m.amount,
+                   m.balance_before, m.balance_after, p.full_name, m.notes
+            FROM financial_movements m
+            JOIN users u ON m.warga_id = u.id
+            JOIN users p ON m.processed_by = p.id
+            WHERE 1=1{where}
+            ORDER BY m.movement_date, m.id
+        ''',
+        'columns': [
+            ('id', 'int'), ('movement_date', 'str'), ('warga_id', 'int'), ('warga_name', 'str'),
+            ('type', 'str'), ('amount', 'float'), ('balance_before', 'float'),
+            ('balance_after', 'float'), ('processed_by_name', 'str'), ('notes', 'str'),
+        ],
+    },
+    'audit_log': {
+        'label': 'Audit Log',
+        'date_column': 'a.timestamp',
+        'query': '''
+            SELECT a.id, a.timestamp, a.user_id, u.username, a.action, a.details, a.ip_address
+            FROM audit_log a
+            LEFT JOIN users u ON a.user_id = u.id
+            WHERE 1=1{where}
+            ORDER BY a.timestamp, a.id
+        ''',
+        'columns': [
+            ('id', 'int'), ('timestamp', 'str'), ('user_id', 'int'), ('username', 'str'),
+            ('action', 'str'), ('details', 'str'), ('ip_address', 'str'),
+        ],
+    },
+}
+
+
+def _spec(table):
+    if table not in EXPORTS:
+        raise ValueError(f"Tabel export tidak dikenal: {table}")
+    if table == 'audit_log':
+        # Include events still queued in the audit writer
+        audit.flush()
+    return EXPORTS[table]
+
+
+def count_rows(table, start_date=None, end_date=None):
+    """Number of rows an export of table over the date range will write"""
+    spec = _spec(table)
+    where, params = date_range_filter(spec['date_column'], start_date, end_date)
+    query = spec['query'].format(where=where)
+    with read_cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM ({query})', params)
+        return cursor.fetchone()[0]
+
+
+def iter_chunks(table, start_date=None, end_date=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of row tuples (EXPORTS column order) for table over the date range"""
+    spec = _spec(table)
+    where, params = date_range_filter(spec['date_column'], start_date, end_date)
+    with read_cursor() as cursor:
+        cursor.execute(spec['query'].format(where=where), params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+
+
+def _write_csv(path, spec, chunks, progress):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow([name for name, _ in spec['columns']])
+        for rows in chunks:
+            writer.writerows(rows)
+            count += len(rows)
+            progress(count)
+    return count
+
+
+def _write_xlsx(path, spec, chunks, progress):
+    from openpyxl import Workbook
+
+    # write_only keeps only the current row in memory; rows are flushed to a temp file as appended
+    workbook = Workbook(write_only=True)
+    header = [name for name, _ in spec['columns']]
+    sheet = None
+    sheet_rows = EXCEL_MAX_ROWS
+    count = 0
+    for rows in chunks:
+        for row in rows:
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(f"{spec['label']} {len(workbook.worksheets) + 1}"[:31])
+                sheet.append(header)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+        count += len(rows)
+        progress(count)
+    if sheet is None:
+        workbook.create_sheet(spec['label']).append(header)
+    workbook.save(path)
+    return count
+
+
+def _write_parquet(path, spec, chunks, progress):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string()}
+    # Fixed schema: a chunk where a column is all NULL must not change the inferred type
+    schema = pa.schema([(name, types[kind]) for name, kind in spec['columns']])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            count += len(rows)
+            progress(count)
+    return count
+
+
+_WRITERS = {
+    'csv': _write_csv,
+    'xlsx': _write_xlsx,
+    'parquet': _write_parquet,
+}
+
+
+def write_export(table, fmt, path, start_date=None, end_date=None, progress=None):
+    """Stream table rows in the date range into path as csv/xlsx/parquet; returns the row count"""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Format export tidak dikenal: {fmt}")
+    spec = _spec(table)
+    chunks = iter_chunks(table, start_date, end_date)
+    return _WRITERS[fmt](path, spec, chunks, progress or (lambda count: None))
@@ -0,0 +1,285 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import audit
+import database
+import exports
+import receipts
+from database import session, format_timestamp
+from reports import generate_pdf_laporan
+from utils import get_report_aggregates, count_transaction_batches, iter_transaction_batches
+
+# Local background job queue: rows in the jobs table, a few daemon worker threads per server
+# process, and finished artifacts on disk (beside the database) until they expire.
+ARTIFACT_DIR = 'job_artifacts'
+ARTIFACT_TTL = timedelta(hours=24)
+WORKER_COUNT = 2
+POLL_SECONDS = 2.0
+PROGRESS_INTERVAL_SECONDS = 0.5
+PURGE_INTERVAL_SECONDS = 600
+
+STATUS_LABELS = {
+    'queued': 'Menunggu antrian',
+    'running': 'Sedang diproses',
+    'done': 'Selesai',
+    'failed': 'Gagal',
+}
+
+_handlers = {}
+_workers = []
+_workers_lock = threading.Lock()
+_wakeup = threading.Event()
+# Held while expired artifacts and audit rows are cleaned up, so two workers never do it at once
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+
+def register(kind, suffix):
+    """Register handler(params, path, report) for a job kind; it returns the item count (0 = nothing to deliver)"""
+    def decorator(func):
+        _handlers[kind] = (func, suffix)
+        return func
+    return decorator
+
+
+def submit(kind, params, created_by=None, artifact_name=None):
+    """Queue a job and return its id; params must be JSON-serialisable"""
+    if kind not in _handlers:
+        raise ValueError(f"Jenis job tidak dikenal: {kind}")
+    job_id = uuid.uuid4().hex
+    with session() as cursor:
+        cursor.execute('''
+            INSERT INTO jobs (id, kind, params, status, artifact_name, created_by, created_at)
+            VALUES (?, ?, ?, 'queued', ?, ?, ?)
+        ''', (job_id, kind, json.dumps(params), artifact_name, created_by, format_timestamp()))
+    start_workers()
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id):
+    """Current row of a job as a dict, or None once it is unknown or purged"""
+    with session() as cursor:
+        cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def list_jobs(created_by=None, kinds=None, limit=10):
+    """Most recent jobs, optionally for one user and/or a set of kinds"""
+    query = 'SELECT * FROM jobs WHERE 1=1'
+    params = []
+    if created_by is not None:
+        query += ' AND created_by = ?'
+        params.append(created_by)
+    if kinds:
+        query += f" AND kind IN ({','.join('?' * len(kinds))})"
+        params.extend(kinds)
+    query += ' ORDER BY created_at DESC LIMIT ?'
+    params.append(int(limit))
+    with session() as cursor:
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def artifact_dir():
+    """Artifact directory beside the database file (independent of the process working directory)"""
+    return os.path.join(os.path.dirname(os.path.abspath(database.DATABASE_NAME)), ARTIFACT_DIR)
+
+
+def artifact_path(job):
+    """Path of a finished job's artifact, or None when there is nothing (left) to download"""
+    path = job.get('artifact_path') if job else None
+    if job and job['status'] == 'done' and path and os.path.exists(path):
+        return path
+    return None
+
+
+def purge_expired():
+    """Delete expired jobs together with their artifact files; returns how many were removed"""
+    with session() as cursor:
+        cursor.execute('''
+            SELECT id, artifact_path FROM jobs
+            WHERE status IN ('done', 'failed') AND expires_at < ?
+        ''', (format_timestamp(),))
+        expired = cursor.fetchall()
+        for row in expired:
+            if row['artifact_path'] and os.path.exists(row['artifact_path']):
+                os.remove(row['artifact_path'])
+        cursor.executemany('DELETE FROM jobs WHERE id = ?', [(row['id'],) for row in expired])
+    return len(expired)
+
+
+def start_workers(count=WORKER_COUNT):
+    """Start the worker threads once per process; later calls are no-ops"""
+    with _workers_lock:
+        if _workers:
+            return
+        os.makedirs(artifact_dir(), exist_ok=True)
+        # Jobs left running by a previous server process are picked up again
+        with session() as cursor:
+            cursor.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+        for index in range(count):
+            worker = threading.Thread(target=_worker_loop, name=f'job-worker-{index}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def _claim_next_job():
+    with session(immediate=True) as cursor:
+        cursor.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+            (format_timestamp(), row['id']),
+        )
+    return dict(row)
+
+
+def _progress_reporter(job_id):
+    last_write = [0.0]
+
+    def report(done, total):
+        now = time.monotonic()
+        if done < total and now - last_write[0] < PROGRESS_INTERVAL_SECONDS:
+            return
+        last_write[0] = now
+        with session() as cursor:
+            cursor.execute(
+                'UPDATE jobs SET progress_done = ?, progress_total = ? WHERE id = ?',
+                (done, total, job_id),
+            )
+
+    return report
+
+
+def _finish(job_id, status, path=None, error=None):
+    finished = datetime.now()
+    with session() as cursor:
+        cursor.execute('''
+            UPDATE jobs SET status = ?, artifact_path = ?, error = ?, finished_at = ?, expires_at = ?
+            WHERE id = ?
+        ''', (status, path, error, format_timestamp(finished), format_timestamp(finished + ARTIFACT_TTL), job_id))
+
+
+def _run_job(job):
+    handler, suffix = _handlers[job['kind']]
+    path = os.path.join(artifact_dir(), f"{job['id']}{suffix}")
+    partial = f"{path}.part"
+    try:
+        count = handler(json.loads(job['params']), partial, _progress_reporter(job['id']))
+        if count:
+            os.replace(partial, path)
+            _finish(job['id'], 'done', path=path)
+        else:
+            _finish(job['id'], 'done')
+    except Exception as error:
+        _finish(job['id'], 'failed', error=str(error))
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def _purge_if_due():
+    """Periodic cleanup of expired artifacts and audit rows; skipped while another worker runs it"""
+    global _last_purge
+    if time.monotonic() - _last_purge <= PURGE_INTERVAL_SECONDS or not _purge_lock.acquire(blocking=False):
+        return
+    try:
+        # Re-check under the lock: another worker may have just finished a purge
+        if time.monotonic() - _last_purge > PURGE_INTERVAL_SECONDS:
+            _last_purge = time.monotonic()
+            purge_expired()
+            audit.archive_expired()
+    finally:
+        _purge_lock.release()
+
+
+def _worker_loop():
+    while True:
+        try:
+            job = _claim_next_job()
+            if job is not None:
+                if job['kind'] in _handlers:
+                    _run_job(job)
+                else:
+                    _finish(job['id'], 'failed', error=f"Jenis job tidak dikenal: {job['kind']}")
+                continue
+            _purge_if_due()
+        except Exception as error:
+            # Keep the worker alive (e.g. database busy); the job stays queued for the next pass
+            print(f"Job worker error: {error}")
+        _wakeup.wait(POLL_SECONDS)
+        _wakeup.clear()
+
+
+@register('laporan_pdf', '.pdf')
+def _laporan_pdf_job(params, path, report):
+    start_date = date.fromisoformat(params['start_date'])
+    end_date = date.fromisoformat(params['end_date'])
+    report(0, 2)
+    aggregates = get_report_aggregates(start_date, end_date, warga_id=params.get('warga_id'))
+    if not aggregates['total_transactions']:
+        return 0
+    report(1, 2)
+    with open(path, 'wb') as output:
+        output.write(generate_pdf_laporan(aggregates, start_date, end_date).getvalue())
+    report(2, 2)
+    return aggregates['total_transactions']
+
+
+def _receipts_job(params, path, report, fmt):
+    total = count_transaction_batches(**params)
+    if fmt == 'pdf' and total > receipts.PDF_BATCH_LIMIT:
+        raise ValueError(f"PDF gabungan dibatasi {receipts.PDF_BATCH_LIMIT} nota, gunakan format ZIP")
+    report(0, total)
+    return receipts.write_receipts(
+        iter_transaction_batches(**params), path, fmt, lambda count: report(count, total)
+    )
+
+
+@register('receipts_zip', '.zip')
+def _receipts_zip_job(params, path, report):
+    return _receipts_job(params, path, report, 'zip')
+
+
+@register('receipts_pdf', '.pdf')
+def _receipts_pdf_job(params, path, report):
+    return _receipts_job(params, path, report, 'pdf')
+
+
+def _export_job(params, path, report, fmt):
+    start_date, end_date = params.get('start_date'), params.get('end_date')
+    total = exports.count_rows(params['table'], start_date, end_date)
+    report(0, total)
+    return exports.write_export(
+        params['table'], fmt, path, start_date, end_date, lambda count: report(count, total)
+    )
+
+
+@register('export_csv', '.csv')
+def _export_csv_job(params, path, report):
+    return _export_job(params, path, report, 'csv')
+
+
+@register('export_xlsx', '.xlsx')
+def _export_xlsx_job(params, path, report):
+    return _export_job(params, path, report, 'xlsx')
+
+
+@register('export_parquet', '.parquet')
+def _export_parquet_job(params, path, report):
+    return _export_job(params, path, report, 'parquet')
+
+
+@register('audit_archive', '')
+def _audit_archive_job(params, path, report):
+    with _purge_lock:
+        audit.archive_expired(progress=report)
+    return 0
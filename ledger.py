@@ -0,0 +1,85 @@
+import random
+import sqlite3
+import time
+from database import session, mark_dirty, in_session
+
+# Retries on top of the connection's busy_timeout, for bursts where several writers queue up
+BUSY_RETRIES = 5
+BUSY_BACKOFF_SECONDS = 0.05
+
+
+def _is_busy_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def _retry_on_busy(operation):
+    """Run operation(), retrying with jittered exponential backoff while SQLite reports busy"""
+    if in_session():
+        # Joined to a caller's transaction: a retry would run inside the same failed transaction
+        # without the write lock, so the busy error goes straight to the outermost session
+        return operation()
+    delay = BUSY_BACKOFF_SECONDS
+    for attempt in range(BUSY_RETRIES):
+        try:
+            return operation()
+        except sqlite3.OperationalError as error:
+            if not _is_busy_error(error) or attempt == BUSY_RETRIES - 1:
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+
+
+def post_movement(warga_id, movement_type, amount, processed_by, notes=""):
+    """Apply a deposit or withdrawal to users.balance and record it in financial_movements.
+
+    The balance changes in SQL (balance = balance +/- ?) inside BEGIN IMMEDIATE, and a
+    withdrawal only matches when balance >= amount, so concurrent posts can neither
+    overwrite each other nor overdraw. Returns (True, new_balance) or (False, message).
+    """
+    if movement_type not in ('deposit', 'withdrawal'):
+        return False, "Tipe transaksi keuangan tidak valid"
+    if amount is None or float(amount) <= 0:
+        return False, "Jumlah harus lebih dari 0"
+    amount = float(amount)
+
+    def apply():
+        with session(immediate=True) as cursor:
+            cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return False, "User tidak ditemukan"
+            balance_before = row[0] or 0
+
+            if movement_type == 'withdrawal':
+                cursor.execute(
+                    'UPDATE users SET balance = balance - ? WHERE id = ? AND balance >= ?',
+                    (amount, warga_id, amount),
+                )
+            else:
+                cursor.execute('UPDATE users SET balance = balance + ? WHERE id = ?', (amount, warga_id))
+            if cursor.rowcount == 0:
+                return False, "Saldo tidak mencukupi"
+
+            cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
+            balance_after = cursor.fetchone()[0]
+
+            cursor.execute('''
+                INSERT INTO financial_movements
+                (warga_id, type, amount, balance_before, balance_after, processed_by, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (warga_id, movement_type, amount, balance_before, balance_after, processed_by, notes))
+            mark_dirty('financial_movements', 'users')
+        return True, balance_after
+
+    return _retry_on_busy(apply)
+
+
+def deposit(warga_id, amount, processed_by, notes=""):
+    """Credit a warga balance"""
+    return post_movement(warga_id, 'deposit', amount, processed_by, notes)
+
+
+def withdraw(warga_id, amount, processed_by, notes=""):
+    """Debit a warga balance, refusing to overdraw"""
+    return post_movement(warga_id, 'withdrawal', amount, processed_by, notes)
@@ -0,0 +1,128 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import sqlite3
+import sys
+import time
+
+# Stored hashes describe their own parameters: "scrypt$<n>$<r>$<p>$<salt>$<key>" (base64, no padding),
+# or "pbkdf2_sha256$<iterations>$<salt>$<key>" on Pythons built without hashlib.scrypt. A bare
+# 64-character hex string is the legacy unsalted SHA256; it still verifies and is upgraded on login.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Calibrated scrypt n (system_settings), see `python passwords.py calibrate`
+COST_SETTING = 'password_scrypt_n'
+CALIBRATION_TARGET_MS = 100
+MIN_SCRYPT_N = 2 ** 12
+MAX_SCRYPT_N = 2 ** 20
+
+HAS_SCRYPT = hasattr(hashlib, 'scrypt')
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p, dklen=KEY_BYTES):
+    # OpenSSL's default 32 MiB cap is below what larger n need (128 * n * r bytes)
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + (1 << 20), dklen=dklen)
+
+
+def current_scrypt_n():
+    """scrypt n used for new hashes: the calibrated setting when valid, else SCRYPT_N"""
+    from database import get_setting
+    try:
+        n = int(get_setting(COST_SETTING, SCRYPT_N))
+    except (sqlite3.OperationalError, TypeError, ValueError):
+        return SCRYPT_N
+    if MIN_SCRYPT_N <= n <= MAX_SCRYPT_N and n & (n - 1) == 0:
+        return n
+    return SCRYPT_N
+
+
+def hash_password(password, n=None):
+    """Salted KDF hash of password in the self-describing storage format"""
+    salt = os.urandom(SALT_BYTES)
+    if HAS_SCRYPT:
+        n = n or current_scrypt_n()
+        key = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+    key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, PBKDF2_ITERATIONS, KEY_BYTES)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(password, stored):
+    """Check password against a stored hash of any supported format (constant-time compare)"""
+    if not stored:
+        return False
+    scheme, _, rest = stored.partition('$')
+    fields = rest.split('$')
+    try:
+        if scheme == 'scrypt' and len(fields) == 5 and HAS_SCRYPT:
+            n, r, p = (int(value) for value in fields[:3])
+            expected = _unb64(fields[4])
+            key = _scrypt(password, _unb64(fields[3]), n, r, p, dklen=len(expected))
+        elif scheme == 'pbkdf2_sha256' and len(fields) == 3:
+            expected = _unb64(fields[2])
+            key = hashlib.pbkdf2_hmac('sha256', password.encode(), _unb64(fields[1]), int(fields[0]), len(expected))
+        elif len(stored) == 64 and not rest:
+            expected = stored.encode()
+            key = hashlib.sha256(password.encode()).hexdigest().encode()
+        else:
+            return False
+    except (ValueError, binascii.Error):
+        return False
+    return hmac.compare_digest(key, expected)
+
+
+def needs_rehash(stored):
+    """True for legacy hashes and hashes made with other than the current parameters"""
+    if HAS_SCRYPT:
+        return not stored.startswith(f"scrypt${current_scrypt_n()}${SCRYPT_R}${SCRYPT_P}$")
+    return not stored.startswith(f"pbkdf2_sha256${PBKDF2_ITERATIONS}$")
+
+
+def calibrate(target_ms=CALIBRATION_TARGET_MS, rounds=3):
+    """Time one scrypt hash per n (best of rounds); returns [(n, ms)] and the largest n within target_ms"""
+    timings = []
+    chosen = MIN_SCRYPT_N
+    n = MIN_SCRYPT_N
+    while n <= MAX_SCRYPT_N:
+        best = min(_time_hash(n) for _ in range(rounds))
+        timings.append((n, best))
+        if best > target_ms:
+            break
+        chosen = n
+        n *= 2
+    return timings, chosen
+
+
+def _time_hash(n):
+    started = time.perf_counter()
+    _scrypt('calibration', os.urandom(SALT_BYTES), n, SCRYPT_R, SCRYPT_P)
+    return (time.perf_counter() - started) * 1000
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['calibrate'] and HAS_SCRYPT:
+        from database import initialize_system, set_setting
+        target = float(sys.argv[2]) if len(sys.argv) > 2 else CALIBRATION_TARGET_MS
+        timings, chosen = calibrate(target)
+        for n, ms in timings:
+            print(f"n=2^{n.bit_length() - 1:<2} ({128 * n * SCRYPT_R // 2 ** 20:>4} MiB)  {ms:8.1f} ms")
+        initialize_system()
+        set_setting(COST_SETTING, str(chosen))
+        print(f"{COST_SETTING} = {chosen} (target {target:.0f} ms); existing hashes are upgraded on next login")
+    else:
+        print("usage: python passwords.py calibrate [target_ms]")
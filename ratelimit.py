@@ -0,0 +1,180 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Login throttling kept in process memory, so rejected attempts never reach SQLite:
+# - a token bucket per username and per client (remote address or browser session)
+# - FAILURE_THRESHOLD consecutive failures lock a username for LOCKOUT_BASE_SECONDS, doubling with
+#   every further failure up to LOCKOUT_MAX_SECONDS; a successful login clears it
+# With PERSIST_LOCKOUTS the lockouts are mirrored to system_settings so a restart keeps them.
+USER_BUCKET = (5, 60.0)  # capacity, seconds to refill one token
+CLIENT_BUCKET = (20, 6.0)
+FAILURE_THRESHOLD = 5
+LOCKOUT_BASE_SECONDS = 30
+LOCKOUT_MAX_SECONDS = 3600
+# Failure counts of usernames that are not locked are forgotten after this long without a new failure
+FAILURE_RESET_SECONDS = 3600
+MAX_TRACKED_BUCKETS = 10000
+MAX_TRACKED_FAILURES = 10000
+PERSIST_LOCKOUTS = True
+STATE_SETTING = 'login_lockouts'
+
+# The client bucket is keyed on the connection's remote address. Behind a reverse proxy that is the
+# proxy, so every user would share one bucket: set TRUSTED_PROXY_HOPS to the number of proxies in
+# front of the app and the client address is taken from X-Forwarded-For instead. Only entries those
+# proxies appended are trusted; anything further left is client-supplied and ignored.
+TRUSTED_PROXY_HOPS = 0
+
+_buckets = {}  # (kind, key) -> [tokens, updated_at]
+_failures = {}  # username -> [consecutive failures, locked_until, last failure at]
+_lock = threading.Lock()
+
+
+def _normalize(username):
+    return (username or '').strip().lower()
+
+
+def _refill(key, now):
+    """Current (tokens, seconds per token) of a bucket; unknown buckets are full"""
+    capacity, seconds_per_token = USER_BUCKET if key[0] == 'user' else CLIENT_BUCKET
+    bucket = _buckets.get(key)
+    if bucket is None:
+        return float(capacity), seconds_per_token
+    return min(capacity, bucket[0] + (now - bucket[1]) / seconds_per_token), seconds_per_token
+
+
+def client_key(remote_ip, forwarded_for=()):
+    """Client bucket key: remote_ip, or the address the TRUSTED_PROXY_HOPS proxies forwarded"""
+    if TRUSTED_PROXY_HOPS:
+        hops = [hop.strip() for header in forwarded_for for hop in header.split(',') if hop.strip()]
+        # Each proxy appends the address it received the request from, so the client is the
+        # TRUSTED_PROXY_HOPS-th entry from the right
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return remote_ip
+
+
+def _prune_buckets(now):
+    # A refilled bucket is the same as no bucket; drop those when many usernames/clients pile up
+    capacity = {'user': USER_BUCKET[0], 'client': CLIENT_BUCKET[0]}
+    for key in [key for key in _buckets if _refill(key, now)[0] >= capacity[key[0]]]:
+        del _buckets[key]
+
+
+def _prune_failures(now):
+    # Unlocked counts go stale after FAILURE_RESET_SECONDS; if a username spray still fills the
+    # table, the unlocked entries with the oldest failure go first. Active lockouts are kept.
+    unlocked = sorted(
+        (failure[2], username) for username, failure in _failures.items() if failure[1] <= now
+    )
+    excess = len(_failures) - MAX_TRACKED_FAILURES // 2
+    for last_failure, username in unlocked:
+        if last_failure > now - FAILURE_RESET_SECONDS and excess <= 0:
+            break
+        del _failures[username]
+        excess -= 1
+
+
+def check(username, client):
+    """Seconds to wait before this login attempt may run (0 = allowed; a token is taken from both buckets)"""
+    username = _normalize(username)
+    now = time.time()
+    with _lock:
+        failure = _failures.get(username)
+        if failure and failure[1] > now:
+            return failure[1] - now
+        keys = [('user', username), ('client', client)]
+        levels = [_refill(key, now) for key in keys]
+        waits = [(1 - tokens) * seconds_per_token for tokens, seconds_per_token in levels if tokens < 1]
+        if waits:
+            return max(waits)
+        if len(_buckets) >= MAX_TRACKED_BUCKETS:
+            _prune_buckets(now)
+        for key, (tokens, _) in zip(keys, levels):
+            _buckets[key] = [tokens - 1, now]
+    return 0
+
+
+def record_failure(username):
+    """Count a failed login; returns the lockout length in seconds when this failure starts one"""
+    username = _normalize(username)
+    now = time.time()
+    with _lock:
+        if username not in _failures and len(_failures) >= MAX_TRACKED_FAILURES:
+            _prune_failures(now)
+        failure = _failures.setdefault(username, [0, 0.0, now])
+        failure[0] += 1
+        failure[2] = now
+        if failure[0] < FAILURE_THRESHOLD:
+            return 0
+        seconds = min(LOCKOUT_BASE_SECONDS * 2 ** (failure[0] - FAILURE_THRESHOLD), LOCKOUT_MAX_SECONDS)
+        failure[1] = now + seconds
+    _persist()
+    return seconds
+
+
+def record_success(username):
+    """Clear the failure count of a username after a successful login"""
+    with _lock:
+        failure = _failures.pop(_normalize(username), None)
+    if failure and failure[0] >= FAILURE_THRESHOLD:
+        _persist()
+
+
+def unlock(username):
+    """Admin override: drop the lockout, failure count and bucket of a username"""
+    username = _normalize(username)
+    with _lock:
+        _failures.pop(username, None)
+        _buckets.pop(('user', username), None)
+    _persist()
+
+
+def throttled():
+    """Locked usernames and exhausted buckets, longest wait first, for the admin view"""
+    now = time.time()
+    rows = []
+    with _lock:
+        for username, (failures, locked_until, _) in _failures.items():
+            if failures >= FAILURE_THRESHOLD or locked_until > now:
+                rows.append({'kind': 'user', 'key': username, 'failures': failures,
+                             'state': 'locked' if locked_until > now else 'escalated',
+                             'wait_seconds': max(0.0, locked_until - now)})
+        listed = {row['key'] for row in rows}
+        for kind, key in _buckets:
+            tokens, seconds_per_token = _refill((kind, key), now)
+            if tokens < 1 and not (kind == 'user' and key in listed):
+                rows.append({'kind': kind, 'key': key, 'failures': None,
+                             'state': 'rate_limited', 'wait_seconds': (1 - tokens) * seconds_per_token})
+    return sorted(rows, key=lambda row: row['wait_seconds'], reverse=True)
+
+
+def _persist():
+    if not PERSIST_LOCKOUTS:
+        return
+    from database import set_setting
+    with _lock:
+        state = {username: list(failure) for username, failure in _failures.items() if failure[0] >= FAILURE_THRESHOLD}
+    try:
+        set_setting(STATE_SETTING, json.dumps(state))
+    except sqlite3.Error as error:
+        # Best effort: the in-memory lockout still applies to this process
+        print(f"Login lockout persist error: {error}")
+
+
+def load_state():
+    """Restore persisted lockouts (once per server process, at bootstrap)"""
+    if not PERSIST_LOCKOUTS:
+        return
+    from database import get_setting
+    try:
+        state = json.loads(get_setting(STATE_SETTING, '{}') or '{}')
+    except (sqlite3.Error, ValueError):
+        return
+    with _lock:
+        for username, failure in state.items():
+            failures, locked_until = int(failure[0]), float(failure[1])
+            # Older states have no last-failure time; the lock end is the closest stand-in
+            last_failure = float(failure[2]) if len(failure) > 2 else locked_until
+            _failures.setdefault(username, [failures, locked_until, last_failure])
@@ -0,0 +1,218 @@
+import functools
+import zipfile
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+# Layout shared by every receipt: column widths (mm) and the static header/footer text
+COLUMNS = [
+    ('ID', 12, 'C'),
+    ('Kategori', 55, 'L'),
+    ('Berat', 22, 'R'),
+    ('Harga/Kg', 28, 'R'),
+    ('Total', 28, 'R'),
+    ('Fee', 22, 'R'),
+    ('Diterima', 23, 'R'),
+]
+LABEL_WIDTH = sum(width for _, width, _ in COLUMNS[:4])
+VALUE_WIDTH = sum(width for _, width, _ in COLUMNS[4:])
+GREEN = (76, 175, 80)
+LIGHT_GREEN = (232, 245, 233)
+TITLE = 'Nota Transaksi Bank Sampah'
+SUBTITLE = 'Bank Sampah Wani Luru RW 1'
+FOOTER_NOTE = 'Kurangi penggunaan kertas, simpan nota ini secara digital.'
+# Equivalent of the deprecated ln=True, without fpdf2 emitting a warning on every cell
+NEXT_LINE = {'new_x': XPos.LMARGIN, 'new_y': YPos.NEXT}
+# fpdf2 keeps every page of a document in memory until output(), so the combined PDF is capped;
+# larger exports go to ZIP, which is written one receipt at a time
+PDF_BATCH_LIMIT = 300
+
+
+def _register_fonts(pdf):
+    # Same font order in every document, so the /F<n> names inside recorded templates match
+    pdf.set_font('Helvetica', '')
+    pdf.set_font('Helvetica', 'B')
+
+
+def _draw_header(pdf):
+    pdf.set_fill_color(*GREEN)
+    pdf.rect(10, 8, 190, 18, 'F')
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 10, TITLE, **NEXT_LINE, align='C')
+    pdf.set_font('Helvetica', '', 10)
+    pdf.cell(0, 6, SUBTITLE, **NEXT_LINE, align='C')
+    pdf.ln(5)
+
+
+def _draw_column_header(pdf):
+    pdf.set_fill_color(*GREEN)
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_font('Helvetica', 'B', 10)
+    for label, width, align in COLUMNS[:-1]:
+        pdf.cell(width, 8, label, border=1, align=align, fill=True)
+    label, width, align = COLUMNS[-1]
+    pdf.cell(width, 8, label, border=1, **NEXT_LINE, align=align, fill=True)
+
+
+def _draw_footer(pdf):
+    pdf.set_font('Helvetica', 'B', 11)
+    pdf.set_text_color(*GREEN)
+    pdf.cell(0, 8, 'Go Green', **NEXT_LINE)
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font('Helvetica', '', 9)
+    pdf.multi_cell(0, 6, FOOTER_NOTE)
+
+
+TEMPLATES = {
+    'header': _draw_header,
+    'column_header': _draw_column_header,
+    'footer': _draw_footer,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _template(name):
+    """(PDF operators, top y, height) of a static block, drawn once on a scratch page.
+
+    Reads the page content buffer of fpdf2 (pinned in requirements.txt).
+    """
+    pdf = FPDF()
+    _register_fonts(pdf)
+    pdf.add_page()
+    # Start from a font and fill colour the blocks never use, so every state they rely on is recorded
+    pdf.set_font('Helvetica', '', 1)
+    pdf.set_fill_color(1, 2, 3)
+    contents = pdf.pages[pdf.page].contents
+    start, top = len(contents), pdf.y
+    TEMPLATES[name](pdf)
+    return bytes(contents[start:]), top, pdf.y - top
+
+
+class ReceiptPDF(FPDF):
+    """A4 receipt document; every page gets the green banner header"""
+
+    def __init__(self):
+        super().__init__()
+        self.set_auto_page_break(auto=True, margin=15)
+        _register_fonts(self)
+
+    def header(self):
+        self.stamp('header')
+
+    def stamp(self, name):
+        """Draw a static block of TEMPLATES at the current y by replaying its recorded operators"""
+        operators, top, height = _template(name)
+        if self.y + height > self.page_break_trigger:
+            self.add_page()
+        # Shifted into place, inside q/Q so the page keeps its own font and colours afterwards
+        self._out(f'q 1 0 0 1 0 {(top - self.y) * self.k:.2f} cm')
+        self._out(operators)
+        self._out('Q')
+        self.set_y(self.y + height)
+
+
+def group_batches(transactions):
+    """Group transaction rows (get_transactions shape) into receipt batches, keeping row order"""
+    grouped = {}
+    for t in transactions:
+        key = t['batch_id'] if t['batch_id'] else f"single-{t['id']}"
+        if key not in grouped:
+            grouped[key] = {
+                'batch_id': key,
+                'warga_name': t['warga_name'],
+                'processed_by_name': t['processed_by_name'],
+                'notes': t['notes'],
+                'transaction_date': t['transaction_date'],
+                'items': [],
+            }
+        grouped[key]['items'].append(t)
+    return list(grouped.values())
+
+
+def _draw_receipt(pdf, batch):
+    items = batch['items']
+    total_amount = sum(it['total_amount'] for it in items)
+    total_fee = sum(it['committee_fee'] for it in items)
+    total_net = sum(it['net_amount'] for it in items)
+
+    pdf.add_page()
+    pdf.set_font('Helvetica', '', 11)
+    if batch.get('batch_id'):
+        pdf.cell(0, 8, f"Batch/Transaksi: {batch['batch_id']}", **NEXT_LINE)
+    pdf.cell(0, 8, f"Warga: {batch['warga_name']}", **NEXT_LINE)
+    pdf.cell(0, 8, f"Diproses oleh: {batch['processed_by_name']}", **NEXT_LINE)
+    pdf.cell(0, 8, f"Tanggal: {batch['transaction_date']}", **NEXT_LINE)
+    if batch.get('notes'):
+        pdf.multi_cell(0, 8, f"Catatan: {batch['notes']}")
+    pdf.ln(4)
+
+    pdf.stamp('column_header')
+
+    pdf.set_font('Helvetica', '', 10)
+    for it in items:
+        values = [
+            str(it['id']),
+            it['category_name'][:24],
+            f"{it['weight_kg']:.2f} Kg",
+            f"Rp {it['price_per_kg']:,.0f}",
+            f"Rp {it['total_amount']:,.0f}",
+            f"Rp {it['committee_fee']:,.0f}",
+            f"Rp {it['net_amount']:,.0f}",
+        ]
+        for (_, width, align), value in zip(COLUMNS[:-1], values):
+            pdf.cell(width, 8, value, border=1, align=align)
+        _, width, align = COLUMNS[-1]
+        pdf.cell(width, 8, values[-1], border=1, **NEXT_LINE, align=align)
+
+    pdf.set_fill_color(*LIGHT_GREEN)
+    pdf.set_font('Helvetica', 'B', 10)
+    for label, value in (('Total Kotor', total_amount), ('Fee Admin (10%)', total_fee), ('Diterima Warga', total_net)):
+        pdf.cell(LABEL_WIDTH, 8, label, border=1, fill=True)
+        pdf.cell(VALUE_WIDTH, 8, f"Rp {value:,.0f}", border=1, **NEXT_LINE, align='R', fill=True)
+
+    pdf.ln(6)
+    pdf.stamp('footer')
+
+
+def render_receipt(batch):
+    """PDF bytes of one receipt (batch dict as produced by group_batches)"""
+    return render_receipts([batch])
+
+
+def render_receipts(batches):
+    """PDF bytes with one receipt page per batch, built in a single document pass"""
+    pdf = ReceiptPDF()
+    for batch in batches:
+        _draw_receipt(pdf, batch)
+    return bytes(pdf.output())
+
+
+def write_receipts(batches, path, fmt='zip', progress=None):
+    """Stream receipts for an iterable of batches into path and return how many were written.
+
+    fmt='zip' writes one PDF member per batch as soon as it is rendered; fmt='pdf' writes a
+    single multi-page document of at most PDF_BATCH_LIMIT receipts. progress(count) is called
+    after every receipt.
+    """
+    count = 0
+    if fmt == 'zip':
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for batch in batches:
+                archive.writestr(f"nota_{batch['batch_id']}.pdf", render_receipt(batch))
+                count += 1
+                if progress:
+                    progress(count)
+    elif fmt == 'pdf':
+        pdf = ReceiptPDF()
+        for batch in batches:
+            if count == PDF_BATCH_LIMIT:
+                raise ValueError(f"PDF gabungan dibatasi {PDF_BATCH_LIMIT} nota, gunakan format ZIP")
+            _draw_receipt(pdf, batch)
+            count += 1
+            if progress:
+                progress(count)
+        if count:
+            pdf.output(path)
+    else:
+        raise ValueError(f"Format nota tidak dikenal: {fmt}")
+    return count
@@ -0,0 +1,476 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from fpdf import FPDF
+from matplotlib.figure import Figure
+
+# Chart PNGs are rendered in spawned worker processes (matplotlib holds the GIL for the whole
+# draw) and memoized in this process by a hash of the chart inputs.
+CHART_WORKERS = min(4, os.cpu_count() or 1)
+CHART_CACHE_SIZE = 64
+
+_chart_pool = None
+_chart_pool_broken = False
+_chart_pool_lock = threading.Lock()
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+
+
+def _pdf_output_bytes(pdf):
+    output = pdf.output(dest="S")
+    if isinstance(output, bytes):
+        return output
+    if isinstance(output, bytearray):
+        return bytes(output)
+    if isinstance(output, memoryview):
+        return output.tobytes()
+    return output.encode("latin-1")
+
+
+def _figure_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=100)
+    return buffer.getvalue()
+
+
+def _create_bar_chart(data, title, xlabel, color='#1E88E5', top_n=10, ascending=False):
+    """Create a horizontal bar chart; returns PNG bytes or None."""
+    if not data:
+        return None
+
+    # Sort and slice
+    sorted_items = sorted(data.items(), key=lambda x: x[1], reverse=not ascending)[:top_n]
+    if not sorted_items:
+        return None
+
+    # Reverse for plotting (bottom-to-top)
+    labels = [k for k, v in sorted_items][::-1]
+    values = [v for k, v in sorted_items][::-1]
+
+    # Figure() instead of pyplot: no global figure registry, so renders never share state
+    fig = Figure(figsize=(7, 4))
+    ax = fig.subplots()
+    bars = ax.barh(labels, values, color=color, alpha=0.8)
+
+    # Value labels
+    for bar in bars:
+        width = bar.get_width()
+        label_x_pos = width + (max(values) * 0.01) if values else 0
+        ax.text(label_x_pos, bar.get_y() + bar.get_height()/2, f'{width:,.0f}',
+                va='center', fontsize=8)
+
+    ax.set_title(title, fontsize=10, pad=10)
+    ax.set_xlabel(xlabel, fontsize=8)
+    ax.tick_params(axis='both', which='major', labelsize=8)
+
+    # Remove borders
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+    fig.tight_layout()
+    return _figure_png(fig)
+
+
+def _create_dual_line_chart(dates, sales, fees):
+    """Create a dual line chart for sales and committee revenue; returns PNG bytes or None."""
+    if not dates:
+        return None
+
+    fig = Figure(figsize=(7, 4))
+    ax1 = fig.subplots()
+
+    # Plot Sales (Total Transaction Value)
+    color = '#1E88E5'
+    ax1.set_xlabel('Tanggal', fontsize=8)
+    ax1.set_ylabel('Transaksi Penjualan (Rp)', color=color, fontsize=8)
+    line1 = ax1.plot(dates, sales, marker='o', color=color, linewidth=2, label='Transaksi')
+    ax1.tick_params(axis='y', labelcolor=color, labelsize=8)
+    ax1.tick_params(axis='x', labelsize=8, rotation=30)
+    ax1.grid(True, linestyle='--', alpha=0.3)
+
+    # Instantiate a second axes that shares the same x-axis
+    ax2 = ax1.twinx()
+    color = '#4CAF50'
+    ax2.set_ylabel('Pendapatan Panitia (Rp)', color=color, fontsize=8)
+    line2 = ax2.plot(dates, fees, marker='s', color=color, linewidth=2, linestyle='--', label='Pendapatan Panitia')
+    ax2.tick_params(axis='y', labelcolor=color, labelsize=8)
+
+    # Added title and legend
+    ax2.set_title("Tren Transaksi Penjualan vs Pendapatan Panitia", fontsize=10, pad=10)
+
+    # Legend
+    lines = line1 + line2
+    labels = [l.get_label() for l in lines]
+    ax1.legend(lines, labels, loc='upper left', fontsize=8)
+
+    fig.tight_layout()
+    return _figure_png(fig)
+
+
+_CHART_BUILDERS = {
+    'bar': _create_bar_chart,
+    'dual_line': _create_dual_line_chart,
+}
+
+
+def _render_chart(spec):
+    """Worker entry point: spec is (kind, args, kwargs)"""
+    kind, args, kwargs = spec
+    return _CHART_BUILDERS[kind](*args, **kwargs)
+
+
+def _chart_key(spec):
+    return hashlib.sha256(repr(spec).encode()).hexdigest()
+
+
+def _get_chart_pool():
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            # spawn: forking a threaded server process (Streamlit) is unsafe
+            _chart_pool = ProcessPoolExecutor(
+                max_workers=CHART_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _chart_pool
+
+
+def _disable_chart_pool():
+    # A pool that failed once (e.g. workers cannot re-import __main__) would fail again on every report
+    global _chart_pool, _chart_pool_broken
+    with _chart_pool_lock:
+        if _chart_pool is not None:
+            _chart_pool.shutdown(wait=False, cancel_futures=True)
+        _chart_pool = None
+        _chart_pool_broken = True
+
+
+def render_charts(specs):
+    """PNG bytes (or None) for each chart spec, rendered concurrently and served from cache when unchanged"""
+    keys = [_chart_key(spec) for spec in specs]
+    results = {}
+    with _chart_cache_lock:
+        for key in keys:
+            if key in _chart_cache:
+                _chart_cache.move_to_end(key)
+                results[key] = _chart_cache[key]
+
+    missing = {key: spec for key, spec in zip(keys, specs) if key not in results}
+    if missing:
+        rendered = None
+        if CHART_WORKERS > 1 and len(missing) > 1 and not _chart_pool_broken:
+            try:
+                pool = _get_chart_pool()
+                futures = {key: pool.submit(_render_chart, spec) for key, spec in missing.items()}
+                rendered = {key: future.result() for key, future in futures.items()}
+            except (BrokenProcessPool, OSError):
+                # Worker died or processes are unavailable: render in this process from now on
+                _disable_chart_pool()
+        if rendered is None:
+            # Single core (or single chart): a worker round-trip would only add pickling overhead
+            rendered = {key: _render_chart(spec) for key, spec in missing.items()}
+
+        with _chart_cache_lock:
+            for key, png in rendered.items():
+                _chart_cache[key] = png
+                while len(_chart_cache) > CHART_CACHE_SIZE:
+                    _chart_cache.popitem(last=False)
+        results.update(rendered)
+
+    return [results[key] for key in keys]
+
+
+def _chart_image(png):
+    return io.BytesIO(png) if png else None
+
+
+def generate_pdf_laporan(aggregates, start_date, end_date):
+    """Build the laporan kinerja PDF from utils.get_report_aggregates output; returns a BytesIO."""
+    start_label = start_date.strftime("%d %B %Y") if start_date else "-"
+    end_label = end_date.strftime("%d %B %Y") if end_date else "-"
+
+    total_transactions = aggregates['total_transactions']
+    total_weight = aggregates['total_weight']
+    total_revenue = aggregates['total_revenue']
+    total_fee = aggregates['total_fee']
+    warga_unique = aggregates['warga_unique']
+    category_sales = aggregates['category_sales'] # name -> total_amount
+    category_weights = aggregates['category_weights'] # name -> total_weight
+    warga_activity = aggregates['warga_activity'] # name -> count
+    daily_sales = aggregates['daily_sales'] # date_str -> amount
+    daily_fees = aggregates['daily_fees'] # date_str -> amount
+
+    # Prepare chart data
+    sorted_dates = sorted(list(set(daily_sales.keys()) | set(daily_fees.keys())))
+    date_objs = [datetime.strptime(d, "%Y-%m-%d") for d in sorted_dates]
+    sales_values = [daily_sales.get(d, 0) for d in sorted_dates]
+    fee_values = [daily_fees.get(d, 0) for d in sorted_dates]
+
+    # Generate Charts
+    chart_best_cat, chart_worst_cat, chart_active_warga, chart_trend = map(_chart_image, render_charts([
+        ('bar', (category_sales, "Top 10 Kategori Terlaku (Berdasarkan Nilai Rp)", "Total Penjualan (Rp)"), {'top_n': 10, 'ascending': False}),
+        ('bar', (category_sales, "Top 10 Kategori Tidak Laku (Berdasarkan Nilai Rp)", "Total Penjualan (Rp)"), {'color': '#FF5722', 'top_n': 10, 'ascending': True}),
+        ('bar', (warga_activity, "Top 10 Warga Teraktif", "Jumlah Transaksi"), {'color': '#4CAF50', 'top_n': 10, 'ascending': False}),
+        ('dual_line', (date_objs, sales_values, fee_values), {}),
+    ]))
+
+    # --- PDF Generation ---
+    class LaporanPDF(FPDF):
+        def header(self):
+            # No header on cover page (page 1)
+            if self.page_no() > 1:
+                self.set_font('Helvetica', 'I', 8)
+                self.set_text_color(128)
+                self.cell(0, 10, 'Bank Sampah Wani Luru RW 1 - Laporan Kinerja Operasional', 0, 0, 'R')
+                self.ln(10)
+        
+        def footer(self):
+            self.set_y(-15)
+            self.set_font('Helvetica', 'I', 8)
+            self.set_text_color(128)
+            self.cell(0, 10, f'Halaman {self.page_no()}', 0, 0, 'C')
+
+    pdf = LaporanPDF()
+    pdf.set_auto_page_break(auto=True, margin=20)
+
+    # 1. Halaman Judul (Cover)
+    pdf.add_page()
+    pdf.set_draw_color(30, 136, 229) # Blue border
+    pdf.set_line_width(1)
+    pdf.rect(10, 10, 190, 277)
+    
+    pdf.ln(60)
+    pdf.set_font("Helvetica", "B", 24)
+    pdf.set_text_color(13, 71, 161) # Dark Blue
+    pdf.multi_cell(0, 15, "LAPORAN KINERJA\nBANK SAMPAH WANI LURU", align='C')
+    
+    pdf.ln(20)
+    pdf.set_font("Helvetica", "", 14)
+    pdf.set_text_color(0)
+    pdf.cell(0, 10, f"Periode: {start_label} s.d. {end_label}", ln=True, align='C')
+    
+    pdf.ln(80)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.cell(0, 8, "Disusun Oleh:", ln=True, align='C')
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "Tim Pengelola Bank Sampah Wani Luru RW 1", ln=True, align='C')
+    pdf.ln(5)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.cell(0, 8, f"Waniluru, {datetime.now().strftime('%d %B %Y')}", ln=True, align='C')
+
+    # 2. Kata Pengantar
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, "KATA PENGANTAR", ln=True, align='C')
+    pdf.ln(10)
+    
+    pdf.set_font("Helvetica", "", 11)
+    intro_text = (
+        "Puji syukur kami panjatkan ke hadirat Tuhan Yang Maha Esa atas rahmat dan karunia-Nya, "
+        "sehingga kami dapat menyelesaikan Laporan Kinerja Operasional Bank Sampah Wani Luru RW 1 ini dengan baik. "
+        "Laporan ini disusun sebagai bentuk pertanggungjawaban dan transparansi pengelolaan bank sampah kepada "
+        "seluruh warga dan pemangku kepentingan.\n\n"
+        "Melalui laporan ini, kami menyajikan data dan analisis mengenai aktivitas pengelolaan sampah, "
+        "termasuk volume sampah yang tereduksi, nilai ekonomi yang dihasilkan, serta partisipasi warga "
+        "selama periode pelaporan. Kami berharap laporan ini dapat menjadi bahan evaluasi untuk meningkatkan "
+        "kinerja dan layanan Bank Sampah Wani Luru RW 1 ke depannya.\n\n"
+        "Terima kasih kami sampaikan kepada seluruh warga yang telah aktif berpartisipasi, serta semua pihak "
+        "yang telah mendukung operasional bank sampah ini."
+    )
+    pdf.multi_cell(0, 7, intro_text)
+    
+    pdf.ln(20)
+    pdf.cell(0, 7, f"Waniluru, {datetime.now().strftime('%d %B %Y')}", ln=True, align='R')
+    pdf.ln(15)
+    pdf.cell(0, 7, "Pengelola", ln=True, align='R')
+
+    # 3. Daftar Isi (Simulated)
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, "DAFTAR ISI", ln=True, align='C')
+    pdf.ln(10)
+    
+    pdf.set_font("Helvetica", "", 11)
+    toc = [
+        ("BAB I PENDAHULUAN", "4"),
+        ("BAB II LAPORAN UTAMA & DATA", "5"),
+        ("BAB III ANALISIS VISUAL", "6"),
+        ("BAB IV PENUTUP", "7"),
+        ("LAMPIRAN", "8"),
+    ]
+    for title, page in toc:
+        pdf.cell(170, 8, title, 0, 0)
+        pdf.cell(20, 8, page, 0, 1, 'R')
+        pdf.line(pdf.get_x(), pdf.get_y(), pdf.get_x() + 190, pdf.get_y()) # Dotted line simulation logic skipped for simplicity
+
+    # 4. Pendahuluan
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, "BAB I", ln=True, align='C')
+    pdf.cell(0, 10, "PENDAHULUAN", ln=True, align='C')
+    pdf.ln(5)
+    
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "1.1 Latar Belakang", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    latar_belakang = (
+        "Permasalahan sampah merupakan isu lingkungan yang memerlukan perhatian serius dan penanganan "
+        "yang berkelanjutan. Bank Sampah Wani Luru RW 1 hadir sebagai solusi berbasis masyarakat untuk "
+        "mengelola sampah secara mandiri, mengubah sampah menjadi sumber daya ekonomi, dan membangun "
+        "kesadaran lingkungan di tengah masyarakat."
+    )
+    pdf.multi_cell(0, 7, latar_belakang)
+    pdf.ln(5)
+    
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "1.2 Tujuan", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    tujuan = (
+        "Laporan ini disusun dengan tujuan:\n"
+        "1. Memberikan gambaran kinerja operasional Bank Sampah Wani Luru RW 1.\n"
+        "2. Melaporkan data kuantitatif volume sampah dan nilai transaksi.\n"
+        "3. Mengevaluasi tingkat partisipasi warga dalam program bank sampah.\n"
+        "4. Sebagai bahan pertimbangan dalam pengambilan keputusan strategis."
+    )
+    pdf.multi_cell(0, 7, tujuan)
+
+    # 5. Isi/Laporan Utama
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, "BAB II", ln=True, align='C')
+    pdf.cell(0, 10, "LAPORAN UTAMA & DATA", ln=True, align='C')
+    pdf.ln(5)
+
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "2.1 Ringkasan Kinerja", ln=True)
+    pdf.ln(2)
+    
+    # Metric Grid Layout
+    pdf.set_font("Helvetica", "", 11)
+    col_width = 95
+    line_height = 10
+    
+    pdf.cell(col_width, line_height, f"Total Transaksi: {total_transactions}", border=1)
+    pdf.cell(col_width, line_height, f"Nasabah Aktif: {warga_unique} Orang", border=1, ln=True)
+    pdf.cell(col_width, line_height, f"Total Berat Terkumpul: {total_weight:,.2f} Kg", border=1)
+    pdf.cell(col_width, line_height, f"Volume Rata-rata/Hari: {total_weight/max(1, (end_date-start_date).days):,.2f} Kg", border=1, ln=True)
+    pdf.cell(col_width, line_height, f"Total Omzet Penjualan: Rp {total_revenue:,.0f}", border=1)
+    pdf.cell(col_width, line_height, f"Pendapatan Bersih Panitia: Rp {total_fee:,.0f}", border=1, ln=True)
+    
+    pdf.ln(10)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "2.2 Narasi Operasional", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    narasi_ops = (
+        f"Pada periode pelaporan ini, Bank Sampah Wani Luru RW 1 telah berhasil memfasilitasi {total_transactions} transaksi "
+        f"penyetoran sampah. Hal ini menunjukkan antusiasme warga yang positif. Total nilai ekonomi yang berputar "
+        f"mencapai Rp {total_revenue:,.0f}, dengan kontribusi pendapatan untuk operasional (fee) sebesar Rp {total_fee:,.0f}. "
+        f"Sampah jenis {sorted(category_sales.items(), key=lambda x: x[1], reverse=True)[0][0] if category_sales else 'Umum'} "
+        f"menjadi komoditas dengan nilai transaksi tertinggi."
+    )
+    pdf.multi_cell(0, 7, narasi_ops)
+
+    # 6. Analisis Visual (Charts)
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, "BAB III", ln=True, align='C')
+    pdf.cell(0, 10, "ANALISIS VISUAL", ln=True, align='C')
+    pdf.ln(5)
+
+    if chart_trend:
+        pdf.image(chart_trend, x=15, w=180)
+        pdf.ln(5)
+        pdf.set_font("Helvetica", "I", 10)
+        pdf.cell(0, 5, "Gambar 1. Grafik tren transaksi harian menunjukkan fluktuasi aktivitas penyetoran.", ln=True, align='C')
+        pdf.ln(10)
+
+    # Grid of charts
+    y_start = pdf.get_y()
+    
+    if chart_best_cat:
+        pdf.image(chart_best_cat, x=10, y=y_start, w=90)
+
+    if chart_worst_cat:
+        pdf.image(chart_worst_cat, x=110, y=y_start, w=90)
+
+    pdf.set_y(y_start + 70) 
+    
+    pdf.ln(5)
+    pdf.cell(0, 5, "Gambar 2. Perbandingan kategori sampah berdasarkan nilai ekonomi (Tertinggi vs Terendah).", ln=True, align='C')
+    
+    pdf.add_page()
+    if chart_active_warga:
+        pdf.image(chart_active_warga, x=55, w=100)
+        pdf.ln(5)
+        pdf.cell(0, 5, "Gambar 3. Sepuluh warga dengan frekuensi penyetoran teraktif.", ln=True, align='C')
+
+    # 7. Penutup
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, "BAB IV", ln=True, align='C')
+    pdf.cell(0, 10, "PENUTUP", ln=True, align='C')
+    pdf.ln(5)
+
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "4.1 Kesimpulan", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    
+    top_cat_name = sorted(category_sales.items(), key=lambda x: x[1], reverse=True)[0][0] if category_sales else "-"
+    kesimpulan = (
+        "Berdasarkan data yang telah dipaparkan, dapat disimpulkan bahwa:\n"
+        f"1. Kinerja bank sampah berjalan baik dengan partisipasi {warga_unique} nasabah aktif.\n"
+        f"2. Jenis sampah '{top_cat_name}' memiliki nilai ekonomi paling signifikan.\n"
+        "3. Sistem administrasi dan pencatatan transaksi telah berjalan transparan."
+    )
+    pdf.multi_cell(0, 7, kesimpulan)
+    pdf.ln(5)
+
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "4.2 Saran", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    saran = (
+        "1. Perlu dilakukan sosialisasi kembali untuk kategori sampah yang masih rendah penyetorannya.\n"
+        "2. Meningkatkan apresiasi kepada warga yang aktif untuk memotivasi warga lainnya.\n"
+        "3. Mempertahankan konsistensi jadwal pelayanan dan akurasi penimbangan."
+    )
+    pdf.multi_cell(0, 7, saran)
+
+    # 8. Lampiran (Table)
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, "LAMPIRAN", ln=True, align='C')
+    pdf.ln(5)
+    
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "Rincian Data Penjualan per Kategori", ln=True)
+    pdf.ln(2)
+
+    # Table Header
+    pdf.set_fill_color(220, 220, 220)
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.cell(10, 8, "No", border=1, align='C', fill=True)
+    pdf.cell(80, 8, "Nama Kategori", border=1, fill=True)
+    pdf.cell(40, 8, "Total Berat", border=1, align='R', fill=True)
+    pdf.cell(60, 8, "Total Penjualan", border=1, align='R', fill=True, ln=True)
+
+    # Table Content
+    pdf.set_font("Helvetica", "", 10)
+    sorted_cats = sorted(category_sales.items(), key=lambda x: x[1], reverse=True)
+    
+    for idx, (cat_name, rev) in enumerate(sorted_cats, 1):
+        weight = category_weights.get(cat_name, 0)
+        pdf.cell(10, 7, str(idx), border=1, align='C')
+        pdf.cell(80, 7, cat_name[:35], border=1)
+        pdf.cell(40, 7, f"{weight:,.2f} Kg", border=1, align='R')
+        pdf.cell(60, 7, f"Rp {rev:,.0f}", border=1, align='R', ln=True)
+
+    pdf_buffer = io.BytesIO(_pdf_output_bytes(pdf))
+    pdf_buffer.seek(0)
+    return pdf_buffer
@@ -0,0 +1,150 @@
+import re
+import audit
+from cache import cached
+from database import session, FTS_COLUMNS
+
+# Full-text search over audit details and transaction/movement notes. Uses the FTS5 indexes from
+# schema v7 (bm25-ranked, prefix matching) and falls back to LIKE scans when they are missing.
+# Matched terms in snippets are wrapped in HIGHLIGHT_START/HIGHLIGHT_END for the UI to style.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 16
+# bm25 has to be computed for every match before sorting, which dominates on common terms (tens of
+# thousands of hits), so only the newest RANK_WINDOW matches of each source are ranked.
+RANK_WINDOW = 2000
+
+# source -> label, joined base query (aliased as `base`) and the columns shown with each hit
+SOURCES = {
+    'audit_log': {
+        'label': 'Audit Log',
+        'query': '''
+            SELECT base.id, base.timestamp AS date, u.full_name AS who, base.action AS kind,
+                   NULL AS batch_id, {snippet} AS snippet, {rank} AS rank
+            FROM {source}
+            LEFT JOIN users u ON base.user_id = u.id
+            WHERE {match}
+        ''',
+    },
+    'transactions': {
+        'label': 'Catatan Transaksi',
+        'query': '''
+            SELECT base.id, base.transaction_date AS date, u.full_name AS who, c.name AS kind,
+                   base.batch_id, {snippet} AS snippet, {rank} AS rank
+            FROM {source}
+            JOIN users u ON base.warga_id = u.id
+            JOIN categories c ON base.category_id = c.id
+            WHERE {match}
+        ''',
+    },
+    'financial_movements': {
+        'label': 'Catatan Keuangan',
+        'query': '''
+            SELECT base.id, base.movement_date AS date, u.full_name AS who, base.type AS kind,
+                   NULL AS batch_id, {snippet} AS snippet, {rank} AS rank
+            FROM {source}
+            JOIN users u ON base.warga_id = u.id
+            WHERE {match}
+        ''',
+    },
+}
+
+
+def _terms(text):
+    return re.findall(r'\w+', text or '')
+
+
+@cached(('system_settings',))
+def fts_available():
+    """True when the FTS5 indexes of schema v7 exist"""
+    with session() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+                ','.join('?' * len(FTS_COLUMNS))
+            ),
+            [f'{table}_fts' for table in FTS_COLUMNS],
+        )
+        return cursor.fetchone()[0] == len(FTS_COLUMNS)
+
+
+def _fts_query(source, terms, limit):
+    fts = f'{source}_fts'
+    query = SOURCES[source]['query'].format(
+        source=f'{fts} JOIN {source} base ON base.id = {fts}.rowid',
+        snippet=f"snippet({fts}, 0, ?, ?, '…', {SNIPPET_TOKENS})",
+        rank=f'bm25({fts})',
+        match=f'''{fts} MATCH ? AND {fts}.rowid >= coalesce((
+            SELECT min(rowid) FROM (
+                SELECT rowid FROM {fts} WHERE {fts} MATCH ? ORDER BY rowid DESC LIMIT {RANK_WINDOW}
+            )
+        ), 0)''',
+    )
+    # Every term must match; quoting keeps user input out of FTS5 query syntax. Only the last term
+    # is a prefix (search as you type): prefix doclists are merged up front, exact ones seek lazily.
+    match = ' '.join(f'"{term}"' for term in terms) + '*'
+    params = [HIGHLIGHT_START, HIGHLIGHT_END, match, match, limit]
+    return f'{query} ORDER BY rank LIMIT ?', params
+
+
+def _like_query(source, terms, limit):
+    column = FTS_COLUMNS[source]
+    query = SOURCES[source]['query'].format(
+        source=f'{source} base',
+        snippet=f'base.{column}',
+        rank='0.0',
+        match=' AND '.join([f"base.{column} LIKE ? ESCAPE '\\'"] * len(terms)),
+    )
+    params = ['%' + re.sub(r'([%_\\])', r'\\\1', term) + '%' for term in terms]
+    return f'{query} ORDER BY date DESC LIMIT ?', params + [limit]
+
+
+def _highlight(text, terms):
+    """Wrap case-insensitive term matches for the LIKE fallback, trimmed like an FTS snippet"""
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - 60) if first else 0
+    excerpt = ('…' if start else '') + text[start:start + 160] + ('…' if len(text) > start + 160 else '')
+    return pattern.sub(lambda match: f'{HIGHLIGHT_START}{match.group(0)}{HIGHLIGHT_END}', excerpt)
+
+
+def search_text(text, sources=None, limit=50):
+    """Best-matching hits for text across sources (default all), each with a highlighted snippet"""
+    # Queued audit events are written first so they are searchable immediately
+    audit.flush()
+    return _search_text(text, tuple(sources or SOURCES), limit)
+
+
+@cached(('audit_log', 'transactions', 'financial_movements', 'users', 'categories', 'system_settings'), maxsize=32)
+def _search_text(text, sources, limit):
+    terms = _terms(text)
+    if not terms:
+        return []
+    use_fts = fts_available()
+    hits = []
+    for source in sources:
+        # Batch items share their notes: fetch extra rows and keep one hit per batch
+        query, params = (_fts_query if use_fts else _like_query)(source, terms, limit * 3)
+        with session() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        seen = set()
+        for row in rows:
+            key = row['batch_id'] or row['id']
+            if key in seen:
+                continue
+            seen.add(key)
+            snippet = row['snippet'] if use_fts else _highlight(row['snippet'], terms)
+            hits.append({
+                'source': source,
+                'source_label': SOURCES[source]['label'],
+                'id': row['id'],
+                'date': row['date'],
+                'who': row['who'],
+                'kind': row['kind'],
+                'batch_id': row['batch_id'],
+                'snippet': snippet,
+                'rank': row['rank'],
+            })
+    # bm25 is lower-is-better; ties (every hit of the LIKE fallback) go newest first
+    hits.sort(key=lambda hit: hit['date'] or '', reverse=True)
+    hits.sort(key=lambda hit: hit['rank'])
+    return hits[:limit]
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audit  # noqa: E402
+import cache  # noqa: E402
+import database  # noqa: E402
+import passwords  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh bootstrapped database file for one test"""
+    # Cheapest allowed KDF cost: the default users are hashed on every bootstrap
+    monkeypatch.setattr(passwords, 'SCRYPT_N', passwords.MIN_SCRYPT_N)
+    monkeypatch.setattr(database, 'DATABASE_NAME', str(tmp_path / 'bank_sampah.db'))
+    database.close_connection()
+    cache.clear_all()
+    database.initialize_system()
+    yield database
+    audit.flush()
+    database.close_connection()
+    cache.clear_all()
+
+
+@pytest.fixture
+def users(db):
+    """username -> id of the default users"""
+    with db.session() as cursor:
+        cursor.execute('SELECT username, id FROM users')
+        return dict(cursor.fetchall())
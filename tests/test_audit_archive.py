@@ -0,0 +1,63 @@
+"""Audit archival is opt-in, writes its files beside the database and never vacuums on startup"""
+import os
+import sqlite3
+
+import audit
+import database
+import passwords
+import utils
+
+
+def _old_events(db, user_id):
+    with db.session() as cursor:
+        cursor.executemany(
+            'INSERT INTO audit_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)',
+            [(user_id, 'LOGIN', f'lama {month}', f'2020-{month:02d}-15 08:00:00') for month in (1, 2)],
+        )
+    audit.record(user_id, 'LOGIN', 'baru', sync=True)
+
+
+def test_archival_is_off_by_default(db, users, tmp_path):
+    _old_events(db, users['superuser'])
+    assert audit.retention_days() == 0
+    assert audit.archive_expired() == 0
+    assert not os.path.exists(tmp_path / audit.ARCHIVE_DIR)
+    assert len(utils.get_audit_logs(limit=10)) == 3
+
+
+def test_archive_lives_next_to_database(db, users, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path.parent)
+    _old_events(db, users['superuser'])
+    db.set_setting(audit.RETENTION_SETTING, '30')
+
+    assert audit.archive_expired() == 2
+    assert sorted(os.listdir(tmp_path / audit.ARCHIVE_DIR)) == [
+        'audit_log_2020-01.ndjson.gz', 'audit_log_2020-02.ndjson.gz',
+    ]
+    assert not os.path.exists(tmp_path.parent / audit.ARCHIVE_DIR)
+
+    logs = utils.get_audit_logs(limit=10)
+    assert [log['details'] for log in logs] == ['baru', 'lama 2', 'lama 1']
+    with db.session() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM audit_log')
+        assert cursor.fetchone()[0] == 1
+
+
+def test_migration_leaves_full_vacuum_to_maintenance(tmp_path, monkeypatch):
+    path = tmp_path / 'lama.db'
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE lama (id INTEGER PRIMARY KEY)')
+    monkeypatch.setattr(passwords, 'SCRYPT_N', passwords.MIN_SCRYPT_N)
+    monkeypatch.setattr(database, 'DATABASE_NAME', str(path))
+    database.close_connection()
+    executed = []
+    database.get_connection().set_trace_callback(executed.append)
+    try:
+        database.initialize_system()
+        assert not [sql for sql in executed if sql.strip().upper() == 'VACUUM']
+        assert database.needs_vacuum()
+
+        assert database.vacuum()
+        assert not database.needs_vacuum()
+    finally:
+        database.close_connection()
@@ -0,0 +1,16 @@
+"""Bootstrap slow path does not pay the KDF for default users that already exist"""
+import passwords
+
+
+def test_rebootstrap_hashes_only_missing_users(db, users, monkeypatch):
+    hashed = []
+    hash_password = passwords.hash_password
+    monkeypatch.setattr(passwords, 'hash_password', lambda password, n=None: hashed.append(password) or hash_password(password, n))
+
+    db.initialize_system(force=True)
+    assert hashed == []
+
+    with db.session() as cursor:
+        cursor.execute("DELETE FROM users WHERE username = 'warga2'")
+    db.initialize_system(force=True)
+    assert hashed == ['warga123']
@@ -0,0 +1,42 @@
+"""Job artifacts live beside the database and the periodic purge runs in one worker at a time"""
+import os
+import threading
+import time
+
+import audit
+import jobs
+import utils
+
+
+def test_artifacts_live_next_to_database(db, users, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path.parent)
+    # Run the job inline rather than on the daemon workers
+    monkeypatch.setattr(jobs, 'start_workers', lambda count=jobs.WORKER_COUNT: None)
+    utils.create_transaction_batch(users['warga1'], [{'category_id': 1, 'weight_kg': 1.0}], users['inputer1'])
+    job_id = jobs.submit('receipts_zip', {}, created_by=users['superuser'])
+    os.makedirs(jobs.artifact_dir(), exist_ok=True)
+    jobs._run_job(jobs._claim_next_job())
+
+    path = jobs.artifact_path(jobs.get_job(job_id))
+    assert os.path.dirname(path) == str(tmp_path / jobs.ARTIFACT_DIR)
+    assert not os.path.exists(tmp_path.parent / jobs.ARTIFACT_DIR)
+
+
+def test_concurrent_workers_purge_once(db, monkeypatch):
+    calls = []
+
+    def slow_purge():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return 0
+
+    monkeypatch.setattr(jobs, 'purge_expired', slow_purge)
+    monkeypatch.setattr(audit, 'archive_expired', lambda progress=None: 0)
+    monkeypatch.setattr(jobs, '_last_purge', 0.0)
+
+    workers = [threading.Thread(target=jobs._purge_if_due) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(calls) == 1
@@ -0,0 +1,100 @@
+"""Concurrent deposits/withdrawals: the final balance always equals the ledger sum"""
+import random
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import ledger
+
+THREADS = 8
+POSTS_PER_THREAD = 150
+
+
+def _ledger_sum(cursor, warga_id):
+    cursor.execute('SELECT COALESCE(SUM(net_amount), 0) FROM transactions WHERE warga_id = ?', (warga_id,))
+    earned = cursor.fetchone()[0]
+    cursor.execute('''
+        SELECT COALESCE(SUM(CASE type WHEN 'deposit' THEN amount ELSE -amount END), 0)
+        FROM financial_movements WHERE warga_id = ?
+    ''', (warga_id,))
+    return earned + cursor.fetchone()[0]
+
+
+def test_concurrent_posts_match_ledger(db, users):
+    warga_ids = [users['warga1'], users['warga2']]
+    admin_id = users['panitia1']
+    outcomes = {'posted': 0, 'rejected': 0}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(POSTS_PER_THREAD):
+                post = ledger.deposit if rng.random() < 0.5 else ledger.withdraw
+                ok, _ = post(rng.choice(warga_ids), rng.choice([1000, 2000, 5000]), admin_id, 'stress')
+                with lock:
+                    outcomes['posted' if ok else 'rejected'] += 1
+        except Exception as error:  # surfaced below; a thread cannot fail the test by itself
+            errors.append(error)
+        finally:
+            db.close_connection()
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert outcomes['posted'] + outcomes['rejected'] == THREADS * POSTS_PER_THREAD
+    # Withdrawals racing deposits on an empty balance must sometimes be refused
+    assert outcomes['posted'] and outcomes['rejected']
+
+    with db.session() as cursor:
+        for warga_id in warga_ids:
+            cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
+            balance = cursor.fetchone()[0]
+            assert balance == _ledger_sum(cursor, warga_id)
+            assert balance >= 0
+
+            # Posts are serialized, so each row continues from the previous one's balance_after
+            cursor.execute('''
+                SELECT type, amount, balance_before, balance_after
+                FROM financial_movements WHERE warga_id = ? ORDER BY id
+            ''', (warga_id,))
+            previous = 0
+            for movement_type, amount, before, after in cursor.fetchall():
+                assert before == previous
+                assert after == (before + amount if movement_type == 'deposit' else before - amount)
+                assert after >= 0
+                previous = after
+            assert previous == balance
+
+
+def test_withdrawal_cannot_overdraw(db, users):
+    warga_id = users['warga1']
+    assert ledger.deposit(warga_id, 5000, users['panitia1']) == (True, 5000)
+    assert ledger.withdraw(warga_id, 5001, users['panitia1']) == (False, "Saldo tidak mencukupi")
+    assert ledger.withdraw(warga_id, 5000, users['panitia1']) == (True, 0)
+
+
+def test_busy_inside_outer_session_is_not_retried(db, monkeypatch):
+    monkeypatch.setattr(ledger, 'time', SimpleNamespace(sleep=lambda seconds: pytest.fail('retried inside a session')))
+    calls = []
+
+    def busy():
+        calls.append(1)
+        raise sqlite3.OperationalError('database is locked')
+
+    with pytest.raises(sqlite3.OperationalError):
+        with db.session():
+            ledger._retry_on_busy(busy)
+    assert len(calls) == 1
+
+    monkeypatch.setattr(ledger, 'time', SimpleNamespace(sleep=lambda seconds: None))
+    with pytest.raises(sqlite3.OperationalError):
+        ledger._retry_on_busy(busy)
+    assert len(calls) == 1 + ledger.BUSY_RETRIES
@@ -0,0 +1,89 @@
+"""Editing/deleting a financial movement keeps balances right with transactions between movements"""
+import pytest
+
+import ledger
+import utils
+
+
+@pytest.fixture
+def history(db, users):
+    """tx +27000, withdraw 20000, tx +270000, withdraw 200000 for warga1; returns (warga_id, [movement ids])"""
+    warga_id, admin_id = users['warga1'], users['panitia1']
+    with db.session() as cursor:
+        cursor.execute("SELECT id FROM categories WHERE price_per_kg = 3000")
+        category_id = cursor.fetchone()[0]
+
+    utils.create_transaction(warga_id, category_id, 10, admin_id)  # net 27000
+    ledger.withdraw(warga_id, 20000, admin_id)
+    utils.create_transaction(warga_id, category_id, 100, admin_id)  # net 270000
+    ledger.withdraw(warga_id, 200000, admin_id)
+    return warga_id, [row['id'] for row in _movements(db, warga_id)]
+
+
+def _movements(db, warga_id):
+    with db.session() as cursor:
+        cursor.execute('''
+            SELECT id, type, amount, balance_before, balance_after
+            FROM financial_movements WHERE warga_id = ? ORDER BY movement_date, id
+        ''', (warga_id,))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def _balances(db, warga_id):
+    """(users.balance, [(balance_before, balance_after)] per movement)"""
+    with db.session() as cursor:
+        cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
+        balance = cursor.fetchone()[0]
+    return balance, [(row['balance_before'], row['balance_after']) for row in _movements(db, warga_id)]
+
+
+def test_history_fixture(db, history):
+    warga_id, _ = history
+    assert _balances(db, warga_id) == (77000, [(27000, 7000), (277000, 77000)])
+
+
+def test_edit_keeps_transactions_between_movements(db, users, history):
+    warga_id, (first, second) = history
+    ok, message = utils.update_financial_movement(first, 'withdrawal', 21000, '', users['panitia1'])
+    assert ok, message
+    assert _balances(db, warga_id) == (76000, [(27000, 6000), (276000, 76000)])
+
+
+def test_delete_keeps_transactions_between_movements(db, history):
+    warga_id, (first, second) = history
+    ok, message = utils.delete_financial_movement(first)
+    assert ok, message
+    assert _balances(db, warga_id) == (97000, [(297000, 97000)])
+
+
+def test_edit_to_deposit_shifts_later_rows(db, users, history):
+    warga_id, (first, second) = history
+    ok, message = utils.update_financial_movement(first, 'deposit', 5000, '', users['panitia1'])
+    assert ok, message
+    assert _balances(db, warga_id) == (102000, [(27000, 32000), (302000, 102000)])
+
+
+def test_edit_refused_when_later_withdrawal_overdraws(db, users, history):
+    warga_id, (first, second) = history
+    ledger.deposit(warga_id, 50000, users['panitia1'])
+    ledger.withdraw(warga_id, 120000, users['panitia1'])
+    before = _balances(db, warga_id)
+    deposit_id = _movements(db, warga_id)[2]['id']
+
+    ok, message = utils.update_financial_movement(deposit_id, 'deposit', 10000, '', users['panitia1'])
+    assert not ok
+    assert 'Saldo tidak mencukupi' in message
+    assert _balances(db, warga_id) == before
+
+    ok, message = utils.delete_financial_movement(deposit_id)
+    assert not ok
+    assert _balances(db, warga_id) == before
+
+
+def test_edit_refused_when_withdrawal_exceeds_its_own_balance(db, users, history):
+    warga_id, (first, second) = history
+    before = _balances(db, warga_id)
+    ok, message = utils.update_financial_movement(first, 'withdrawal', 27001, '', users['panitia1'])
+    assert not ok
+    assert 'Saldo tidak mencukupi' in message
+    assert _balances(db, warga_id) == before
@@ -0,0 +1,89 @@
+"""EXPLAIN QUERY PLAN regression: the hot filters must be served by their indexes, not a full scan"""
+import re
+from datetime import date
+
+import pytest
+
+import auth
+import cache
+import utils
+
+HOT_TABLES = ('transactions', 'financial_movements', 'committee_earnings', 'audit_log')
+START, END = date(2025, 1, 1), date(2025, 1, 31)
+
+
+def _seed(db, users):
+    warga_id = users['warga1']
+    for day in range(1, 29):
+        utils.create_transaction(warga_id, 1, 2.0, users['inputer1'], transaction_date=f'2025-01-{day:02d} 10:00:00')
+    utils.process_deposit(warga_id, 1000, users['panitia1'])
+    auth.log_audit(users['superuser'], 'LOGIN', 'seed', sync=True)
+
+
+# name -> (helper call taking the users map, index the hot table must be searched with)
+HOT_QUERIES = {
+    'transactions by warga and date': (
+        lambda u: utils.get_transactions(warga_id=u['warga1'], start_date=START, end_date=END),
+        'idx_transactions_warga_date'),
+    'transactions by date': (
+        lambda u: utils.get_transactions(start_date=START, end_date=END),
+        'idx_transactions_date'),
+    'transactions by category and date': (
+        lambda u: utils.get_transactions(category_id=1, start_date=START, end_date=END),
+        'idx_transactions_category_date'),
+    'warga performance': (
+        lambda u: utils.get_warga_performance(u['warga1'], START, END),
+        'idx_transactions_warga_date'),
+    'monthly statistics': (
+        lambda u: utils.get_monthly_statistics(2025, 1),
+        'idx_transactions_date'),
+    'yearly statistics': (
+        lambda u: utils.get_yearly_statistics(2025),
+        'idx_transactions_date'),
+    'receipt batches by warga and date': (
+        lambda u: utils.count_transaction_batches(u['warga1'], START, END),
+        'idx_transactions_warga_date'),
+    'movements by warga': (
+        lambda u: utils.get_financial_movements(warga_id=u['warga1'], limit=50),
+        'idx_movements_warga_date'),
+    'committee earnings by date': (
+        lambda u: utils.get_committee_total_earnings(START, END),
+        'idx_committee_earnings_date'),
+    'audit log by user and date': (
+        lambda u: utils.get_audit_logs(user_id=u['superuser'], start_date=START, end_date=END),
+        'idx_audit_log_user_timestamp'),
+    'audit log by date': (
+        lambda u: utils.get_audit_logs(start_date=START, end_date=END),
+        'idx_audit_log_timestamp'),
+}
+
+
+def _capture(db, call, users):
+    """SELECT statements (with bound values inlined) that call issues against a hot table"""
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        cache.clear_all()
+        call(users)
+    finally:
+        conn.set_trace_callback(None)
+    return [
+        sql for sql in statements
+        if sql.lstrip().upper().startswith('SELECT') and any(table in sql for table in HOT_TABLES)
+    ]
+
+
+@pytest.mark.parametrize('name', list(HOT_QUERIES))
+def test_hot_query_uses_index(db, users, name):
+    _seed(db, users)
+    call, index = HOT_QUERIES[name]
+    statements = _capture(db, call, users)
+    assert statements, f'{name}: no query captured'
+    for sql in statements:
+        plan = [row[3] for row in db.get_connection().execute(f'EXPLAIN QUERY PLAN {sql}')]
+        # A SCAN of a hot table reads all of it, even when it walks an index for the ordering
+        full_scans = [step for step in plan if re.match(rf'SCAN ({"|".join(HOT_TABLES)}|t|fm|al)\b', step)]
+        assert not full_scans, f'{name}: full table scan {full_scans} in {plan}'
+        assert any(re.match(rf'SEARCH \w+ USING (COVERING )?INDEX {index} \(', step) for step in plan), \
+            f'{name}: expected SEARCH ... USING INDEX {index}, got {plan}'
@@ -0,0 +1,32 @@
+"""Login rate limiting: client key behind proxies and a bounded failure table"""
+import ratelimit
+
+
+def test_client_key_ignores_forwarded_for_by_default():
+    assert ratelimit.client_key('10.0.0.1', ['203.0.113.5']) == '10.0.0.1'
+
+
+def test_client_key_trusts_only_proxy_appended_hops(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'TRUSTED_PROXY_HOPS', 1)
+    # The left entry is client-supplied; the proxy appended the real peer address
+    assert ratelimit.client_key('10.0.0.1', ['1.2.3.4, 203.0.113.5']) == '203.0.113.5'
+    assert ratelimit.client_key('10.0.0.1', []) == '10.0.0.1'
+
+    monkeypatch.setattr(ratelimit, 'TRUSTED_PROXY_HOPS', 2)
+    assert ratelimit.client_key('10.0.0.1', ['1.2.3.4, 203.0.113.5', '10.0.0.2']) == '203.0.113.5'
+    assert ratelimit.client_key('10.0.0.1', ['10.0.0.2']) == '10.0.0.1'
+
+
+def test_username_spray_keeps_failures_bounded(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'PERSIST_LOCKOUTS', False)
+    monkeypatch.setattr(ratelimit, 'MAX_TRACKED_FAILURES', 100)
+    monkeypatch.setattr(ratelimit, '_failures', {})
+    for _ in range(ratelimit.FAILURE_THRESHOLD):
+        ratelimit.record_failure('korban')
+
+    for index in range(1000):
+        ratelimit.record_failure(f'spray{index}')
+
+    assert len(ratelimit._failures) <= 100
+    # The active lockout survives the spray
+    assert ratelimit._failures['korban'][1] > 0
@@ -0,0 +1,45 @@
+"""Bulk receipt export streams batches without going through the shared read cache"""
+import pytest
+
+import cache
+import receipts
+import utils
+
+
+def _seed(users, count):
+    for index in range(count):
+        items = [{'category_id': 1, 'weight_kg': 1.0}, {'category_id': 2, 'weight_kg': 2.0}][:1 + index % 2]
+        utils.create_transaction_batch(
+            users['warga1'], items, users['inputer1'], batch_id=f'batch-{index}',
+            transaction_date=f'2025-01-{1 + index % 28:02d} 10:{index // 28:02d}:00',
+        )
+
+
+def test_batches_match_get_transactions(db, users):
+    _seed(users, 60)
+    expected = receipts.group_batches(utils.get_transactions(warga_id=users['warga1']))
+    streamed = list(utils.iter_transaction_batches(chunk_size=7, warga_id=users['warga1']))
+    assert [batch['batch_id'] for batch in streamed] == [batch['batch_id'] for batch in expected]
+    assert [[item['id'] for item in batch['items']] for batch in streamed] == \
+        [[item['id'] for item in batch['items']] for batch in expected]
+    assert len(streamed) == utils.count_transaction_batches(users['warga1'])
+
+
+def test_export_leaves_read_cache_alone(db, users, tmp_path):
+    _seed(users, 60)
+    cache.clear_all()
+    count = receipts.write_receipts(utils.iter_transaction_batches(chunk_size=5), tmp_path / 'nota.zip')
+    assert count == 60
+    assert cache.stats()['utils.get_transactions']['size'] == 0
+
+
+def test_combined_pdf_is_capped(db, users, tmp_path, monkeypatch):
+    _seed(users, 12)
+    monkeypatch.setattr(receipts, 'PDF_BATCH_LIMIT', 10)
+    assert receipts.write_receipts(utils.iter_transaction_batches(start_date='2025-01-01', end_date='2025-01-10'),
+                                   tmp_path / 'nota.pdf', 'pdf') == 10
+    drawn = []
+    monkeypatch.setattr(receipts, '_draw_receipt', lambda pdf, batch: drawn.append(batch))
+    with pytest.raises(ValueError, match='ZIP'):
+        receipts.write_receipts(utils.iter_transaction_batches(), tmp_path / 'semua.pdf', 'pdf')
+    assert len(drawn) == 10
@@ -0,0 +1,37 @@
+"""Static receipt blocks are replayed from templates on every page"""
+import re
+import zlib
+
+import receipts
+
+ITEM = {
+    'id': 1, 'category_name': 'Plastik Botol', 'weight_kg': 2.5, 'price_per_kg': 3000.0,
+    'total_amount': 7500.0, 'committee_fee': 750.0, 'net_amount': 6750.0,
+}
+BATCH = {
+    'batch_id': 'batch-1', 'warga_name': 'Warga Contoh', 'processed_by_name': 'Panitia',
+    'notes': 'catatan', 'transaction_date': '2026-01-01 10:00:00', 'items': [ITEM] * 3,
+}
+
+
+def _pages(document):
+    streams = [zlib.decompress(stream) for stream in re.findall(rb'stream\n(.*?)endstream', document, re.S)]
+    return [stream.decode('latin1') for stream in streams if b'Tj' in stream]
+
+
+def test_every_page_gets_header_columns_and_footer():
+    pages = _pages(receipts.render_receipts([BATCH, dict(BATCH, items=[ITEM] * 12)]))
+    assert len(pages) == 2
+    for page in pages:
+        for text in (receipts.TITLE, receipts.SUBTITLE, 'Kategori', 'Go Green', receipts.FOOTER_NOTE):
+            assert page.count(f'({text})') == 1
+        # Replayed blocks select their own fonts by the names registered in every document
+        assert re.search(r'/F2 14\.00 Tf.*\(Nota Transaksi', page, re.S)
+        assert page.count('q 1 0 0 1 0 ') == 3
+
+
+def test_footer_moves_with_the_item_rows():
+    short, long = _pages(receipts.render_receipts([BATCH, dict(BATCH, items=[ITEM] * 12)]))
+    shift = re.findall(r'q 1 0 0 1 0 (-?[\d.]+) cm', short)[-1], re.findall(r'q 1 0 0 1 0 (-?[\d.]+) cm', long)[-1]
+    # Nine more 8 mm rows push the footer down by 9 * 8 mm in PDF points
+    assert round(float(shift[0]) - float(shift[1]), 1) == round(9 * 8 * 72 / 25.4, 1)
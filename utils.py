@@ -1,306 +1,340 @@
 import streamlit as st
 import pandas as pd
-from database import get_connection
-from datetime import datetime, timedelta
+import base64
+import json
+from database import session, read_cursor, format_timestamp, record_daily_stats, mark_dirty
+import audit
+import ledger
+import receipts
+from cache import cached
+from datetime import date, datetime, timedelta
+from itertools import groupby
+
+def _as_date(value):
+    """Coerce a date, datetime or 'YYYY-MM-DD...' string to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def date_range_filter(column, start_date=None, end_date=None):
+    """Build an index-friendly ' AND ...' predicate covering start_date..end_date (inclusive days)"""
+    # Half-open text bounds on the raw column instead of DATE(column), so the date indexes are usable.
+    clause = ''
+    params = []
+    if start_date:
+        clause += f' AND {column} >= ?'
+        params.append(_as_date(start_date).isoformat())
+    if end_date:
+        clause += f' AND {column} < ?'
+        params.append((_as_date(end_date) + timedelta(days=1)).isoformat())
+    return clause, params
 
+@cached(('categories',))
 def get_all_categories():
     """Get all waste categories"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM categories ORDER BY name')
-    categories = cursor.fetchall()
-    conn.close()
-    return categories
+    with session() as cursor:
+        cursor.execute('SELECT * FROM categories ORDER BY name')
+        return cursor.fetchall()
 
+@cached(('categories',))
 def get_category_by_id(category_id):
     """Get category by ID"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM categories WHERE id = ?', (category_id,))
-    category = cursor.fetchone()
-    conn.close()
-    return category
+    with session() as cursor:
+        cursor.execute('SELECT * FROM categories WHERE id = ?', (category_id,))
+        return cursor.fetchone()
 
 def create_category(name, price_per_kg):
     """Create a new category"""
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO categories (name, price_per_kg)
-            VALUES (?, ?)
-        ''', (name, price_per_kg))
-        conn.commit()
-        conn.close()
+        with session() as cursor:
+            cursor.execute('''
+                INSERT INTO categories (name, price_per_kg)
+                VALUES (?, ?)
+            ''', (name, price_per_kg))
+            mark_dirty('categories')
         return True, "Kategori berhasil ditambahkan"
     except Exception as e:
-        conn.close()
         return False, str(e)
 
 def update_category_price(category_id, new_price):
     """Update category price"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE categories 
-        SET price_per_kg = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (new_price, category_id))
-    conn.commit()
-    conn.close()
+    with session() as cursor:
+        cursor.execute('''
+            UPDATE categories 
+            SET price_per_kg = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (new_price, category_id))
+        mark_dirty('categories')
 
 def delete_category(category_id):
     """Delete a category"""
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
-        conn.commit()
-        conn.close()
+        with session() as cursor:
+            cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+            mark_dirty('categories')
         return True, "Kategori berhasil dihapus"
     except Exception as e:
-        conn.close()
         return False, str(e)
 
 def create_transaction(warga_id, category_id, weight_kg, processed_by, notes="", batch_id="", transaction_date=None):
     """Create a new transaction (supports batch_id for multi-item grouping and custom date)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Get category price
-    cursor.execute('SELECT price_per_kg FROM categories WHERE id = ?', (category_id,))
-    category = cursor.fetchone()
-    price_per_kg = category[0]
-    
-    # Calculate amounts
-    total_amount = weight_kg * price_per_kg
-    committee_fee = total_amount * 0.10  # 10% for committee
-    net_amount = total_amount - committee_fee
-    
-    # Get current balance
-    cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
-    current_balance = cursor.fetchone()[0]
-    
-    # Insert transaction
-    if transaction_date is None:
-        transaction_date = datetime.now()
-
-    cursor.execute('''
-                INSERT INTO transactions 
-                (warga_id, category_id, weight_kg, price_per_kg, total_amount, 
-                 committee_fee, net_amount, processed_by, batch_id, notes, transaction_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (warga_id, category_id, weight_kg, price_per_kg, total_amount,
-                    committee_fee, net_amount, processed_by, batch_id, notes, transaction_date))
-    
-    transaction_id = cursor.lastrowid
-    
-    # Update warga balance
-    new_balance = current_balance + net_amount
-    cursor.execute('UPDATE users SET balance = ? WHERE id = ?', (new_balance, warga_id))
-    
-    # Record committee earnings
-    cursor.execute('''
-        INSERT INTO committee_earnings (transaction_id, amount)
-        VALUES (?, ?)
-    ''', (transaction_id, committee_fee))
-    
-    conn.commit()
-    conn.close()
-    
-    return True, transaction_id, {
-        'total_amount': total_amount,
-        'committee_fee': committee_fee,
+    success, result = create_transaction_batch(
+        warga_id, [{'category_id': category_id, 'weight_kg': weight_kg}],
+        processed_by, notes, batch_id, transaction_date,
+    )
+    if not success:
+        return False, None, result
+
+    item = result['items'][0]
+    return True, item['id'], {
+        'total_amount': item['total_amount'],
+        'committee_fee': item['committee_fee'],
+        'net_amount': item['net_amount'],
+        'new_balance': result['new_balance']
+    }
+
+def create_transaction_batch(warga_id, items, processed_by, notes="", batch_id="", transaction_date=None):
+    """Record all items of one sale atomically: one price lookup, bulk inserts, one commit.
+
+    items is a list of dicts with 'category_id' and 'weight_kg'. Returns (True, summary) where
+    summary holds the priced 'items' (with their new ids), the batch totals and 'new_balance',
+    or (False, message).
+    """
+    if not items:
+        return False, "Tidak ada item transaksi"
+
+    transaction_date = format_timestamp(transaction_date)
+    category_ids = sorted({item['category_id'] for item in items})
+    placeholders = ','.join('?' * len(category_ids))
+
+    with session(immediate=True) as cursor:
+        cursor.execute(
+            f'SELECT id, name, price_per_kg FROM categories WHERE id IN ({placeholders})',
+            category_ids,
+        )
+        categories = {row['id']: row for row in cursor.fetchall()}
+        if len(categories) != len(category_ids):
+            return False, "Kategori tidak ditemukan"
+
+        priced = []
+        for item in items:
+            category = categories[item['category_id']]
+            weight_kg = item['weight_kg']
+            total_amount = weight_kg * category['price_per_kg']
+            committee_fee = total_amount * 0.10  # 10% for committee
+            priced.append({
+                'category_id': category['id'],
+                'category_name': category['name'],
+                'weight_kg': weight_kg,
+                'price_per_kg': category['price_per_kg'],
+                'total_amount': total_amount,
+                'committee_fee': committee_fee,
+                'net_amount': total_amount - committee_fee,
+            })
+
+        cursor.executemany('''
+            INSERT INTO transactions
+            (warga_id, category_id, weight_kg, price_per_kg, total_amount,
+             committee_fee, net_amount, processed_by, batch_id, notes, transaction_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (warga_id, row['category_id'], row['weight_kg'], row['price_per_kg'], row['total_amount'],
+             row['committee_fee'], row['net_amount'], processed_by, batch_id, notes, transaction_date)
+            for row in priced
+        ])
+
+        # AUTOINCREMENT ids are consecutive here because BEGIN IMMEDIATE holds the write lock
+        cursor.execute('SELECT last_insert_rowid()')
+        first_id = cursor.fetchone()[0] - len(priced) + 1
+        for offset, row in enumerate(priced):
+            row['id'] = first_id + offset
+
+        cursor.executemany('''
+            INSERT INTO committee_earnings (transaction_id, amount)
+            VALUES (?, ?)
+        ''', [(row['id'], row['committee_fee']) for row in priced])
+        mark_dirty('transactions', 'committee_earnings')
+        record_daily_stats(cursor, [
+            (transaction_date, row['category_id'], warga_id, row['weight_kg'],
+             row['total_amount'], row['committee_fee'], row['net_amount'])
+            for row in priced
+        ])
+
+        net_amount = sum(row['net_amount'] for row in priced)
+        cursor.execute('UPDATE users SET balance = balance + ? WHERE id = ?', (net_amount, warga_id))
+        if cursor.rowcount != 1:
+            raise ValueError(f"User ID {warga_id} tidak ditemukan")
+        mark_dirty('users')
+        cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
+        new_balance = cursor.fetchone()[0]
+
+    return True, {
+        'items': priced,
+        'total_amount': sum(row['total_amount'] for row in priced),
+        'committee_fee': sum(row['committee_fee'] for row in priced),
         'net_amount': net_amount,
-        'new_balance': new_balance
+        'new_balance': new_balance,
     }
 
+@cached(('users',))
 def get_user_balance(user_id):
     """Get user balance"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT balance FROM users WHERE id = ?', (user_id,))
-    balance = cursor.fetchone()[0]
-    conn.close()
-    return balance
+    with session() as cursor:
+        cursor.execute('SELECT balance FROM users WHERE id = ?', (user_id,))
+        return cursor.fetchone()[0]
 
 def process_withdrawal(warga_id, amount, processed_by, notes=""):
     """Process a withdrawal"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Get current balance
-    cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
-    current_balance = cursor.fetchone()[0]
-    
-    if current_balance < amount:
-        conn.close()
-        return False, "Saldo tidak mencukupi"
-    
-    new_balance = current_balance - amount
-    
-    # Insert financial movement
-    cursor.execute('''
-        INSERT INTO financial_movements 
-        (warga_id, type, amount, balance_before, balance_after, processed_by, notes)
-        VALUES (?, 'withdrawal', ?, ?, ?, ?, ?)
-    ''', (warga_id, amount, current_balance, new_balance, processed_by, notes))
-    
-    # Update balance
-    cursor.execute('UPDATE users SET balance = ? WHERE id = ?', (new_balance, warga_id))
-    
-    conn.commit()
-    conn.close()
-    
-    return True, new_balance
+    return ledger.withdraw(warga_id, amount, processed_by, notes)
 
 def process_deposit(warga_id, amount, processed_by, notes=""):
     """Process a deposit"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Get current balance
-    cursor.execute('SELECT balance FROM users WHERE id = ?', (warga_id,))
-    current_balance = cursor.fetchone()[0]
-    
-    new_balance = current_balance + amount
-    
-    # Insert financial movement
-    cursor.execute('''
-        INSERT INTO financial_movements 
-        (warga_id, type, amount, balance_before, balance_after, processed_by, notes)
-        VALUES (?, 'deposit', ?, ?, ?, ?, ?)
-    ''', (warga_id, amount, current_balance, new_balance, processed_by, notes))
-    
-    # Update balance
-    cursor.execute('UPDATE users SET balance = ? WHERE id = ?', (new_balance, warga_id))
-    
-    conn.commit()
-    conn.close()
-    
-    return True, new_balance
+    return ledger.deposit(warga_id, amount, processed_by, notes)
 
 
-def _rebuild_warga_balance_from_movements(cursor, warga_id):
-    """Rebuild balance_before/after for all movements and sync final user balance."""
-    cursor.execute('SELECT SUM(net_amount) FROM transactions WHERE warga_id = ?', (warga_id,))
-    running_balance = cursor.fetchone()[0] or 0
+def _movement_effect(movement_type, amount):
+    """Signed balance change of a movement"""
+    return amount if movement_type == 'deposit' else -amount
 
-    cursor.execute(
-        '''
-        SELECT id, type, amount
-        FROM financial_movements
-        WHERE warga_id = ?
-        ORDER BY movement_date ASC, id ASC
-        ''',
-        (warga_id,),
-    )
-    movements = cursor.fetchall()
-
-    for movement in movements:
-        movement_id = movement['id']
-        movement_type = movement['type']
-        amount = float(movement['amount'] or 0)
-
-        if amount < 0:
-            raise ValueError(f"Jumlah tidak valid pada movement ID {movement_id}")
-
-        balance_before = running_balance
-        if movement_type == 'deposit':
-            running_balance = balance_before + amount
-        elif movement_type == 'withdrawal':
-            if amount > balance_before:
-                raise ValueError(
-                    f"Saldo tidak mencukupi saat replay movement ID {movement_id}. "
-                    f"Withdrawal Rp {amount:,.0f} > saldo Rp {balance_before:,.0f}"
-                )
-            running_balance = balance_before - amount
-        else:
-            raise ValueError(f"Tipe movement tidak valid pada movement ID {movement_id}: {movement_type}")
 
+def _shift_warga_balance_after(cursor, warga_id, movement_date, movement_id, balance_delta):
+    """Shift balance_before/after of every movement after (movement_date, movement_id) and users.balance.
+
+    The stored balances already include the transactions posted between movements, so a
+    constant shift keeps them; the edit is refused if a later withdrawal would overdraw.
+    Rows before the position are untouched, so an edit costs O(later movements).
+    """
+    later = 'warga_id = ? AND movement_date >= ? AND (movement_date > ? OR id > ?)'
+    params = (warga_id, movement_date, movement_date, movement_id)
+
+    if balance_delta < 0:
         cursor.execute(
-            '''
-            UPDATE financial_movements
-            SET balance_before = ?, balance_after = ?
-            WHERE id = ?
+            f'''
+            SELECT id, amount, balance_before + ? AS balance_before
+            FROM financial_movements
+            WHERE {later} AND type = 'withdrawal' AND balance_before + ? < amount
+            ORDER BY movement_date ASC, id ASC
+            LIMIT 1
             ''',
-            (balance_before, running_balance, movement_id),
+            (balance_delta,) + params + (balance_delta,),
         )
+        overdrawn = cursor.fetchone()
+        if overdrawn:
+            raise ValueError(
+                f"Saldo tidak mencukupi untuk movement ID {overdrawn['id']}. "
+                f"Withdrawal Rp {overdrawn['amount']:,.0f} > saldo Rp {overdrawn['balance_before']:,.0f}"
+            )
 
-    cursor.execute('UPDATE users SET balance = ? WHERE id = ?', (running_balance, warga_id))
-    return running_balance
+    cursor.execute(
+        f'''
+        UPDATE financial_movements
+        SET balance_before = balance_before + ?, balance_after = balance_after + ?
+        WHERE {later}
+        ''',
+        (balance_delta, balance_delta) + params,
+    )
+    cursor.execute('UPDATE users SET balance = balance + ? WHERE id = ?', (balance_delta, warga_id))
+    mark_dirty('financial_movements', 'users')
 
 
 def update_financial_movement(movement_id, movement_type, amount, notes, processed_by):
     """Edit existing financial movement and keep all balances consistent."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
     try:
-        cursor.execute('SELECT id, warga_id FROM financial_movements WHERE id = ?', (movement_id,))
-        movement = cursor.fetchone()
-        if not movement:
-            conn.close()
-            return False, "Data keuangan tidak ditemukan"
-
-        if movement_type not in ('deposit', 'withdrawal'):
-            conn.close()
-            return False, "Tipe transaksi keuangan tidak valid"
-
-        if amount is None or float(amount) <= 0:
-            conn.close()
-            return False, "Jumlah harus lebih dari 0"
-
-        cursor.execute(
-            '''
-            UPDATE financial_movements
-            SET type = ?, amount = ?, notes = ?, processed_by = ?
-            WHERE id = ?
-            ''',
-            (movement_type, float(amount), notes, processed_by, movement_id),
-        )
+        with session(immediate=True) as cursor:
+            cursor.execute(
+                'SELECT id, warga_id, type, amount, balance_before, movement_date FROM financial_movements WHERE id = ?',
+                (movement_id,),
+            )
+            movement = cursor.fetchone()
+            if not movement:
+                return False, "Data keuangan tidak ditemukan"
+
+            if movement_type not in ('deposit', 'withdrawal'):
+                return False, "Tipe transaksi keuangan tidak valid"
+
+            if amount is None or float(amount) <= 0:
+                return False, "Jumlah harus lebih dari 0"
+
+            balance_before = float(movement['balance_before'] or 0)
+            if movement_type == 'withdrawal' and float(amount) > balance_before:
+                return False, (
+                    f"Saldo tidak mencukupi. Withdrawal Rp {float(amount):,.0f} > saldo Rp {balance_before:,.0f}"
+                )
 
-        _rebuild_warga_balance_from_movements(cursor, movement['warga_id'])
-        conn.commit()
-        conn.close()
+            cursor.execute(
+                '''
+                UPDATE financial_movements
+                SET type = ?, amount = ?, balance_after = ?, notes = ?, processed_by = ?
+                WHERE id = ?
+                ''',
+                (movement_type, float(amount), balance_before + _movement_effect(movement_type, float(amount)),
+                 notes, processed_by, movement_id),
+            )
+
+            balance_delta = (
+                _movement_effect(movement_type, float(amount))
+                - _movement_effect(movement['type'], float(movement['amount'] or 0))
+            )
+            _shift_warga_balance_after(
+                cursor, movement['warga_id'], movement['movement_date'], movement_id, balance_delta,
+            )
         return True, "Data keuangan berhasil diupdate"
 
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return False, str(e)
 
 
 def delete_financial_movement(movement_id):
     """Delete existing financial movement and keep all balances consistent."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
     try:
-        cursor.execute('SELECT id, warga_id FROM financial_movements WHERE id = ?', (movement_id,))
-        movement = cursor.fetchone()
-        if not movement:
-            conn.close()
-            return False, "Data keuangan tidak ditemukan"
-
-        warga_id = movement['warga_id']
-        cursor.execute('DELETE FROM financial_movements WHERE id = ?', (movement_id,))
-
-        _rebuild_warga_balance_from_movements(cursor, warga_id)
-        conn.commit()
-        conn.close()
+        with session(immediate=True) as cursor:
+            cursor.execute(
+                'SELECT id, warga_id, type, amount, balance_before, movement_date FROM financial_movements WHERE id = ?',
+                (movement_id,),
+            )
+            movement = cursor.fetchone()
+            if not movement:
+                return False, "Data keuangan tidak ditemukan"
+
+            cursor.execute('DELETE FROM financial_movements WHERE id = ?', (movement_id,))
+
+            # Later rows lose exactly the deleted movement's effect
+            _shift_warga_balance_after(
+                cursor, movement['warga_id'], movement['movement_date'], movement_id,
+                -_movement_effect(movement['type'], float(movement['amount'] or 0)),
+            )
         return True, "Data keuangan berhasil dihapus"
 
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return False, str(e)
 
-def get_transactions(warga_id=None, limit=None, start_date=None, end_date=None):
-    """Get transactions with optional filters"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+def encode_page_token(sort_value, row_id):
+    """Opaque cursor for the row a page ended on (keyset on sort column + id)"""
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_page_token(page_token):
+    """Inverse of encode_page_token; returns (sort_value, row_id)"""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(page_token.encode()))
+        return str(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Token halaman tidak valid")
+
+def _keyset_filter(sort_column, id_column, page_token):
+    """' AND ...' predicate selecting rows after page_token in (sort_column DESC, id DESC) order"""
+    if not page_token:
+        return '', []
+    sort_value, row_id = decode_page_token(page_token)
+    return (
+        f' AND {sort_column} <= ? AND ({sort_column} < ? OR {id_column} < ?)',
+        [sort_value, sort_value, row_id],
+    )
+
+def _transactions_query(warga_id=None, limit=None, start_date=None, end_date=None, page_token=None, category_id=None):
+    """SQL and params behind get_transactions"""
     query = '''
         SELECT t.*, u.full_name as warga_name, c.name as category_name,
                p.full_name as processed_by_name
@@ -315,30 +349,106 @@ def get_transactions(warga_id=None, limit=None, start_date=None, end_date=None):
     if warga_id:
         query += ' AND t.warga_id = ?'
         params.append(warga_id)
+
+    if category_id:
+        query += ' AND t.category_id = ?'
+        params.append(category_id)
     
-    if start_date:
-        query += ' AND DATE(t.transaction_date) >= ?'
-        params.append(start_date)
-    
-    if end_date:
-        query += ' AND DATE(t.transaction_date) <= ?'
-        params.append(end_date)
+    date_clause, date_params = date_range_filter('t.transaction_date', start_date, end_date)
+    query += date_clause
+    params.extend(date_params)
+
+    keyset_clause, keyset_params = _keyset_filter('t.transaction_date', 't.id', page_token)
+    query += keyset_clause
+    params.extend(keyset_params)
     
-    query += ' ORDER BY t.transaction_date DESC'
+    query += ' ORDER BY t.transaction_date DESC, t.id DESC'
     
     if limit:
-        query += f' LIMIT {limit}'
-    
-    cursor.execute(query, params)
-    transactions = cursor.fetchall()
-    conn.close()
-    return transactions
-
-def get_financial_movements(warga_id=None, limit=None):
-    """Get financial movements"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+        query += ' LIMIT ?'
+        params.append(int(limit))
+    return query, params
+
+@cached(('transactions', 'users', 'categories'))
+def get_transactions(warga_id=None, limit=None, start_date=None, end_date=None, page_token=None, category_id=None):
+    """Get transactions with optional filters, newest first; page_token continues after a previous page"""
+    query, params = _transactions_query(warga_id, limit, start_date, end_date, page_token, category_id)
+    with session() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+def _batch_key(transaction):
+    return transaction['batch_id'] or f"single-{transaction['id']}"
+
+def get_transactions_page(page_size=50, page_token=None, **filters):
+    """One page of get_transactions plus the token for the next page (None on the last page).
+
+    The page is extended past page_size until the last batch is complete, so multi-item
+    batches are never split across pages.
+    """
+    rows = list(get_transactions(limit=page_size + 1, page_token=page_token, **filters))
+    if len(rows) <= page_size:
+        return rows, None
+
+    page = rows[:page_size]
+    lookahead = rows[page_size:]
+    last_batch = _batch_key(page[-1])
+    while lookahead and _batch_key(lookahead[0]) == last_batch:
+        page.append(lookahead.pop(0))
+        if not lookahead:
+            tail = page[-1]
+            lookahead = list(get_transactions(
+                limit=page_size,
+                page_token=encode_page_token(tail['transaction_date'], tail['id']),
+                **filters,
+            ))
+
+    if not lookahead:
+        return page, None
+    tail = page[-1]
+    return page, encode_page_token(tail['transaction_date'], tail['id'])
+
+def iter_transaction_batches(chunk_size=500, **filters):
+    """Yield receipt batches (receipts.group_batches shape) for get_transactions filters, newest first.
+
+    Streams from a private read cursor rather than the cached get_transactions, so a bulk export
+    keeps one chunk in memory and leaves the UI's cache entries alone. Items of a batch share
+    their timestamp, so they arrive consecutively and each batch is yielded once complete.
+    """
+    query, params = _transactions_query(**filters)
+    with read_cursor() as cursor:
+        cursor.execute(query, params)
+
+        def rows():
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    return
+                yield from chunk
+
+        for _, batch_rows in groupby(rows(), key=_batch_key):
+            yield from receipts.group_batches(list(batch_rows))
+
+def count_transaction_batches(warga_id=None, start_date=None, end_date=None):
+    """Number of receipt batches matching the get_transactions filters"""
+    query = '''
+        SELECT COUNT(DISTINCT COALESCE(NULLIF(batch_id, ''), 'single-' || id))
+        FROM transactions WHERE 1=1
+    '''
+    params = []
+    if warga_id:
+        query += ' AND warga_id = ?'
+        params.append(warga_id)
+    date_clause, date_params = date_range_filter('transaction_date', start_date, end_date)
+    query += date_clause
+    params.extend(date_params)
+    with session() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+@cached(('financial_movements', 'users'))
+def get_financial_movements(warga_id=None, limit=None, page_token=None):
+    """Get financial movements, newest first; page_token continues after a previous page"""
     query = '''
         SELECT fm.*, u.full_name as warga_name, p.full_name as processed_by_name
         FROM financial_movements fm
@@ -351,89 +461,239 @@ def get_financial_movements(warga_id=None, limit=None):
     if warga_id:
         query += ' AND fm.warga_id = ?'
         params.append(warga_id)
+
+    keyset_clause, keyset_params = _keyset_filter('fm.movement_date', 'fm.id', page_token)
+    query += keyset_clause
+    params.extend(keyset_params)
     
-    query += ' ORDER BY fm.movement_date DESC'
+    query += ' ORDER BY fm.movement_date DESC, fm.id DESC'
     
     if limit:
-        query += f' LIMIT {limit}'
-    
-    cursor.execute(query, params)
-    movements = cursor.fetchall()
-    conn.close()
-    return movements
-
+        query += ' LIMIT ?'
+        params.append(int(limit))
+    
+    with session() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+def get_financial_movements_page(page_size=50, page_token=None, **filters):
+    """One page of get_financial_movements plus the token for the next page (None on the last page)"""
+    rows = list(get_financial_movements(limit=page_size + 1, page_token=page_token, **filters))
+    if len(rows) <= page_size:
+        return rows, None
+    page = rows[:page_size]
+    return page, encode_page_token(page[-1]['movement_date'], page[-1]['id'])
+
+@cached(('committee_earnings',))
 def get_committee_total_earnings(start_date=None, end_date=None):
     """Get total committee earnings"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     query = 'SELECT SUM(amount) FROM committee_earnings WHERE 1=1'
     params = []
     
-    if start_date:
-        query += ' AND DATE(earned_date) >= ?'
-        params.append(start_date)
-    
-    if end_date:
-        query += ' AND DATE(earned_date) <= ?'
-        params.append(end_date)
-    
-    cursor.execute(query, params)
-    total = cursor.fetchone()[0] or 0
-    conn.close()
-    return total
+    date_clause, date_params = date_range_filter('earned_date', start_date, end_date)
+    query += date_clause
+    params.extend(date_params)
+    
+    with session() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchone()[0] or 0
+
+@cached(('daily_stats',), ttl=30)
+def get_kpi_snapshot(start=None, end=None, category_id=None, warga_id=None):
+    """All dashboard KPIs for an optional date range/category/warga in one pass over daily_stats"""
+    date_clause, params = date_range_filter('date', start, end)
+    if category_id:
+        date_clause += ' AND category_id = ?'
+        params.append(category_id)
+    if warga_id:
+        date_clause += ' AND warga_id = ?'
+        params.append(warga_id)
+    with session() as cursor:
+        cursor.execute(f'''
+            SELECT SUM(tx_count), SUM(weight_kg), SUM(total_amount),
+                   SUM(committee_fee), SUM(net_amount), COUNT(DISTINCT warga_id)
+            FROM daily_stats
+            WHERE 1=1{date_clause}
+        ''', params)
+        row = cursor.fetchone()
+
+    return {
+        'total_transactions': row[0] or 0,
+        'total_weight': row[1] or 0,
+        'total_revenue': row[2] or 0,
+        'committee_earnings': row[3] or 0,
+        'total_net': row[4] or 0,
+        'active_warga': row[5] or 0,
+    }
+
+@cached(('daily_stats', 'categories', 'users'), ttl=30)
+def get_report_aggregates(start_date=None, end_date=None, warga_id=None):
+    """Laporan aggregates (totals plus per-category, per-warga and per-day groups) read from daily_stats"""
+    where, params = date_range_filter('d.date', start_date, end_date)
+    if warga_id:
+        where += ' AND d.warga_id = ?'
+        params.append(warga_id)
+
+    result = {
+        'category_sales': {},
+        'category_weights': {},
+        'warga_activity': {},
+        'daily_sales': {},
+        'daily_fees': {},
+    }
+    with session() as cursor:
+        cursor.execute(f'''
+            SELECT SUM(tx_count), SUM(weight_kg), SUM(total_amount), SUM(committee_fee),
+                   COUNT(DISTINCT warga_id)
+            FROM daily_stats d
+            WHERE 1=1{where}
+        ''', params)
+        row = cursor.fetchone()
+        result.update({
+            'total_transactions': row[0] or 0,
+            'total_weight': row[1] or 0,
+            'total_revenue': row[2] or 0,
+            'total_fee': row[3] or 0,
+            'warga_unique': row[4] or 0,
+        })
+
+        cursor.execute(f'''
+            SELECT c.name, SUM(d.total_amount), SUM(d.weight_kg)
+            FROM daily_stats d JOIN categories c ON d.category_id = c.id
+            WHERE 1=1{where}
+            GROUP BY d.category_id
+        ''', params)
+        for name, amount, weight in cursor.fetchall():
+            # Keyed by display name like the report; same-named rows are summed
+            result['category_sales'][name] = result['category_sales'].get(name, 0) + (amount or 0)
+            result['category_weights'][name] = result['category_weights'].get(name, 0) + (weight or 0)
+
+        cursor.execute(f'''
+            SELECT u.full_name, SUM(d.tx_count)
+            FROM daily_stats d JOIN users u ON d.warga_id = u.id
+            WHERE 1=1{where}
+            GROUP BY d.warga_id
+        ''', params)
+        for name, count in cursor.fetchall():
+            result['warga_activity'][name] = result['warga_activity'].get(name, 0) + count
+
+        cursor.execute(f'''
+            SELECT d.date, SUM(d.total_amount), SUM(d.committee_fee)
+            FROM daily_stats d
+            WHERE 1=1{where}
+            GROUP BY d.date
+            ORDER BY d.date
+        ''', params)
+        for day, amount, fee in cursor.fetchall():
+            result['daily_sales'][day] = amount or 0
+            result['daily_fees'][day] = fee or 0
+
+    return result
 
+PERIOD_GRANULARITIES = ('day', 'week', 'month', 'year')
+
+def _period_start(day, granularity):
+    """First day of the day/week (Monday)/month/year bucket containing day"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+def _next_period(day, granularity):
+    if granularity == 'day':
+        return day + timedelta(days=1)
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return date(day.year + 1, 1, 1)
+
+@cached(('daily_stats',))
+def get_period_series(granularity='month', start=None, end=None):
+    """Totals per day/week/month/year between start and end (inclusive) from one query, gaps zero-filled"""
+    if granularity not in PERIOD_GRANULARITIES:
+        raise ValueError(f"Granularitas tidak dikenal: {granularity}")
+    end = _as_date(end) if end else date.today()
+    start = _as_date(start) if start else end.replace(month=1, day=1)
+
+    series = {}
+    period = _period_start(start, granularity)
+    while period <= end:
+        series[period] = {
+            'period': period.isoformat(),
+            'total_transactions': 0,
+            'total_weight': 0,
+            'total_revenue': 0,
+            'committee_earnings': 0,
+            'total_net': 0,
+        }
+        period = _next_period(period, granularity)
+
+    # GROUP BY the raw day follows the primary key order (no temp b-tree); the at most one row
+    # per day is then folded into its bucket here
+    date_clause, params = date_range_filter('date', start, end)
+    with session() as cursor:
+        cursor.execute(f'''
+            SELECT date, SUM(tx_count), SUM(weight_kg), SUM(total_amount), SUM(committee_fee), SUM(net_amount)
+            FROM daily_stats
+            WHERE 1=1{date_clause}
+            GROUP BY date
+        ''', params)
+        for day, tx_count, weight, revenue, fee, net in cursor.fetchall():
+            bucket = series[_period_start(date.fromisoformat(day), granularity)]
+            bucket['total_transactions'] += tx_count
+            bucket['total_weight'] += weight
+            bucket['total_revenue'] += revenue
+            bucket['committee_earnings'] += fee
+            bucket['total_net'] += net
+
+    return list(series.values())
+
+@cached(('transactions',))
 def get_monthly_statistics(year, month):
     """Get monthly statistics"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Total transactions
-    cursor.execute('''
-        SELECT COUNT(*), SUM(total_amount), SUM(weight_kg)
-        FROM transactions
-        WHERE strftime('%Y', transaction_date) = ? 
-        AND strftime('%m', transaction_date) = ?
-    ''', (str(year), str(month).zfill(2)))
-    
-    stats = cursor.fetchone()
+    with session() as cursor:
+        # Total transactions
+        first_day = date(year, month, 1)
+        next_month = date(year + month // 12, month % 12 + 1, 1)
+        cursor.execute('''
+            SELECT COUNT(*), SUM(total_amount), SUM(weight_kg)
+            FROM transactions
+            WHERE transaction_date >= ? AND transaction_date < ?
+        ''', (first_day.isoformat(), next_month.isoformat()))
+        stats = cursor.fetchone()
     
     result = {
         'total_transactions': stats[0] or 0,
         'total_revenue': stats[1] or 0,
         'total_weight': stats[2] or 0
     }
-    
-    conn.close()
     return result
 
+@cached(('transactions',))
 def get_yearly_statistics(year):
     """Get yearly statistics"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT COUNT(*), SUM(total_amount), SUM(weight_kg)
-        FROM transactions
-        WHERE strftime('%Y', transaction_date) = ?
-    ''', (str(year),))
-    
-    stats = cursor.fetchone()
+    with session() as cursor:
+        cursor.execute('''
+            SELECT COUNT(*), SUM(total_amount), SUM(weight_kg)
+            FROM transactions
+            WHERE transaction_date >= ? AND transaction_date < ?
+        ''', (date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()))
+        stats = cursor.fetchone()
     
     result = {
         'total_transactions': stats[0] or 0,
         'total_revenue': stats[1] or 0,
         'total_weight': stats[2] or 0
     }
-    
-    conn.close()
     return result
 
+@cached(('transactions',))
 def get_warga_performance(warga_id, start_date=None, end_date=None):
     """Get warga performance statistics"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     query = '''
         SELECT COUNT(*) as total_transactions,
                SUM(weight_kg) as total_weight,
@@ -444,19 +704,14 @@ def get_warga_performance(warga_id, start_date=None, end_date=None):
     '''
     params = [warga_id]
     
-    if start_date:
-        query += ' AND DATE(transaction_date) >= ?'
-        params.append(start_date)
-    
-    if end_date:
-        query += ' AND DATE(transaction_date) <= ?'
-        params.append(end_date)
-    
-    cursor.execute(query, params)
-    stats = cursor.fetchone()
-    
-    conn.close()
+    date_clause, date_params = date_range_filter('transaction_date', start_date, end_date)
+    query += date_clause
+    params.extend(date_params)
     
+    with session() as cursor:
+        cursor.execute(query, params)
+        stats = cursor.fetchone()
+
     return {
         'total_transactions': stats[0] or 0,
         'total_weight': stats[1] or 0,
@@ -465,10 +720,13 @@ def get_warga_performance(warga_id, start_date=None, end_date=None):
     }
 
 def get_audit_logs(user_id=None, limit=100, start_date=None, end_date=None):
-    """Get audit logs"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    """Get audit logs, newest first, from the live table followed by the monthly archives"""
+    # Queued events are written first so the log always shows everything recorded so far
+    audit.flush()
+    return _get_audit_logs(user_id, limit, start_date, end_date)
+
+@cached(('audit_log', 'users'))
+def _get_audit_logs(user_id, limit, start_date, end_date):
     query = '''
         SELECT al.*, u.username, u.full_name, u.role
         FROM audit_log al
@@ -481,20 +739,22 @@ def get_audit_logs(user_id=None, limit=100, start_date=None, end_date=None):
         query += ' AND al.user_id = ?'
         params.append(user_id)
 
-    if start_date:
-        query += ' AND DATE(al.timestamp) >= ?'
-        params.append(start_date)
-
-    if end_date:
-        query += ' AND DATE(al.timestamp) <= ?'
-        params.append(end_date)
+    date_clause, date_params = date_range_filter('al.timestamp', start_date, end_date)
+    query += date_clause
+    params.extend(date_params)
     
     query += ' ORDER BY al.timestamp DESC LIMIT ?'
     params.append(limit)
     
-    cursor.execute(query, params)
-    logs = cursor.fetchall()
-    conn.close()
+    with session() as cursor:
+        cursor.execute(query, params)
+        logs = cursor.fetchall()
+
+    # Archived events are all older than the live table, so they only fill up a short page
+    if len(logs) < limit:
+        lower = _as_date(start_date).isoformat() if start_date else None
+        upper = (_as_date(end_date) + timedelta(days=1)).isoformat() if end_date else None
+        logs += audit.search_archive(user_id, lower, upper, limit - len(logs))
     return logs
 
 def is_input_period_active():